@@ -0,0 +1,40 @@
+"""added unique index on post likes
+
+Revision ID: 6b2f0e9d41c7
+Revises: a881be2c887e
+Create Date: 2026-10-17 16:41:09.527311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b2f0e9d41c7'
+down_revision: Union[str, None] = 'a881be2c887e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Drop the duplicate likes left behind by racing requests, keeping the first one
+    op.execute(
+        """
+        DELETE FROM post_likes WHERE id NOT IN (
+            SELECT min(id) FROM post_likes GROUP BY prompt_id, user_account
+        )
+        """
+    )
+    op.execute(
+        """
+        UPDATE prompts SET
+            likes_count = (SELECT count(*) FROM post_likes WHERE post_likes.prompt_id = prompts.id)
+        """
+    )
+    op.create_index('uq_post_likes_prompt_id_user_account', 'post_likes', ['prompt_id', 'user_account'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('uq_post_likes_prompt_id_user_account', table_name='post_likes')
@@ -0,0 +1,49 @@
+"""added prompt search indexes
+
+Revision ID: 7c1d4e8a2f90
+Revises: 6b2f0e9d41c7
+Create Date: 2026-10-17 17:52:36.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d4e8a2f90'
+down_revision: Union[str, None] = '6b2f0e9d41c7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # PostgreSQL only, SQLite builds its FTS5 stand-in on the first search.
+    # The indexed expressions must match app/prompts/search.py exactly.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.execute(
+        """
+        CREATE INDEX ix_prompts_search_document ON prompts USING gin ((
+            setweight(to_tsvector('english', post_name), 'A') ||
+            setweight(to_tsvector('english', coalesce(collection_name, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(ai_model, '')), 'C') ||
+            setweight(to_tsvector('english', prompt), 'D')
+        ))
+        """
+    )
+    op.execute(
+        """
+        CREATE INDEX ix_prompts_search_names_trgm ON prompts
+        USING gin ((post_name || ' ' || coalesce(collection_name, '')) gin_trgm_ops)
+        """
+    )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_prompts_search_names_trgm', table_name='prompts')
+    op.drop_index('ix_prompts_search_document', table_name='prompts')
@@ -0,0 +1,86 @@
+"""matched indexes to query shapes
+
+Revision ID: 9d3a5f1c7b24
+Revises: 7c1d4e8a2f90
+Create Date: 2026-10-17 18:21:47.630915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d3a5f1c7b24'
+down_revision: Union[str, None] = '7c1d4e8a2f90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Single-column indexes no query filters or sorts on, or whose column leads one of
+# the composites below. Every one of them is rewritten on each insert/update.
+# `ix_<table>_id` duplicate the primary key indexes.
+UNUSED_INDEXES = [
+    ('ix_prompts_id', 'prompts', ['id']),
+    ('ix_prompts_account_address', 'prompts', ['account_address']),
+    ('ix_prompts_ai_model', 'prompts', ['ai_model']),
+    ('ix_prompts_chain', 'prompts', ['chain']),
+    ('ix_prompts_cid', 'prompts', ['cid']),
+    ('ix_prompts_collection_name', 'prompts', ['collection_name']),
+    ('ix_prompts_grant_access', 'prompts', ['grant_access']),
+    ('ix_prompts_max_supply', 'prompts', ['max_supply']),
+    ('ix_prompts_post_name', 'prompts', ['post_name']),
+    ('ix_prompts_prompt_nft_price', 'prompts', ['prompt_nft_price']),
+    ('ix_prompts_prompt_tag', 'prompts', ['prompt_tag']),
+    ('ix_prompts_prompt_type', 'prompts', ['prompt_type']),
+    ('ix_prompts_public', 'prompts', ['public']),
+    ('ix_prompts_video_url', 'prompts', ['video_url']),
+    ('ix_post_likes_id', 'post_likes', ['id']),
+    ('ix_post_likes_user_account', 'post_likes', ['user_account']),
+    ('ix_post_comments_id', 'post_comments', ['id']),
+    ('ix_post_comments_user_account', 'post_comments', ['user_account']),
+    ('ix_follows_id', 'follows', ['id']),
+    ('ix_follows_creator_account', 'follows', ['creator_account']),
+    ('ix_follows_follower_account', 'follows', ['follower_account']),
+    # The leaderboards are ranked in Redis, only the 24h window filters on last_generation
+    ('ix_user_stats_id', 'user_stats', ['id']),
+    ('ix_user_stats_streak_days', 'user_stats', ['streak_days']),
+    ('ix_user_stats_total_generations', 'user_stats', ['total_generations']),
+    ('ix_user_stats_xp', 'user_stats', ['xp']),
+]
+
+
+def upgrade() -> None:
+    # Prompt listings: newest first per type, per type and tag, per creator (feeds) and overall (feed fallback)
+    op.create_index('ix_prompts_prompt_type_created_at', 'prompts', ['prompt_type', 'created_at', 'id'], unique=False)
+    op.create_index('ix_prompts_prompt_type_prompt_tag_created_at', 'prompts', ['prompt_type', 'prompt_tag', 'created_at', 'id'], unique=False)
+    op.create_index('ix_prompts_account_address_created_at', 'prompts', ['account_address', 'created_at', 'id'], unique=False)
+    op.create_index('ix_prompts_created_at', 'prompts', ['created_at', 'id'], unique=False)
+    # filter-public-prompts' default (every tag, public only)
+    op.create_index(
+        'ix_prompts_public_created_at', 'prompts', ['created_at', 'id'], unique=False,
+        postgresql_where=sa.text("prompt_type = 'PUBLIC' AND public"),
+    )
+    # Latest comments of a prompt
+    op.create_index('ix_post_comments_prompt_id_created_at', 'post_comments', ['prompt_id', 'created_at', 'id'], unique=False)
+    # Who a user follows / who follows a creator, both covering the other account
+    op.create_index('ix_follows_follower_account_creator_account', 'follows', ['follower_account', 'creator_account'], unique=False)
+    op.create_index('ix_follows_creator_account_follower_account', 'follows', ['creator_account', 'follower_account'], unique=False)
+
+    for name, table, _ in UNUSED_INDEXES:
+        op.drop_index(name, table_name=table)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(UNUSED_INDEXES):
+        op.create_index(name, table, columns, unique=False)
+
+    op.drop_index('ix_follows_creator_account_follower_account', table_name='follows')
+    op.drop_index('ix_follows_follower_account_creator_account', table_name='follows')
+    op.drop_index('ix_post_comments_prompt_id_created_at', table_name='post_comments')
+    op.drop_index('ix_prompts_public_created_at', table_name='prompts')
+    op.drop_index('ix_prompts_created_at', table_name='prompts')
+    op.drop_index('ix_prompts_account_address_created_at', table_name='prompts')
+    op.drop_index('ix_prompts_prompt_type_prompt_tag_created_at', table_name='prompts')
+    op.drop_index('ix_prompts_prompt_type_created_at', table_name='prompts')
@@ -0,0 +1,34 @@
+"""added popularity and trending scores
+
+Revision ID: a881be2c887e
+Revises: d31e78030351
+Create Date: 2026-10-17 14:03:52.118640
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a881be2c887e'
+down_revision: Union[str, None] = 'd31e78030351'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Existing rows start at 0, the celery `recompute_prompt_scores` task
+    # (or `python -m app.prompts.services`) fills in the real scores.
+    op.add_column('prompts', sa.Column('popularity_score', sa.Float(), nullable=False, server_default='0'))
+    op.add_column('prompts', sa.Column('trending_score', sa.Float(), nullable=False, server_default='0'))
+    op.create_index('ix_prompts_prompt_type_popularity_score', 'prompts', ['prompt_type', 'popularity_score'], unique=False)
+    op.create_index('ix_prompts_prompt_type_trending_score', 'prompts', ['prompt_type', 'trending_score'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_prompts_prompt_type_trending_score', table_name='prompts')
+    op.drop_index('ix_prompts_prompt_type_popularity_score', table_name='prompts')
+    op.drop_column('prompts', 'trending_score')
+    op.drop_column('prompts', 'popularity_score')
@@ -0,0 +1,26 @@
+"""added engagement seq on prompts
+
+Revision ID: b7e2c4a9d150
+Revises: 9d3a5f1c7b24
+Create Date: 2026-10-17 21:04:12.518377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7e2c4a9d150'
+down_revision: Union[str, None] = '9d3a5f1c7b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('prompts', sa.Column('engagement_seq', sa.BigInteger(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('prompts', 'engagement_seq')
@@ -0,0 +1,37 @@
+"""added engagement counters on prompts
+
+Revision ID: d31e78030351
+Revises: 195f79c24ff3
+Create Date: 2026-10-17 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd31e78030351'
+down_revision: Union[str, None] = '195f79c24ff3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('prompts', sa.Column('likes_count', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('prompts', sa.Column('comments_count', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill the counters from the existing likes and comments
+    op.execute(
+        """
+        UPDATE prompts SET
+            likes_count = (SELECT count(*) FROM post_likes WHERE post_likes.prompt_id = prompts.id),
+            comments_count = (SELECT count(*) FROM post_comments WHERE post_comments.prompt_id = prompts.id)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('prompts', 'comments_count')
+    op.drop_column('prompts', 'likes_count')
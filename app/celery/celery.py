@@ -1,7 +1,7 @@
 from celery import Celery
 import requests
 
-from app.core.constants import BASE_URL, API_KEY, REDIS_URL
+from app.core.constants import BASE_URL, API_KEY, REDIS_URL, ENGAGEMENT_WRITE_BEHIND, ENGAGEMENT_FLUSH_INTERVAL_SECONDS
 
 # Create a Celery app
 celery_app = Celery('tasks', broker=REDIS_URL)  
@@ -20,11 +20,43 @@ def finalize_challenges():
     except requests.exceptions.RequestException as e:
         print(f"Error finalizing challenges: {e}")
 
+# Rebuild the marketplace popularity/trending scores from scratch
+@celery_app.task(name='tasks.recompute_prompt_scores')
+def recompute_prompt_scores():
+    from app.core.database import get_session_with_ctx_manager
+    from app.prompts.services import recompute_prompt_scores as recompute
+
+    with get_session_with_ctx_manager() as session:
+        updated = recompute(session)
+    print(f"Recomputed scores for {updated} prompts")
+
+# Write the queued likes/comments (ENGAGEMENT_WRITE_BEHIND) to the database in batches
+@celery_app.task(name='tasks.flush_engagement_events')
+def flush_engagement_events():
+    from app.core.database import get_session_with_ctx_manager
+    from app.core.redis import sync_redis_client
+    from app.socialfeed.write_behind import drain_stream
+
+    client = sync_redis_client()
+    if client is None:
+        return 0
+    return drain_stream(client, get_session_with_ctx_manager)
+
 # Schedule the task to run every 30 minutes
 celery_app.conf.beat_schedule = {
     'finalize-challenges-every-30-minutes': {
         'task': 'tasks.finalize_challenges',
         'schedule': 30 * 60,  # 30 minutes in seconds
     },
+    'recompute-prompt-scores-every-15-minutes': {
+        'task': 'tasks.recompute_prompt_scores',
+        'schedule': 15 * 60,  # 15 minutes in seconds
+    },
 }
 
+if ENGAGEMENT_WRITE_BEHIND:
+    celery_app.conf.beat_schedule['flush-engagement-events'] = {
+        'task': 'tasks.flush_engagement_events',
+        'schedule': ENGAGEMENT_FLUSH_INTERVAL_SECONDS,
+    }
+
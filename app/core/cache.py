@@ -0,0 +1,145 @@
+"""
+Response cache for read-heavy listing endpoints.
+
+Responses are cached per route and query parameters under a *namespace*
+(e.g. every public prompt listing lives in `PUBLIC_PROMPTS`). The namespace's
+version (`app.core.versioning`) is baked into its keys; the write endpoints
+bump it with `invalidate`, which orphans every cached page of that namespace
+at once and changes its ETags. Orphaned entries simply age out through the
+TTL / LRU limits.
+
+    @router.get("/get-public-prompts/")
+    @cached(PUBLIC_PROMPTS)
+    async def get_public_prompts(page: int = 1, db: AsyncSession = Depends(get_async_session)):
+        ...
+
+The backend is Redis when `REDIS_URL` is set, otherwise a bounded in-process
+LRU. Cache failures never fail a request, they only count as misses.
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.constants import CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS
+from app.core.redis import redis_client
+from app.core.versioning import get_versions, bump_versions
+
+logger = logging.getLogger(__name__)
+
+# Namespaces, invalidated by the endpoints that write the underlying data
+PUBLIC_PROMPTS = "public_prompts"
+PREMIUM_PROMPTS = "premium_prompts"
+STATIC = "static"  # Enum listings, only change on deploy
+
+
+class InMemoryCache:
+    """Bounded in-process TTL + LRU cache, used for local runs and tests."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = asyncio.Lock()
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    async def set(self, key: str, value: Any, ttl: int):
+        async with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisCache:
+    """Entries kept as JSON strings under `cache:<namespace>:<version>:...` with a TTL."""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def get(self, key: str) -> Tuple[bool, Any]:
+        raw = await self.client.get(key)
+        if raw is None:
+            return False, None
+        return True, json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: int):
+        await self.client.set(key, json.dumps(value), ex=ttl)
+
+
+response_cache = RedisCache(redis_client) if redis_client else InMemoryCache()
+
+# Per-namespace counters, see `cache_stats`
+_hits = Counter()
+_misses = Counter()
+
+
+def cache_stats() -> dict:
+    """Hit/miss counts per namespace since the process started."""
+    return {
+        namespace: {"hits": _hits[namespace], "misses": _misses[namespace]}
+        for namespace in sorted(set(_hits) | set(_misses))
+    }
+
+
+def _cache_key(namespace: str, version: int, route: str, params: dict) -> str:
+    digest = hashlib.sha1(json.dumps(jsonable_encoder(params), sort_keys=True).encode()).hexdigest()
+    return f"cache:{namespace}:{version}:{route}:{digest}"
+
+
+def cached(namespace: str, ttl: Optional[int] = None, exclude: Tuple[str, ...] = ("db",)):
+    """
+    Cache an async route's (JSON-encoded) response, keyed by the route and its
+    arguments except `exclude` (the database session).
+    """
+    ttl = ttl or CACHE_TTL_SECONDS
+
+    def decorator(func):
+        route = f"{func.__module__}.{func.__name__}"
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            key = None
+            try:
+                params = {name: value for name, value in kwargs.items() if name not in exclude}
+                version, = await get_versions(namespace)
+                key = _cache_key(namespace, version, route, params)
+                hit, value = await response_cache.get(key)
+                if hit:
+                    _hits[namespace] += 1
+                    return value
+            except Exception as e:
+                logger.warning("Response cache read failed for %s: %s", route, e)
+            _misses[namespace] += 1
+
+            value = jsonable_encoder(await func(*args, **kwargs))
+            if key is not None:
+                try:
+                    await response_cache.set(key, value, ttl)
+                except Exception as e:
+                    logger.warning("Response cache write failed for %s: %s", route, e)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+async def invalidate(*namespaces: str):
+    """Drop every cached response in `namespaces`, called by the endpoints that change them."""
+    await bump_versions(*namespaces)
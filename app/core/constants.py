@@ -5,6 +5,65 @@ load_dotenv()
 
 
 SQLALCHEMY_DATABASE_URL = os.getenv("SQLALCHEMY_DATABASE_URL")
+
+
+def _async_database_url(url):
+    """Swap the sync driver in a database URL for its asyncio counterpart."""
+    if not url:
+        return url
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    if url.startswith("postgresql://") or url.startswith("postgresql+psycopg2://"):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url.split("://", 1)[1]
+    return url
+
+
+ASYNC_SQLALCHEMY_DATABASE_URL = os.getenv("ASYNC_SQLALCHEMY_DATABASE_URL") or _async_database_url(SQLALCHEMY_DATABASE_URL)
 BASE_URL = os.getenv("BASE_URL")
 API_KEY= os.getenv("API_KEY")
-REDIS_URL = os.getenv("REDIS_URL")
\ No newline at end of file
+REDIS_URL = os.getenv("REDIS_URL")
+
+# Precomputed social feed timeline (app/socialfeed/feed_store.py)
+FEED_MAX_LENGTH = int(os.getenv("FEED_MAX_LENGTH", 800))  # Newest prompt ids kept in the timeline
+FEED_TTL_SECONDS = int(os.getenv("FEED_TTL_SECONDS", 7 * 24 * 60 * 60))  # An idle timeline goes cold after this
+FEED_TOP_COMMENTS = int(os.getenv("FEED_TOP_COMMENTS", 2))  # Default number of latest comments sent with each feed prompt
+
+# Ranked leaderboard indexes (app/leaderboard/board_store.py)
+LEADERBOARD_TTL_SECONDS = int(os.getenv("LEADERBOARD_TTL_SECONDS", 60 * 60))  # Boards are rebuilt from user_stats this often
+
+# Response cache for listing endpoints (app/core/cache.py)
+CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 30))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 1024))  # In-process backend only
+
+# Write-behind likes and comments (app/socialfeed/write_behind.py)
+ENGAGEMENT_WRITE_BEHIND = os.getenv("ENGAGEMENT_WRITE_BEHIND", "false").lower() in ("1", "true", "yes")
+ENGAGEMENT_FLUSH_INTERVAL_SECONDS = float(os.getenv("ENGAGEMENT_FLUSH_INTERVAL_SECONDS", 0.3))
+ENGAGEMENT_BATCH_SIZE = int(os.getenv("ENGAGEMENT_BATCH_SIZE", 500))
+
+# Per-request query budget / N+1 detection (app/core/query_budget.py), meant for development and tests
+QUERY_BUDGET_MODE = os.getenv("QUERY_BUDGET_MODE", "off").lower()  # off, warn or raise
+QUERY_BUDGET_MAX_QUERIES = int(os.getenv("QUERY_BUDGET_MAX_QUERIES", 15))  # Statements allowed per request
+QUERY_BUDGET_MAX_REPEATS = int(os.getenv("QUERY_BUDGET_MAX_REPEATS", 2))  # Times one statement shape may run per request
+
+# Connection pools (app/core/database.py). Every API worker process gets its share of DB_MAX_CONNECTIONS,
+# which must leave room under Postgres' max_connections for the Celery workers and admin sessions.
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", 1)), 1)  # API worker processes
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 60))  # Across all API workers
+_DB_CONNECTIONS_PER_WORKER = max(DB_MAX_CONNECTIONS // WEB_CONCURRENCY, 2)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", _DB_CONNECTIONS_PER_WORKER // 2))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", _DB_CONNECTIONS_PER_WORKER - DB_POOL_SIZE))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 3))  # Seconds to wait for a connection before answering 503
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 30 * 60))
+DB_SYNC_POOL_SIZE = int(os.getenv("DB_SYNC_POOL_SIZE", 2))  # Sync engine: celery tasks, scripts, the write-behind flusher
+DB_SYNC_MAX_OVERFLOW = int(os.getenv("DB_SYNC_MAX_OVERFLOW", 3))
+# "pgbouncer" when connecting through PgBouncer in transaction pooling mode: no client-side pool, no prepared statement cache
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "queue").lower()
+
+# Read replicas (app/core/database.py), comma-separated URLs in the same format as SQLALCHEMY_DATABASE_URL
+SQLALCHEMY_REPLICA_URLS = [url.strip() for url in os.getenv("SQLALCHEMY_REPLICA_URLS", "").split(",") if url.strip()]
+ASYNC_SQLALCHEMY_REPLICA_URLS = [_async_database_url(url) for url in SQLALCHEMY_REPLICA_URLS]
+REPLICA_HEALTH_CHECK_SECONDS = float(os.getenv("REPLICA_HEALTH_CHECK_SECONDS", 5))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 10))  # Replicas further behind get no reads
+READ_YOUR_WRITES_SECONDS = int(os.getenv("READ_YOUR_WRITES_SECONDS", 10))  # A client reads from the primary this long after writing
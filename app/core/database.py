@@ -1,27 +1,61 @@
-from sqlalchemy import AsyncAdaptedQueuePool
+import asyncio
+import itertools
+import logging
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import AsyncAdaptedQueuePool, NullPool, event, text
+from sqlalchemy.exc import DBAPIError, TimeoutError as PoolTimeoutError
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.orm import Session
 
 from sqlalchemy import create_engine
-from contextlib import contextmanager
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from contextlib import asynccontextmanager, contextmanager
+
+from fastapi import HTTPException, Request, Response
 
-from app.core.constants import SQLALCHEMY_DATABASE_URL
+from app.core.constants import (
+    SQLALCHEMY_DATABASE_URL, ASYNC_SQLALCHEMY_DATABASE_URL, DB_POOL_MODE, DB_POOL_SIZE, DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_SYNC_POOL_SIZE, DB_SYNC_MAX_OVERFLOW, ASYNC_SQLALCHEMY_REPLICA_URLS,
+    REPLICA_HEALTH_CHECK_SECONDS, REPLICA_MAX_LAG_SECONDS, READ_YOUR_WRITES_SECONDS,
+)
+from app.core import metrics, query_budget
 
 from sqlalchemy.orm import relationship, declarative_base
 
+logger = logging.getLogger(__name__)
+
 Base = declarative_base()
 
 
+def pool_options(url, pool_size, max_overflow):
+    """
+    Engine pool arguments for `url`, sized by the DB_* settings (see app/core/constants.py).
+    SQLite (local runs) keeps SQLAlchemy's default pool, and behind PgBouncer in
+    transaction pooling mode connections aren't pooled client side at all.
+    """
+    if (url or "").startswith("sqlite"):
+        return {}
+    if DB_POOL_MODE == "pgbouncer":
+        return dict(poolclass=NullPool)
+    return dict(
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=DB_POOL_TIMEOUT,  # Short, so exhaustion surfaces as 503s instead of piling up requests
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    pool_size=1000,  # Adjust based on your app's concurrency requirements
-    max_overflow=500,  # Allows for extra connections in times of high demand
-    pool_timeout=120,  # Reduces wait time for a connection
-    pool_recycle=36000,  # Recycles connections every 1 hours
-    # echo_pool='debug',  # Logs pool checkouts/checkins (remove in production)
     pool_pre_ping=True,
     # Any idle transaction request past 20seconds will be terminated
     # connect_args={"options": "-c idle_in_transaction_session_timeout=20000"},
+    **pool_options(SQLALCHEMY_DATABASE_URL, DB_SYNC_POOL_SIZE, DB_SYNC_MAX_OVERFLOW),
 )
 
 
@@ -30,6 +64,268 @@ def get_session():
         yield session
 
 
+def async_connect_args(url):
+    if DB_POOL_MODE == "pgbouncer" and (url or "").startswith("postgresql+asyncpg"):
+        # PgBouncer hands each transaction to any server connection, where asyncpg's
+        # named prepared statements may not exist (or already exist under the same name)
+        return dict(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+    return {}
+
+
+def create_api_engine(url):
+    """Async engine for the API routers, so DB I/O doesn't block the event loop."""
+    return create_async_engine(
+        url,
+        pool_pre_ping=True,
+        connect_args=async_connect_args(url),
+        **pool_options(url, DB_POOL_SIZE, DB_MAX_OVERFLOW),
+    )
+
+
+# The sync `engine` above is kept for alembic, celery and scripts.
+async_engine = create_api_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+
+metrics.instrument_engine(engine, "sync")
+metrics.instrument_engine(async_engine.sync_engine, "async")
+
+# When the current request's session started waiting for a connection, set by the ApiSession events below
+_checkout_start: ContextVar[Optional[float]] = ContextVar("checkout_start", default=None)
+
+
+def _observe_checkout(sync_engine, name: str):
+    """Report how long API sessions wait for `sync_engine`'s pool to hand them a connection."""
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        start = _checkout_start.get()
+        if start is not None:
+            _checkout_start.set(None)
+            metrics.db_pool_checkout_seconds.observe(time.perf_counter() - start, engine=name)
+
+
+_observe_checkout(async_engine.sync_engine, "async")
+
+
+
+# How far a PostgreSQL standby's replay is behind, 0 when it has replayed everything it received
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+class Replica:
+    """A read replica's engine, and whether the router currently sends reads to it."""
+
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = create_api_engine(url)
+        self.healthy = True  # Until a health check or a connection attempt says otherwise
+        self.in_flight = 0  # Sessions currently open on it
+        metrics.instrument_engine(self.engine.sync_engine, name)
+        _observe_checkout(self.engine.sync_engine, name)
+
+
+class ReplicaRouter:
+    """
+    Picks the replica a read-only request runs on: the healthy replica with the
+    fewest open sessions, round-robin among equally loaded ones. A replica is
+    healthy while it answers the periodic health check and lags the primary by
+    at most REPLICA_MAX_LAG_SECONDS.
+    """
+
+    def __init__(self, urls):
+        self.replicas = [Replica(f"replica-{index}", url) for index, url in enumerate(urls)]
+        self._turn = itertools.count()
+
+    def choose(self) -> Optional[Replica]:
+        """The replica to read from, None (the primary) when no replica is healthy."""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        offset = next(self._turn) % len(healthy)
+        return min(healthy[offset:] + healthy[:offset], key=lambda replica: replica.in_flight)
+
+    def mark_unhealthy(self, replica: Replica, reason):
+        if replica.healthy:
+            logger.warning("Replica %s is unhealthy, reading from the others or the primary: %s", replica.name, reason)
+        replica.healthy = False
+
+    async def _lag(self, replica: Replica) -> float:
+        async with replica.engine.connect() as connection:
+            if connection.dialect.name != "postgresql":
+                await connection.execute(text("SELECT 1"))
+                return 0.0
+            return float(await connection.scalar(REPLICA_LAG_SQL))
+
+    async def check(self, replica: Replica):
+        try:
+            lag = await asyncio.wait_for(self._lag(replica), timeout=REPLICA_HEALTH_CHECK_SECONDS)
+        except Exception as e:
+            self.mark_unhealthy(replica, str(e) or type(e).__name__)
+            return
+        if lag > REPLICA_MAX_LAG_SECONDS:
+            self.mark_unhealthy(replica, f"{lag:.1f}s behind the primary")
+        elif not replica.healthy:
+            logger.info("Replica %s is healthy again", replica.name)
+            replica.healthy = True
+
+    async def run_health_checks(self):
+        """Check every replica each REPLICA_HEALTH_CHECK_SECONDS, run by the app's lifespan."""
+        while True:
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            await asyncio.sleep(REPLICA_HEALTH_CHECK_SECONDS)
+
+
+replica_router = ReplicaRouter(ASYNC_SQLALCHEMY_REPLICA_URLS)
+
+metrics.register(metrics.GaugeCallback(
+    "db_replica_healthy", "Whether reads are routed to each replica.", ("engine",),
+    lambda: {(replica.name,): float(replica.healthy) for replica in replica_router.replicas},
+))
+
+# Set on responses to requests that committed a write, so the client's next reads see it
+READ_PRIMARY_COOKIE = "read_primary"
+
+
+def _route_name(request: Request) -> str:
+    route = getattr(request.scope.get("route"), "path", request.url.path)
+    return f"{request.method} {route}"
+
+
+class ApiSession(Session):
+    """
+    Sync side of the API's `AsyncSession`s. Like any session it checks out a
+    connection only at its first statement, so requests answered from Redis or
+    the response cache never take a pool slot. That checkout is timed, and a
+    replica that refuses the connection is taken out of rotation with the
+    session moving to the primary.
+    """
+
+    def get_bind(self, *args, **kw):
+        return self.info.get("fallback_bind") or super().get_bind(*args, **kw)
+
+
+@event.listens_for(ApiSession, "do_orm_execute")
+def _first_statement(orm_execute_state):
+    session = orm_execute_state.session
+    if session.in_transaction():
+        return
+    _checkout_start.set(time.perf_counter())
+
+    replica = session.info.get("replica")
+    if replica is None or "fallback_bind" in session.info:
+        return
+    # Take the connection before the statement runs, so only a failure to connect moves the session
+    try:
+        session.connection()
+    except (DBAPIError, OSError) as e:
+        replica_router.mark_unhealthy(replica, e)
+        session.rollback()
+        session.info.update(fallback_bind=async_engine.sync_engine, engine_name="async")
+        _checkout_start.set(time.perf_counter())
+
+
+@event.listens_for(ApiSession, "before_flush")
+def _flush_checkout_start(session, flush_context, instances):
+    if not session.in_transaction():
+        _checkout_start.set(time.perf_counter())
+
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, sync_session_class=ApiSession, autoflush=False, expire_on_commit=False,
+    info={"engine_name": "async"},
+)
+
+
+def _pool_timeout(exc: Optional[BaseException]) -> Optional[PoolTimeoutError]:
+    """The pool timeout behind `exc`, which routes usually re-raise wrapped in a 500."""
+    while exc is not None:
+        if isinstance(exc, PoolTimeoutError):
+            return exc
+        exc = exc.__cause__ or exc.__context__
+    return None
+
+
+@asynccontextmanager
+async def _api_session(request: Request, bind, name: str, replica: Optional[Replica] = None):
+    """
+    A session on `bind` for one request, checked against the query budget when
+    QUERY_BUDGET_MODE enables it. A request whose first statement waited
+    DB_POOL_TIMEOUT for a connection is answered 503 with Retry-After instead of
+    the 500 the route's own error handling makes of it.
+    """
+    session = AsyncSessionLocal(bind=bind, info={"engine_name": name, "replica": replica})
+    async with session:
+        try:
+            with query_budget.track(_route_name(request)):
+                yield session
+        except Exception as e:
+            timeout = _pool_timeout(e)
+            if timeout is None:
+                raise
+            metrics.db_pool_timeouts_total.inc(engine=session.info["engine_name"])
+            raise HTTPException(
+                status_code=503,
+                detail={"info": "Database is busy, please retry", "error": str(timeout)},
+                headers={"Retry-After": "1"},
+            )
+
+
+async def get_async_session(request: Request, response: Response):
+    """
+    Session on the primary, for routes that write or must read their own writes,
+    and for the `@cached` / `@conditional_get` listings. Writers bump a listing's
+    version right after committing on the primary, so a replica still behind
+    that commit would get its stale page cached, and ETagged, under the new
+    version until the next write.
+    """
+    async with _api_session(request, async_engine, "async") as session:
+        if replica_router.replicas:
+            # Keep this client's reads on the primary until the replicas have caught up with the write
+            event.listen(session.sync_session, "after_commit", lambda _: response.set_cookie(
+                READ_PRIMARY_COOKIE, "1", max_age=READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax",
+            ))
+        yield session
+
+
+async def get_read_session(request: Request):
+    """
+    Session for read-only routes: on a replica picked by `replica_router`, or on
+    the primary when there are no healthy replicas or the client wrote within
+    the last READ_YOUR_WRITES_SECONDS. Not for version-keyed responses, see
+    `get_async_session`.
+    """
+    replica = None if request.cookies.get(READ_PRIMARY_COOKIE) else replica_router.choose()
+    if replica is None:
+        async with _api_session(request, async_engine, "async") as session:
+            yield session
+        return
+
+    replica.in_flight += 1
+    try:
+        async with _api_session(request, replica.engine, replica.name, replica) as session:
+            yield session
+    finally:
+        replica.in_flight -= 1
+
+
+def dialect_insert(db, table):
+    """
+    `insert()` from the session's dialect, for `on_conflict_do_nothing()` / `on_conflict_do_update()`.
+    PostgreSQL in production, SQLite for local runs.
+    """
+    if db.bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -0,0 +1,6 @@
+from enum import Enum
+
+class LeaderboardType(str, Enum):
+    XP = "xp"
+    STREAKS = "streaks"
+    GENERATIONS_24H = "generations-24h"
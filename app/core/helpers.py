@@ -1,4 +1,167 @@
+import base64
+import binascii
+import hashlib
+import json
+import random
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import select, func, tuple_, literal, cast, BigInteger
+
 
 def paginate(query, page: int, page_size: int):
     """Simple pagination utility."""
-    return query.offset((page - 1) * page_size).limit(page_size).all()
\ No newline at end of file
+    return query.offset((page - 1) * page_size).limit(page_size).all()
+
+
+async def paginate_async(db, query, page: int, page_size: int):
+    """Async counterpart of `paginate` for `select()` statements."""
+    return (await db.execute(query.offset((page - 1) * page_size).limit(page_size))).scalars().all()
+
+
+async def count_rows(db, query):
+    """Count the rows a `select()` statement would return."""
+    return await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+
+
+def encode_cursor(*values, key: str = None) -> str:
+    """
+    Pack the sort key of the last row of a page into an opaque cursor. `key`
+    names the ordering the values belong to, so `decode_cursor` can reject a
+    cursor replayed against another one.
+    """
+    values = [{"dt": value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    payload = values if key is None else {"k": key, "v": values}
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor: str, key: str = None) -> list:
+    """Unpack a cursor produced by `encode_cursor` with the same `key`."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if key is not None:
+            if not isinstance(payload, dict) or payload.get("k") != key:
+                raise ValueError("cursor from another ordering")
+            payload = payload["v"]
+        if not isinstance(payload, list):
+            raise ValueError("cursor is not a list of values")
+        return [datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value for value in payload]
+    except (ValueError, TypeError, KeyError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _ordering_key(columns) -> str:
+    """Short fingerprint of a keyset ordering, stored in its cursors."""
+    names = []
+    for column in columns:
+        owner = getattr(column, "class_", None)
+        if owner is not None:
+            names.append(f"{owner.__name__}.{column.key}")
+        else:
+            names.append(getattr(column, "key", None) or type(column.type).__name__)
+    return hashlib.sha1(",".join(names).encode()).hexdigest()[:8]
+
+
+def _matches_type(column, value) -> bool:
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return True
+    if isinstance(value, bool):
+        return python_type is bool
+    if python_type is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, python_type)
+
+
+def encode_keyset_cursor(columns, *values) -> str:
+    """Cursor continuing a `paginate_keyset` ordering on `columns` after the row whose sort key is `values`."""
+    return encode_cursor(*values, key=_ordering_key(columns))
+
+
+def decode_keyset_cursor(cursor: str, columns) -> list:
+    """
+    Unpack a cursor produced for the ordering on `columns`. One from another
+    ordering, or whose values don't fit the columns, is a 400.
+    """
+    values = decode_cursor(cursor, key=_ordering_key(columns))
+    if len(values) != len(columns) or not all(_matches_type(column, value) for column, value in zip(columns, values)):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _keyset_window(query, columns, page_size: int, cursor=None, page: int = 1):
+    """
+    Order `query` by `columns` (descending) and restrict it to one page.
+
+    With a decoded `cursor` the page starts right after that sort key, so the
+    database seeks through the index instead of scanning and discarding
+    `(page - 1) * page_size` rows. Without one it falls back to offset paging.
+    One extra row is fetched to know whether a next page exists.
+    """
+    query = query.order_by(*[column.desc() for column in columns])
+    if cursor is not None:
+        bounds = [literal(value, column.type) for column, value in zip(columns, cursor)]
+        query = query.filter(tuple_(*columns) < tuple_(*bounds))
+    else:
+        query = query.offset((page - 1) * page_size)
+    return query.limit(page_size + 1)
+
+
+def _next_cursor(rows, columns, page_size: int, sort_key=None):
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    if sort_key is not None:
+        return rows, encode_keyset_cursor(columns, *sort_key(rows[-1]))
+    return rows, encode_keyset_cursor(columns, *[getattr(rows[-1], column.key) for column in columns])
+
+
+def paginate_keyset(query, columns, page_size: int, cursor: str = None, page: int = 1, sort_key=None):
+    """
+    Keyset pagination for `Query` objects, returns `(rows, next_cursor)`.
+    `columns` must end with a unique column (usually the primary key). When a column is
+    an SQL expression rather than a mapped attribute, `sort_key(row)` must return the
+    row's values for `columns` so the next cursor can be built.
+    """
+    decoded = decode_keyset_cursor(cursor, columns) if cursor else None
+    rows = _keyset_window(query, columns, page_size, decoded, page).all()
+    return _next_cursor(rows, columns, page_size, sort_key)
+
+
+async def paginate_keyset_async(db, query, columns, page_size: int, cursor: str = None, page: int = 1, sort_key=None, scalars: bool = True):
+    """
+    Async counterpart of `paginate_keyset` for `select()` statements.
+    Pass `scalars=False` to get whole rows when the statement selects more than one entity.
+    """
+    decoded = decode_keyset_cursor(cursor, columns) if cursor else None
+    result = await db.execute(_keyset_window(query, columns, page_size, decoded, page))
+    rows = result.scalars().all() if scalars else result.all()
+    return _next_cursor(rows, columns, page_size, sort_key)
+
+
+# Seeded shuffles map ids through x -> (a * x + b) mod p, a bijection for p prime, so a
+# given seed always yields the same permutation and pages never repeat or drop items.
+SHUFFLE_PRIME = 2147483647  # 2^31 - 1
+
+
+def new_shuffle_seed() -> int:
+    """Fresh seed for a shuffled listing, clients send it back to page through the same order."""
+    return random.randrange(1, SHUFFLE_PRIME)
+
+
+def _shuffle_coefficients(seed: int):
+    rng = random.Random(seed)
+    return rng.randrange(1, SHUFFLE_PRIME), rng.randrange(0, SHUFFLE_PRIME)
+
+
+def shuffle_key(column, seed: int):
+    """SQL sort key that orders an integer `column` by the seeded permutation."""
+    a, b = _shuffle_coefficients(seed)
+    return (cast(column, BigInteger) * a + b) % SHUFFLE_PRIME
+
+
+def shuffle_value(value: int, seed: int) -> int:
+    """Python-side twin of `shuffle_key`, used to build the next cursor."""
+    a, b = _shuffle_coefficients(seed)
+    return (value * a + b) % SHUFFLE_PRIME
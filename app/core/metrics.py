@@ -0,0 +1,315 @@
+"""
+Prometheus metrics for the API.
+
+`MetricsMiddleware` times every HTTP request and labels it with the route
+template that served it (`/prompts/get-public-prompts/`, never the raw URL,
+so ids and query strings don't multiply the series). SQLAlchemy event hooks
+on both engines count the statements, rows and database time of each request
+and of the process as a whole, and the connection pool gauges are read when
+the metrics are scraped. `GET /metrics` renders everything in the Prometheus
+text exposition format:
+
+    http_request_duration_seconds_bucket{method="GET",route="/socialfeed/feed/",le="0.1"} 42.0
+    http_request_db_queries_bucket{method="GET",route="/socialfeed/feed/",le="5.0"} 40.0
+    db_pool_connections{engine="async",state="checked_out"} 3.0
+
+Metrics are kept per process; with several workers each one is scraped (or
+summed) separately.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+
+from app.core.cache import cache_stats
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Label used for requests that matched no route (404s, probes), so arbitrary URLs don't create series
+UNMATCHED_ROUTE = "<unmatched>"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+ROW_COUNT_BUCKETS = (0, 1, 10, 100, 1000, 10000)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> Iterable[Tuple[str, Sequence[str], Sequence[str], float]]:
+        """`(suffix, label names, label values, value)` for every series."""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield "", self.labels, key, value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._sums[key] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+        names = self.labels + ("le",)
+        for key, counts, total in series:
+            for bound, count in zip(self.buckets, counts):
+                yield "_bucket", names, key + (_format_value(bound),), count
+            yield "_sum", self.labels, key, total
+            yield "_count", self.labels, key, counts[-1]
+
+
+class GaugeCallback(Metric):
+    """A gauge whose series are read from `collect()` at scrape time, as `{label values: value}`."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str], collect: Callable[[], Dict[LabelValues, float]]):
+        super().__init__(name, documentation, labels)
+        self.collect = collect
+
+    def samples(self):
+        for key, value in sorted(self.collect().items()):
+            yield "", self.labels, key, value
+
+
+class CounterCallback(GaugeCallback):
+    """A counter kept elsewhere (e.g. the response cache), read at scrape time."""
+
+    kind = "counter"
+
+
+REGISTRY: List[Metric] = []
+
+
+def register(metric: Metric) -> Metric:
+    REGISTRY.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# HTTP
+
+http_requests_total = register(Counter(
+    "http_requests_total", "HTTP requests by route template and status code.", ("method", "route", "status"),
+))
+http_request_duration_seconds = register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"),
+))
+http_request_db_queries = register(Histogram(
+    "http_request_db_queries", "SQL statements issued per HTTP request.", ("method", "route"), QUERY_COUNT_BUCKETS,
+))
+http_request_db_rows = register(Histogram(
+    "http_request_db_rows", "Rows fetched or written per HTTP request.", ("method", "route"), ROW_COUNT_BUCKETS,
+))
+http_request_db_seconds = register(Histogram(
+    "http_request_db_seconds", "Time spent executing SQL per HTTP request.", ("method", "route"),
+))
+
+# Database
+
+db_queries_total = register(Counter("db_queries_total", "SQL statements executed.", ("engine",)))
+db_rows_total = register(Counter("db_rows_total", "Rows fetched or written by SQL statements.", ("engine",)))
+db_query_duration_seconds = register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time.", ("engine",),
+))
+db_pool_checkout_seconds = register(Histogram(
+    "db_pool_checkout_seconds", "Time API requests waited for a pooled connection.", ("engine",),
+))
+db_pool_timeouts_total = register(Counter(
+    "db_pool_timeouts_total", "Requests answered 503 because no pooled connection freed up in time.", ("engine",),
+))
+
+
+class RequestStats:
+    """Database work done on behalf of one HTTP request."""
+
+    __slots__ = ("queries", "rows", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.db_seconds = 0.0
+
+
+# The stats of the request being served, set by `MetricsMiddleware`. Statements
+# run outside a request (celery, scripts, startup) only count towards the totals.
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def _row_count(cursor) -> int:
+    if cursor.rowcount >= 0:
+        return cursor.rowcount
+    # The asyncpg and aiosqlite adapters buffer a SELECT's rows and report rowcount -1
+    rows = getattr(cursor, "_rows", None)
+    return len(rows) if rows is not None else 0
+
+
+# Engines by label, registered by `instrument_engine` (app/core/database.py)
+ENGINES = {}
+
+
+def instrument_engine(sync_engine, name: str):
+    """
+    Count the statements, rows and time of every statement `sync_engine`
+    executes and report its pool, labelled `engine=name`.
+    """
+    ENGINES[name] = sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        rows = _row_count(cursor)
+
+        db_queries_total.inc(engine=name)
+        db_rows_total.inc(rows, engine=name)
+        db_query_duration_seconds.observe(elapsed, engine=name)
+
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.rows += rows
+            stats.db_seconds += elapsed
+
+
+def _pool_connections() -> Dict[LabelValues, float]:
+    values = {}
+    for name, sync_engine in ENGINES.items():
+        pool = sync_engine.pool
+        # NullPool (aiosqlite, PgBouncer mode) keeps no connections to report
+        if not hasattr(pool, "checkedout"):
+            continue
+        values[(name, "size")] = pool.size()
+        values[(name, "checked_out")] = pool.checkedout()
+        values[(name, "idle")] = pool.checkedin()
+        values[(name, "overflow")] = max(pool.overflow(), 0)
+    return values
+
+
+register(GaugeCallback(
+    "db_pool_connections", "Connections of each engine's pool, by state.", ("engine", "state"), _pool_connections,
+))
+
+
+def _cache_counts(field: str) -> Callable[[], Dict[LabelValues, float]]:
+    return lambda: {(namespace,): counts[field] for namespace, counts in cache_stats().items()}
+
+
+register(CounterCallback("cache_hits_total", "Response cache hits by namespace.", ("namespace",), _cache_counts("hits")))
+register(CounterCallback("cache_misses_total", "Response cache misses by namespace.", ("namespace",), _cache_counts("misses")))
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording each HTTP request's latency, status code and
+    database work under the template of the route that served it.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            current_request.reset(token)
+
+            # The router stores the matched route in the scope
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            http_requests_total.inc(method=method, route=route, status=status_code)
+            http_request_duration_seconds.observe(elapsed, method=method, route=route)
+            http_request_db_queries.observe(stats.queries, method=method, route=route)
+            http_request_db_rows.observe(stats.rows, method=method, route=route)
+            http_request_db_seconds.observe(stats.db_seconds, method=method, route=route)
@@ -0,0 +1,131 @@
+"""
+Per-request query budget and N+1 detection, for development and tests.
+
+With `QUERY_BUDGET_MODE=warn` (or `raise`) the session dependencies
+(`get_async_session`, `get_read_session`) record every SQL statement run
+while the request holds its session. When the route is done, the statements
+are checked against the budget: no more than `QUERY_BUDGET_MAX_QUERIES`
+statements in total, and no statement *shape* (the SQL with its parameters
+stripped, so the same query for another id counts as a repeat) run more than
+`QUERY_BUDGET_MAX_REPEATS` times, which is what a query issued once per row
+of a listing (N+1) looks like. `warn` logs the offending request, `raise`
+fails it with `QueryBudgetExceeded`. The default, `off`, records nothing.
+
+Tests assert tighter budgets per route with `query_budget`, also available
+as a pytest fixture (tests/conftest.py):
+
+    def test_feed_has_no_n_plus_one(client, query_budget):
+        with query_budget(max_queries=8):
+            client.get("/socialfeed/feed/", params={"user_account": "0x1"})
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.constants import QUERY_BUDGET_MAX_QUERIES, QUERY_BUDGET_MAX_REPEATS, QUERY_BUDGET_MODE
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\?(\s*,\s*\?)+")
+
+
+def statement_shape(statement: str) -> str:
+    """`statement` with every placeholder, and every expanded `IN (?, ?, ...)` list, reduced to one `?`."""
+    shape = _PLACEHOLDER.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("?", shape)
+    return " ".join(shape.split())
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryReport:
+    """The statements one request ran."""
+
+    def __init__(self, route: str):
+        self.route = route
+        self.statements: List[str] = []
+
+    def repeated_shapes(self, max_repeats: int) -> Counter:
+        shapes = Counter(statement_shape(statement) for statement in self.statements)
+        return Counter({shape: count for shape, count in shapes.items() if count > max_repeats})
+
+    def problems(self, max_queries: int, max_repeats: int) -> List[str]:
+        problems = []
+        if len(self.statements) > max_queries:
+            problems.append(f"{self.route} ran {len(self.statements)} queries (budget {max_queries})")
+        for shape, count in self.repeated_shapes(max_repeats).most_common():
+            problems.append(f"{self.route} ran the same query {count} times (possible N+1): {shape[:300]}")
+        return problems
+
+
+# The report of the request being served, set by `track`
+current_report: ContextVar[Optional[QueryReport]] = ContextVar("current_report", default=None)
+
+# Reports collected by the active `query_budget` blocks
+_collectors: List[List[QueryReport]] = []
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_statement(conn, cursor, statement, parameters, context, executemany):
+    report = current_report.get()
+    if report is not None:
+        report.statements.append(statement)
+
+
+def _check(report: QueryReport):
+    for reports in _collectors:
+        reports.append(report)
+    if QUERY_BUDGET_MODE not in ("warn", "raise"):
+        return
+    problems = report.problems(QUERY_BUDGET_MAX_QUERIES, QUERY_BUDGET_MAX_REPEATS)
+    if not problems:
+        return
+    if QUERY_BUDGET_MODE == "raise":
+        raise QueryBudgetExceeded("\n".join(problems))
+    for problem in problems:
+        logger.warning("Query budget: %s", problem)
+
+
+@contextmanager
+def track(route: str):
+    """Record and check the statements run inside the block, used by the session dependencies."""
+    if QUERY_BUDGET_MODE not in ("warn", "raise") and not _collectors:
+        yield
+        return
+
+    report = QueryReport(route)
+    token = current_report.set(report)
+    try:
+        yield
+    finally:
+        current_report.reset(token)
+    _check(report)
+
+
+@contextmanager
+def query_budget(max_queries: int = QUERY_BUDGET_MAX_QUERIES, max_repeats: int = QUERY_BUDGET_MAX_REPEATS):
+    """
+    Fail with `QueryBudgetExceeded` if a request served inside the block runs
+    more than `max_queries` statements or one statement shape more than
+    `max_repeats` times. Yields the list of `QueryReport`s it collects.
+    """
+    reports: List[QueryReport] = []
+    _collectors.append(reports)
+    try:
+        yield reports
+    finally:
+        _collectors.remove(reports)
+
+    problems = [problem for report in reports for problem in report.problems(max_queries, max_repeats)]
+    if problems:
+        raise QueryBudgetExceeded("\n".join(problems))
+
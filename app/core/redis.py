@@ -0,0 +1,14 @@
+from redis import asyncio as aioredis
+
+from app.core.constants import REDIS_URL
+
+# Shared asyncio client for the API process. None when REDIS_URL isn't set,
+# in which case the Redis-backed stores fall back to their in-process versions.
+redis_client = aioredis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL else None
+
+
+def sync_redis_client():
+    """Blocking client for the celery worker, None when REDIS_URL isn't set."""
+    import redis
+
+    return redis.Redis.from_url(REDIS_URL, decode_responses=True) if REDIS_URL else None
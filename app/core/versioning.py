@@ -0,0 +1,130 @@
+"""
+Change counters and conditional GET support.
+
+Every *scope* (a response cache namespace such as `public_prompts`, or a
+per-user scope like `follows:<account>`) has a version number that the write
+endpoints bump whenever data read through that scope changes. The versions
+drive both the response cache keys (`app.core.cache`) and the ETags below:
+an ETag is a hash of the route, its parameters and the versions of the scopes
+it reads, so it can be computed and compared without running any query.
+
+    @router.get("/get-public-prompts/")
+    @conditional_get(PUBLIC_PROMPTS)
+    async def get_public_prompts(page: int = 1, db: AsyncSession = Depends(get_async_session)):
+        ...
+
+Versions live in Redis when `REDIS_URL` is set, otherwise in process.
+"""
+import functools
+import hashlib
+import inspect
+import json
+import logging
+from collections import Counter
+from typing import Callable, Iterable, List, Union
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core.redis import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class InMemoryVersionStore:
+    """In-process stand-in for `RedisVersionStore`, used for local runs and tests."""
+
+    def __init__(self):
+        self._versions = Counter()
+
+    async def get(self, scopes: List[str]) -> List[int]:
+        return [self._versions[scope] for scope in scopes]
+
+    async def bump(self, scope: str):
+        self._versions[scope] += 1
+
+
+class RedisVersionStore:
+    """Versions kept as Redis counters `version:<scope>`."""
+
+    def __init__(self, client):
+        self.client = client
+
+    @staticmethod
+    def _key(scope: str) -> str:
+        return f"version:{scope}"
+
+    async def get(self, scopes: List[str]) -> List[int]:
+        if not scopes:
+            return []
+        return [int(value or 0) for value in await self.client.mget([self._key(scope) for scope in scopes])]
+
+    async def bump(self, scope: str):
+        await self.client.incr(self._key(scope))
+
+
+version_store = RedisVersionStore(redis_client) if redis_client else InMemoryVersionStore()
+
+
+def follows_scope(account: str) -> str:
+    """Scope covering who `account` follows."""
+    return f"follows:{account}"
+
+
+async def get_versions(*scopes: str) -> List[int]:
+    return await version_store.get(list(scopes))
+
+
+async def bump_versions(*scopes: str):
+    """Record a change to the data read through `scopes`. Best effort, failures are only logged."""
+    for scope in scopes:
+        try:
+            await version_store.bump(scope)
+        except Exception as e:
+            logger.warning("Failed to bump version of %s: %s", scope, e)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so a W/ prefix doesn't matter
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(candidate.removeprefix("W/") == etag for candidate in candidates)
+
+
+def conditional_get(*scopes: Union[str, Callable[[dict], str]], exclude: Iterable[str] = ("db",)):
+    """
+    Give an async GET route a strong ETag derived from the versions of `scopes`
+    (names, or callables building a name from the route's arguments) and answer
+    a matching `If-None-Match` with 304 Not Modified before the route runs.
+    """
+    exclude = set(exclude)
+
+    def decorator(func):
+        route = f"{func.__module__}.{func.__name__}"
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        async def wrapper(*args, _conditional_request: Request, _conditional_response: Response, **kwargs):
+            etag = None
+            try:
+                names = [scope(kwargs) if callable(scope) else scope for scope in scopes]
+                params = {name: value for name, value in kwargs.items() if name not in exclude}
+                payload = json.dumps([route, jsonable_encoder(params), names, await get_versions(*names)], sort_keys=True)
+                etag = '"%s"' % hashlib.sha1(payload.encode()).hexdigest()
+            except Exception as e:
+                logger.warning("Failed to compute ETag for %s: %s", route, e)
+
+            if etag is not None:
+                if _etag_matches(_conditional_request.headers.get("if-none-match", ""), etag):
+                    return Response(status_code=304, headers={"ETag": etag})
+                _conditional_response.headers["ETag"] = etag
+            return await func(*args, **kwargs)
+
+        # Let FastAPI inject the request and response alongside the route's own parameters
+        wrapper.__signature__ = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter("_conditional_request", inspect.Parameter.KEYWORD_ONLY, annotation=Request),
+            inspect.Parameter("_conditional_response", inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ])
+        return wrapper
+
+    return decorator
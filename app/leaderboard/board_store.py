@@ -0,0 +1,160 @@
+"""
+Ranked leaderboard indexes.
+
+Every board is a sorted set of `user_account -> score`, kept up to date by
+`leaderboard.services.record_user_stats` and rebuilt from `user_stats` when it
+goes cold, so top-N, rank-of-user and around-me reads never touch the
+database. Ranks are descending by score, ties broken by account in reverse
+lexicographic order (Redis' own `ZREVRANGE` order).
+
+Boards that only rank recently active users also record when each member was
+last touched, and `prune` drops everyone older than a cutoff before reading.
+"""
+import asyncio
+from bisect import bisect_left, insort
+from typing import Iterable, List, Optional, Tuple
+
+from app.core.constants import LEADERBOARD_TTL_SECONDS
+from app.core.redis import redis_client
+
+
+class InMemoryLeaderboardStore:
+    """In-process stand-in for `RedisLeaderboardStore`, used for local runs and tests."""
+
+    def __init__(self):
+        self._scores = {}  # board -> {member: score}
+        self._ordered = {}  # board -> sorted [(score, member)]
+        self._touched = {}  # board -> {member: timestamp}
+        self._warm = set()
+        self._lock = asyncio.Lock()
+
+    def _discard(self, board: str, member: str):
+        scores, ordered = self._scores.setdefault(board, {}), self._ordered.setdefault(board, [])
+        if member in scores:
+            del ordered[bisect_left(ordered, (scores.pop(member), member))]
+        self._touched.get(board, {}).pop(member, None)
+
+    def _set(self, board: str, member: str, score: float, touched: Optional[float]):
+        self._discard(board, member)
+        self._scores[board][member] = score
+        insort(self._ordered[board], (score, member))
+        if touched is not None:
+            self._touched.setdefault(board, {})[member] = touched
+
+    async def is_warm(self, board: str) -> bool:
+        return board in self._warm
+
+    async def rebuild(self, board: str, entries: Iterable[Tuple[str, float, Optional[float]]]):
+        async with self._lock:
+            self._scores[board], self._ordered[board], self._touched[board] = {}, [], {}
+            for member, score, touched in entries:
+                self._set(board, member, score, touched)
+            self._warm.add(board)
+
+    async def update(self, board: str, member: str, score: float, touched: Optional[float] = None):
+        async with self._lock:
+            self._set(board, member, score, touched)
+
+    async def prune(self, board: str, before: float):
+        async with self._lock:
+            stale = [member for member, touched in self._touched.get(board, {}).items() if touched < before]
+            for member in stale:
+                self._discard(board, member)
+
+    async def count(self, board: str) -> int:
+        return len(self._ordered.get(board, []))
+
+    async def top(self, board: str, start: int, limit: int) -> List[Tuple[str, float]]:
+        ordered = self._ordered.get(board, [])
+        end = len(ordered) - start
+        return [(member, score) for score, member in reversed(ordered[max(end - limit, 0):max(end, 0)])]
+
+    async def rank(self, board: str, member: str) -> Optional[Tuple[int, float]]:
+        """Zero-based rank and score of `member`, None when it isn't on the board."""
+        score = self._scores.get(board, {}).get(member)
+        if score is None:
+            return None
+        ordered = self._ordered[board]
+        return len(ordered) - 1 - bisect_left(ordered, (score, member)), score
+
+    async def start_after(self, board: str, score: float, member: str) -> int:
+        """Rank of the first entry that sorts after `(score, member)`."""
+        ordered = self._ordered.get(board, [])
+        return len(ordered) - bisect_left(ordered, (score, member))
+
+
+class RedisLeaderboardStore:
+    """Boards kept as Redis sorted sets `leaderboard:<board>`."""
+
+    def __init__(self, client, ttl: int = LEADERBOARD_TTL_SECONDS):
+        self.client = client
+        self.ttl = ttl
+
+    @staticmethod
+    def _board_key(board: str) -> str:
+        return f"leaderboard:{board}"
+
+    @staticmethod
+    def _touched_key(board: str) -> str:
+        return f"leaderboard:{board}:touched"
+
+    @staticmethod
+    def _warm_key(board: str) -> str:
+        return f"leaderboard:warm:{board}"
+
+    async def is_warm(self, board: str) -> bool:
+        return bool(await self.client.exists(self._warm_key(board)))
+
+    async def rebuild(self, board: str, entries: Iterable[Tuple[str, float, Optional[float]]]):
+        entries = list(entries)
+        touched = {member: at for member, _, at in entries if at is not None}
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(self._board_key(board), self._touched_key(board))
+            if entries:
+                pipe.zadd(self._board_key(board), {member: score for member, score, _ in entries})
+            if touched:
+                pipe.zadd(self._touched_key(board), touched)
+            # The marker expiring makes the next read rebuild the board, correcting any drift
+            pipe.set(self._warm_key(board), 1, ex=self.ttl)
+            await pipe.execute()
+
+    async def update(self, board: str, member: str, score: float, touched: Optional[float] = None):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zadd(self._board_key(board), {member: score})
+            if touched is not None:
+                pipe.zadd(self._touched_key(board), {member: touched})
+            await pipe.execute()
+
+    async def prune(self, board: str, before: float):
+        stale = await self.client.zrangebyscore(self._touched_key(board), "-inf", f"({before}")
+        if stale:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.zrem(self._board_key(board), *stale)
+                pipe.zrem(self._touched_key(board), *stale)
+                await pipe.execute()
+
+    async def count(self, board: str) -> int:
+        return await self.client.zcard(self._board_key(board))
+
+    async def top(self, board: str, start: int, limit: int) -> List[Tuple[str, float]]:
+        if limit <= 0:
+            return []
+        return await self.client.zrevrange(self._board_key(board), start, start + limit - 1, withscores=True)
+
+    async def rank(self, board: str, member: str) -> Optional[Tuple[int, float]]:
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.zrevrank(self._board_key(board), member)
+            pipe.zscore(self._board_key(board), member)
+            rank, score = await pipe.execute()
+        return None if rank is None else (rank, score)
+
+    async def start_after(self, board: str, score: float, member: str) -> int:
+        current = await self.rank(board, member)
+        if current is not None and current[1] == score:
+            return current[0] + 1
+        # The member moved since the cursor was issued: resume below every entry
+        # scoring at least as much (Redis can't count ties by member across scores)
+        return await self.client.zcount(self._board_key(board), score, "+inf")
+
+
+leaderboard_store = RedisLeaderboardStore(redis_client) if redis_client else InMemoryLeaderboardStore()
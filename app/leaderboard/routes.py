@@ -1,42 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from app.core.database import get_session
-from app.core.helpers import paginate
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import get_async_session, get_read_session
+from app.core.enums.leaderboards import LeaderboardType
+from typing import Optional
 from . import schemas, services, models
-import random
 
 router = APIRouter()
 
+
+async def _leaderboard_page(board: LeaderboardType, page: int, page_size: int, cursor: Optional[str], include_total: bool, db: AsyncSession):
+    results, total, next_cursor = await services.read_leaderboard_page(board, page, page_size, cursor, include_total, db)
+    return {
+        "results": results,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "next_cursor": next_cursor
+    }
+
+
 @router.get("/generations-24h/")
-def leaderboard_generations_24h(page: int = 1, page_size: int = 10, db: Session = Depends(get_session)):
+async def leaderboard_generations_24h(page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100), cursor: Optional[str] = None, include_total: bool = True, db: AsyncSession = Depends(get_read_session)):
     """
     Leaderboard based on the number of generations in the last 24 hours with pagination.
+    Pass the returned `next_cursor` as **cursor** to page by score instead of offset.
     """
     try:
-        last_24_hours = datetime.utcnow() - timedelta(hours=24)
-
-        query = db.query(models.UserStats).filter(models.UserStats.last_generation >= last_24_hours).order_by(models.UserStats.total_generations.desc())
-        total_count = query.count()
-        users = paginate(query, page, page_size)
-
-        results = [{"user_account": user.user_account, "total_generations": user.total_generations} for user in users]
-
-        # Add 10 dummy entries with random wallet addresses
-        for _ in range(10):
-            # Generate a random hex string of 64 characters
-            wallet_address = "0x" + ''.join(random.choice('0123456789abcdef') for _ in range(64))
-            results.append({
-                "user_account": wallet_address, 
-                "total_generations": random.randint(1, 100)
-            })
-
-        return {
-            "results": results,
-            "total": total_count + 10,  # Adjust total count
-            "page": page,
-            "page_size": page_size
-        }
+        return await _leaderboard_page(LeaderboardType.GENERATIONS_24H, page, page_size, cursor, include_total, db)
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get leaderboard based on the number of generations in the last 24 hours",
@@ -47,32 +39,15 @@ def leaderboard_generations_24h(page: int = 1, page_size: int = 10, db: Session
 
 
 @router.get("/streaks/")
-def leaderboard_streaks(page: int = 1, page_size: int = 10, db: Session = Depends(get_session)):
+async def leaderboard_streaks(page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100), cursor: Optional[str] = None, include_total: bool = True, db: AsyncSession = Depends(get_read_session)):
     """
     Leaderboard based on the number of consecutive days with generations, with pagination.
+    Pass the returned `next_cursor` as **cursor** to page by score instead of offset.
     """
     try:
-        query = db.query(models.UserStats).order_by(models.UserStats.streak_days.desc())
-        total_count = query.count()
-        users = paginate(query, page, page_size)
-
-        results = [{"user_account": user.user_account, "streak_days": user.streak_days} for user in users]
-
-        # Add 10 dummy entries with random wallet addresses
-        for _ in range(10):
-            # Generate a random hex string of 64 characters
-            wallet_address = "0x" + ''.join(random.choice('0123456789abcdef') for _ in range(64))
-            results.append({
-                "user_account": wallet_address,
-                "streak_days": random.randint(1, 30)
-            })
-
-        return {
-            "results": results,
-            "total": total_count + 10,  # Adjust total count
-            "page": page,
-            "page_size": page_size
-        }
+        return await _leaderboard_page(LeaderboardType.STREAKS, page, page_size, cursor, include_total, db)
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get leaderboard based on the number of consecutive days with generations",
@@ -83,35 +58,65 @@ def leaderboard_streaks(page: int = 1, page_size: int = 10, db: Session = Depend
 
 
 @router.get("/xp/")
-def leaderboard_xp(page: int = 1, page_size: int = 10, db: Session = Depends(get_session)):
+async def leaderboard_xp(page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100), cursor: Optional[str] = None, include_total: bool = True, db: AsyncSession = Depends(get_read_session)):
     """
     Leaderboard based on XP with pagination.
+    Pass the returned `next_cursor` as **cursor** to page by score instead of offset.
     """
     try:
-        query = db.query(models.UserStats).order_by(models.UserStats.xp.desc())
-        total_count = query.count()
-        users = paginate(query, page, page_size)
-
-        results = [{"user_account": user.user_account, "xp": user.xp} for user in users]
-
-        # Add 10 dummy entries with random wallet addresses
-        for _ in range(10):
-            # Generate a random hex string of 64 characters
-            wallet_address = "0x" + ''.join(random.choice('0123456789abcdef') for _ in range(64))
-            results.append({
-                "user_account": wallet_address,
-                "xp": random.randint(1, 1000)
-            })
-
-        return {
-            "results": results,
-            "total": total_count + 10,  # Adjust total count
-            "page": page,
-            "page_size": page_size
-        }
+        return await _leaderboard_page(LeaderboardType.XP, page, page_size, cursor, include_total, db)
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get leaderboard based on XP",
             "error": str(e),
         }
-        raise HTTPException(status_code=500, detail=detail)
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=detail)
+
+
+
+@router.get("/{board}/rank/")
+async def leaderboard_user_rank(board: LeaderboardType, user_account: str, db: AsyncSession = Depends(get_read_session)):
+    """
+    A user's rank and score on a leaderboard.
+
+    - **board**: `xp`, `streaks` or `generations-24h`.
+    - **user_account**: The account to look up.
+    """
+    try:
+        entry = await services.user_rank(board, user_account, db)
+    except Exception as e:
+        detail = {
+            "info": "Failed to get leaderboard rank",
+            "error": str(e),
+        }
+        raise HTTPException(status_code=500, detail=detail)
+
+    if entry is None:
+        raise HTTPException(status_code=404, detail="User is not on this leaderboard")
+    return entry
+
+
+
+@router.get("/{board}/around/")
+async def leaderboard_around_user(board: LeaderboardType, user_account: str, radius: int = Query(5, ge=0, le=50), db: AsyncSession = Depends(get_read_session)):
+    """
+    The entries ranked just above and below a user on a leaderboard.
+
+    - **board**: `xp`, `streaks` or `generations-24h`.
+    - **user_account**: The account to center on.
+    - **radius**: Number of entries on each side of the user, at most 50.
+    """
+    try:
+        results = await services.around_user(board, user_account, radius, db)
+    except Exception as e:
+        detail = {
+            "info": "Failed to get leaderboard entries around user",
+            "error": str(e),
+        }
+        raise HTTPException(status_code=500, detail=detail)
+
+    if results is None:
+        raise HTTPException(status_code=404, detail="User is not on this leaderboard")
+    return {"user_account": user_account, "results": results}
@@ -1,4 +1,132 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import HTTPException
+from . import models
+from .board_store import leaderboard_store
+from app.core.enums.leaderboards import LeaderboardType
+from app.core.helpers import encode_cursor, decode_cursor
 
+logger = logging.getLogger(__name__)
 
+# UserStats column each board ranks by, also the score's name in responses
+BOARD_COLUMNS = {
+    LeaderboardType.XP: "xp",
+    LeaderboardType.STREAKS: "streak_days",
+    LeaderboardType.GENERATIONS_24H: "total_generations",
+}
+
+# Boards that only rank users active within this window
+ACTIVE_WINDOWS = {
+    LeaderboardType.GENERATIONS_24H: timedelta(hours=24),
+}
+
+
+def _timestamp(dt: datetime) -> float:
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _active_since(board: LeaderboardType) -> Optional[datetime]:
+    window = ACTIVE_WINDOWS.get(board)
+    return datetime.utcnow() - window if window else None
+
+
+async def warm_leaderboard(board: LeaderboardType, db: AsyncSession):
+    """Rebuild a board from the user_stats table."""
+    column = getattr(models.UserStats, BOARD_COLUMNS[board])
+    query = select(models.UserStats.user_account, column, models.UserStats.last_generation)
+    active_since = _active_since(board)
+    if active_since:
+        query = query.filter(models.UserStats.last_generation >= active_since)
+
+    rows = (await db.execute(query)).all()
+    await leaderboard_store.rebuild(board.value, [
+        (account, score or 0, _timestamp(last_generation) if active_since else None)
+        for account, score, last_generation in rows
+    ])
+
+
+async def _ensure_warm(board: LeaderboardType, db: AsyncSession):
+    if not await leaderboard_store.is_warm(board.value):
+        await warm_leaderboard(board, db)
+    active_since = _active_since(board)
+    if active_since:
+        await leaderboard_store.prune(board.value, _timestamp(active_since))
+
+
+async def record_user_stats(user_stat: models.UserStats):
+    """
+    Push a user's fresh stats into every board.
+    Best effort like the feed fan-out, a stale board is corrected on its next rebuild.
+    """
+    try:
+        for board, column in BOARD_COLUMNS.items():
+            touched = _timestamp(user_stat.last_generation) if board in ACTIVE_WINDOWS else None
+            await leaderboard_store.update(board.value, user_stat.user_account, getattr(user_stat, column) or 0, touched)
+    except Exception as e:
+        logger.warning("Failed to update leaderboards for %s: %s", user_stat.user_account, e)
+
+
+def _entry(board: LeaderboardType, rank: int, member: str, score: float) -> dict:
+    return {"rank": rank + 1, "user_account": member, BOARD_COLUMNS[board]: int(score)}
+
+
+async def read_leaderboard_page(board: LeaderboardType, page: int, page_size: int, cursor: Optional[str], include_total: bool, db: AsyncSession):
+    """One page of a board, best first. Returns `(results, total, next_cursor)`."""
+    await _ensure_warm(board, db)
+
+    if cursor:
+        values = decode_cursor(cursor, key=f"leaderboard:{board.value}")
+        if len(values) != 2 or isinstance(values[0], bool) or not isinstance(values[0], (int, float)) or not isinstance(values[1], str):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        score, member = values
+        start = await leaderboard_store.start_after(board.value, score, member)
+    else:
+        start = (page - 1) * page_size
+
+    entries = await leaderboard_store.top(board.value, start, page_size + 1)
+    next_cursor = None
+    if len(entries) > page_size:
+        entries = entries[:page_size]
+        member, score = entries[-1]
+        next_cursor = encode_cursor(score, member, key=f"leaderboard:{board.value}")
+
+    results = [_entry(board, start + offset, member, score) for offset, (member, score) in enumerate(entries)]
+    total = await leaderboard_store.count(board.value) if include_total else None
+    return results, total, next_cursor
+
+
+async def user_rank(board: LeaderboardType, user_account: str, db: AsyncSession) -> Optional[dict]:
+    """The user's rank and score on a board, None when they aren't ranked."""
+    await _ensure_warm(board, db)
+    ranked = await leaderboard_store.rank(board.value, user_account)
+    if ranked is None:
+        return None
+    return _entry(board, ranked[0], user_account, ranked[1])
+
+
+async def around_user(board: LeaderboardType, user_account: str, radius: int, db: AsyncSession) -> Optional[list]:
+    """The `radius` entries above and below the user on a board, None when they aren't ranked."""
+    await _ensure_warm(board, db)
+    ranked = await leaderboard_store.rank(board.value, user_account)
+    if ranked is None:
+        return None
+    start = max(ranked[0] - radius, 0)
+    entries = await leaderboard_store.top(board.value, start, ranked[0] - start + radius + 1)
+    return [_entry(board, start + offset, member, score) for offset, (member, score) in enumerate(entries)]
+
+
+if __name__ == "__main__":
+    # Rebuild every board from user_stats, e.g. after a bulk import
+    from app.core.database import AsyncSessionLocal
+
+    async def rebuild_all():
+        async with AsyncSessionLocal() as session:
+            for board in LeaderboardType:
+                await warm_leaderboard(board, session)
+
+    asyncio.run(rebuild_all())
+    print("Rebuilt leaderboards")
@@ -1,5 +1,8 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.socialfeed.routes import router as socialfeed_router
@@ -7,10 +10,28 @@ from app.prompts.routes import router as prompts_router
 from app.leaderboard.routes import router as leaderboard_router
 from app.marketplace.routes import router as marketplace_router
 from app.encrypt.routes import router as encrypt_router
+from app.core.cache import cache_stats
+from app.core.constants import ENGAGEMENT_WRITE_BEHIND
+from app.core.database import get_session_with_ctx_manager, replica_router
+from app.core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
+from app.socialfeed.write_behind import engagement_queue, run_in_process_flusher, InMemoryEngagementQueue
+
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Without Redis there is no celery worker to flush the write-behind queue, flush it in process
+    flusher = None
+    if ENGAGEMENT_WRITE_BEHIND and isinstance(engagement_queue, InMemoryEngagementQueue):
+        flusher = asyncio.create_task(run_in_process_flusher(engagement_queue, get_session_with_ctx_manager))
+    health_checks = asyncio.create_task(replica_router.run_health_checks()) if replica_router.replicas else None
+    yield
+    if flusher is not None:
+        flusher.cancel()
+    if health_checks is not None:
+        health_checks.cancel()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,6 +41,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Added last so it wraps the whole stack and times every request
+app.add_middleware(MetricsMiddleware)
+
 @app.get("/", include_in_schema=False)
 async def redirect_to_docs():
     """
@@ -33,6 +57,22 @@ def read_root():
     return {"Hello": "Service is live"}
 
 
+@app.get("/cache-stats", include_in_schema=False)
+def read_cache_stats():
+    """
+    Response cache hit/miss counts per namespace.
+    """
+    return cache_stats()
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """
+    Request, database, pool and cache metrics in the Prometheus text format.
+    """
+    return PlainTextResponse(render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+
 app.include_router(socialfeed_router, prefix="/socialfeed")
 app.include_router(prompts_router, prefix="/prompts")
 app.include_router(leaderboard_router, prefix="/leaderboard")
@@ -1,15 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from collections import Counter
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 import random
-from app.core.database import get_session
+from app.core.database import get_async_session, get_read_session
 from . import schemas, services    
 from app.prompts import models
+from app.prompts import services as prompt_services
 from sqlalchemy import func, select, desc
 from app.socialfeed import models as socialfeed_models
-from app.core.helpers import paginate
 from app.core.enums.premium_filters import PremiumPromptFilterType
-from app.socialfeed.services import update_user_stats
+from app.core.cache import cached, invalidate, PREMIUM_PROMPTS, STATIC
+from app.core.versioning import conditional_get
+from app.socialfeed.services import update_user_stats, update_user_stats_bulk, add_to_timeline
+from app.leaderboard.services import record_user_stats
 
 
 
@@ -18,7 +23,7 @@ router = APIRouter()
 
 
 @router.post("/add-premium-prompts/", response_model=schemas.PremiumPromptResponse)
-async def add_premium_prompt(premium_data: schemas.PremiumPromptCreate, db: Session = Depends(get_session)):
+async def add_premium_prompt(premium_data: schemas.PremiumPromptCreate, db: AsyncSession = Depends(get_async_session)):
     """
     Add a new premium prompt in the marketplace.
 
@@ -52,32 +57,19 @@ async def add_premium_prompt(premium_data: schemas.PremiumPromptCreate, db: Sess
         )
 
         db.add(new_premium_prompt)
-        db.commit()
-        db.refresh(new_premium_prompt)
 
-        # Update user stats (generation count and XP)
-        update_user_stats(new_premium_prompt.account_address, db)
-        likes_count = db.query(socialfeed_models.PostLike).filter(socialfeed_models.PostLike.prompt_id == new_premium_prompt.id).count()
-        comments_count = db.query(socialfeed_models.PostComment).filter(socialfeed_models.PostComment.prompt_id == new_premium_prompt.id).count()
+        # Update user stats (generation count and XP) in the same transaction as the prompt
+        user_stat = await update_user_stats(new_premium_prompt.account_address, db)
+
+        await db.commit()
+        await invalidate(PREMIUM_PROMPTS)
+
+        # Deliver the prompt to the feed timeline and the stats to the leaderboards
+        await add_to_timeline([new_premium_prompt])
+        await record_user_stats(user_stat)
 
         # Return the response using the Pydantic model schema
-        return schemas.PremiumPromptResponse(
-            id=new_premium_prompt.id,
-            ipfs_image_url=new_premium_prompt.ipfs_image_url,
-            prompt=new_premium_prompt.prompt,
-            post_name=new_premium_prompt.post_name,
-            ai_model=new_premium_prompt.ai_model,
-            chain=new_premium_prompt.chain,  
-            public=new_premium_prompt.public,  
-            account_address=new_premium_prompt.account_address,
-            cid=new_premium_prompt.cid,
-            collection_name=new_premium_prompt.collection_name,
-            max_supply=new_premium_prompt.max_supply,
-            prompt_nft_price=new_premium_prompt.prompt_nft_price,
-            likes=likes_count or 0,
-            comments=comments_count or 0,
-            grant_access=new_premium_prompt.grant_access or False
-        )
+        return services.to_premium_prompt_response(new_premium_prompt)
     except Exception as e:
         detail = {
             "info": "Failed to add premium prompt",
@@ -87,53 +79,95 @@ async def add_premium_prompt(premium_data: schemas.PremiumPromptCreate, db: Sess
 
 
 
+@router.post("/add-premium-prompts/bulk/", response_model=List[schemas.PremiumPromptResponse])
+async def add_premium_prompts_bulk(bulk_data: schemas.PremiumPromptBulkCreate, db: AsyncSession = Depends(get_async_session)):
+    """
+    Add up to 100 premium prompts in one request, returned in the order given.
+    The creators' stats (generation count and XP) are updated together with the insert.
+    """
+    try:
+        new_prompts = await prompt_services.insert_prompts([
+            {
+                "ipfs_image_url": premium_data.ipfs_image_url,
+                "prompt": premium_data.prompt,
+                "post_name": premium_data.post_name,
+                "ai_model": premium_data.ai_model,
+                "chain": premium_data.chain,
+                "cid": premium_data.cid,
+                "prompt_tag": premium_data.prompt_tag,
+                "prompt_type": models.PromptTypeEnum.PREMIUM,
+                "account_address": premium_data.account_address,
+                "public": False,
+                "collection_name": premium_data.collection_name,
+                "max_supply": premium_data.max_supply,
+                "prompt_nft_price": premium_data.prompt_nft_price
+            }
+            for premium_data in bulk_data.prompts
+        ], db)
+
+        # Update user stats (generation count and XP) for every creator at once
+        user_stats = await update_user_stats_bulk(Counter(prompt.account_address for prompt in new_prompts), db)
+
+        await db.commit()
+        await invalidate(PREMIUM_PROMPTS)
+
+        # Deliver the prompts to the feed timeline and the stats to the leaderboards
+        await add_to_timeline(new_prompts)
+        for user_stat in user_stats:
+            await record_user_stats(user_stat)
+
+        return [services.to_premium_prompt_response(prompt) for prompt in new_prompts]
+    except Exception as e:
+        detail = {
+            "info": "Failed to add premium prompts",
+            "error": str(e),
+        }
+        raise HTTPException(status_code=500, detail=detail)
+
+
+
 
 
 
 @router.get("/get-premium-prompts/", response_model=schemas.PremiumPromptListResponse)
-async def get_premium_prompts(page: int = 1, page_size: int = 10, db: Session = Depends(get_session)):
+@conditional_get(PREMIUM_PROMPTS)
+@cached(PREMIUM_PROMPTS)
+async def get_premium_prompts(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    viewer_account: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_session),
+):
     """
     Get all premium prompts.
+
+    - **page**: Page number, used when no cursor is given.
+    - **page_size**: Number of prompts per page.
+    - **cursor**: `next_cursor` from the previous response, pages in constant time regardless of depth.
+    - **include_total**: Set to false to skip counting every premium prompt.
+    - **viewer_account**: Set to get `liked_by_me` on every prompt.
     """
     try:
         # Query for premium prompts and order by created_at in descending order
-        query = db.query(models.Prompt).filter(models.Prompt.prompt_type == models.PromptTypeEnum.PREMIUM).order_by(models.Prompt.created_at.desc())
+        query = select(models.Prompt).filter(models.Prompt.prompt_type == models.PromptTypeEnum.PREMIUM)
     
-        total_prompts = query.count()
-        paginated_prompts = query.offset((page - 1) * page_size).limit(page_size).all()
-
-        prompts_with_counts = []
-        for prompt in paginated_prompts:
-            likes_count = db.query(socialfeed_models.PostLike).filter(socialfeed_models.PostLike.prompt_id == prompt.id).count()
-            comments_count = db.query(socialfeed_models.PostComment).filter(socialfeed_models.PostComment.prompt_id == prompt.id).count()
-
-            prompts_with_counts.append(
-                schemas.PremiumPromptResponse(
-                    id=prompt.id,
-                    ipfs_image_url=prompt.ipfs_image_url,
-                    prompt=prompt.prompt,
-                    post_name=prompt.post_name,
-                    ai_model=prompt.ai_model,
-                    chain=prompt.chain,  
-                    public=prompt.public,  
-                    account_address=prompt.account_address,
-                    cid=prompt.cid,
-                    collection_name=prompt.collection_name,
-                    max_supply=prompt.max_supply,
-                    prompt_nft_price=prompt.prompt_nft_price,
-                    likes=likes_count or 0,
-                    comments=comments_count or 0,
-                    grant_access=prompt.grant_access or False
-                )
-            )
-
-        
+        paginated_prompts, total_prompts, next_cursor = await prompt_services.list_prompts(
+            db, query, page, page_size, cursor=cursor, include_total=include_total
+        )
+        liked = await prompt_services.viewer_likes(paginated_prompts, viewer_account, db)
+        prompts_with_counts = [services.to_premium_prompt_response(prompt, liked) for prompt in paginated_prompts]
+
         return schemas.PremiumPromptListResponse(
             prompts=prompts_with_counts,
             total=total_prompts,
             page=page,
-            page_size=page_size
+            page_size=page_size,
+            next_cursor=next_cursor
         )
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get premium prompts",
@@ -144,6 +178,7 @@ async def get_premium_prompts(page: int = 1, page_size: int = 10, db: Session =
 
 
 @router.get("/premium-prompt-filters/")
+@cached(STATIC, ttl=60 * 60)
 async def get_premium_prompt_filters():
     """
     Get all available premium prompt filters.
@@ -161,71 +196,38 @@ async def get_premium_prompt_filters():
 
 
 @router.post("/filter-premium-prompts/", response_model=schemas.PremiumPromptListResponse)
-async def filter_premium_prompts(filter_data: schemas.PremiumPromptFilterRequest, db: Session = Depends(get_session)):
+async def filter_premium_prompts(filter_data: schemas.PremiumPromptFilterRequest, db: AsyncSession = Depends(get_read_session)):
     try:
-        query = db.query(models.Prompt).filter(models.Prompt.prompt_type == models.PromptTypeEnum.PREMIUM)
+        query = select(models.Prompt).filter(models.Prompt.prompt_type == models.PromptTypeEnum.PREMIUM)
 
         # Filter by `recent`, `popular`, or `trending`
+        order_by = prompt_services.RECENT_ORDER
         if filter_data.filter_type == PremiumPromptFilterType.RECENT:
             last_24_hours = datetime.utcnow() - timedelta(hours=24)
             query = query.filter(models.Prompt.created_at >= last_24_hours)
         elif filter_data.filter_type == PremiumPromptFilterType.POPULAR:
-            query = query.order_by(func.random())
+            # Time-decayed scores maintained on write, read through (prompt_type, score) indexes
+            order_by = (models.Prompt.popularity_score, models.Prompt.id)
         elif filter_data.filter_type == PremiumPromptFilterType.TRENDING:
-            query = query.outerjoin(socialfeed_models.PostLike).group_by(models.Prompt.id).order_by(func.count(socialfeed_models.PostLike.id).desc())
-
-        total_prompts = query.count()
-        paginated_prompts = query.offset((filter_data.page - 1) * filter_data.page_size).limit(filter_data.page_size).all()
-
-        prompt_ids = [prompt.id for prompt in paginated_prompts]
-
-        # Batch query for likes and comments count
-        likes_comments_data = (
-            db.query(
-                models.Prompt.id,
-                func.count(socialfeed_models.PostLike.id).label('likes_count'),
-                func.count(socialfeed_models.PostComment.id).label('comments_count')
-            )
-            .outerjoin(socialfeed_models.PostLike, socialfeed_models.PostLike.prompt_id == models.Prompt.id)
-            .outerjoin(socialfeed_models.PostComment, socialfeed_models.PostComment.prompt_id == models.Prompt.id)
-            .filter(models.Prompt.id.in_(prompt_ids))
-            .group_by(models.Prompt.id)
-            .all()
+            order_by = (models.Prompt.trending_score, models.Prompt.id)
+
+        paginated_prompts, total_prompts, next_cursor = await prompt_services.list_prompts(
+            db, query, filter_data.page, filter_data.page_size, cursor=filter_data.cursor, order_by=order_by
         )
 
-        # Map likes and comments count by prompt ID, with index-based access
-        likes_comments_map = {lc[0]: {'likes_count': lc[1], 'comments_count': lc[2]} for lc in likes_comments_data}
-
-        # Prepare the response
-        prompts_with_counts = []
-        for prompt in paginated_prompts:
-            likes_comments = likes_comments_map.get(prompt.id, {'likes_count': 0, 'comments_count': 0})
-            prompts_with_counts.append(
-                schemas.PremiumPromptResponse(
-                    id=prompt.id,
-                    ipfs_image_url=prompt.ipfs_image_url,
-                    prompt=prompt.prompt,
-                    post_name=prompt.post_name,
-                    ai_model=prompt.ai_model,
-                    chain=prompt.chain,  
-                    public=prompt.public,  
-                    account_address=prompt.account_address,
-                    cid=prompt.cid,
-                    collection_name=prompt.collection_name,
-                    max_supply=prompt.max_supply,
-                    prompt_nft_price=prompt.prompt_nft_price,
-                    likes=likes_comments['likes_count'],
-                    comments=likes_comments['comments_count'],
-                    grant_access=prompt.grant_access
-                )
-            )
+        # Likes and comments are denormalized onto the prompt row
+        liked = await prompt_services.viewer_likes(paginated_prompts, filter_data.viewer_account, db)
+        prompts_with_counts = [services.to_premium_prompt_response(prompt, liked) for prompt in paginated_prompts]
 
         return schemas.PremiumPromptListResponse(
             prompts=prompts_with_counts,
             total=total_prompts,
             page=filter_data.page,
-            page_size=filter_data.page_size
+            page_size=filter_data.page_size,
+            next_cursor=next_cursor
         )
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to filter premium prompts",
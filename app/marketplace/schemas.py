@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 from app.core.enums.tags import PromptTagEnum
 from app.core.enums.premium_filters import PremiumPromptFilterType
 
@@ -20,6 +20,10 @@ class PremiumPromptCreate(BaseModel):
         from_attributes = True
 
 
+class PremiumPromptBulkCreate(BaseModel):
+    prompts: List[PremiumPromptCreate] = Field(..., min_length=1, max_length=100, description="Prompts to add (at most 100)")
+
+
 class PremiumPromptResponse(BaseModel):
     id: int
     ipfs_image_url: str
@@ -36,6 +40,7 @@ class PremiumPromptResponse(BaseModel):
     prompt_nft_price: float
     likes: Optional[int]
     comments: Optional[int]
+    liked_by_me: Optional[bool] = None  # Only set when the listing is requested with a viewer_account
 
     class Config:
         from_attributes = True
@@ -43,14 +48,17 @@ class PremiumPromptResponse(BaseModel):
 
 class PremiumPromptListResponse(BaseModel):
     prompts: list[PremiumPromptResponse]
-    total: int  # Total number of premium prompts
+    total: Optional[int] = None  # Total number of premium prompts (omitted when include_total is false)
     page: int  # Current page number
     page_size: int  # Number of prompts per page
+    next_cursor: Optional[str] = None  # Opaque cursor for the next page, None on the last page
 
     class Config:
         from_attributes = True
 
 class PremiumPromptFilterRequest(BaseModel):
     filter_type: Optional[PremiumPromptFilterType] = Field(None, description="Filter by 'recent', 'popular', or 'trending'")
-    page: Optional[int] = Field(1, description="Page number for pagination")
-    page_size: Optional[int] = Field(10, description="Number of premium prompts per page")
\ No newline at end of file
+    page: int = Field(1, ge=1, description="Page number for pagination")
+    page_size: int = Field(10, ge=1, le=100, description="Number of premium prompts per page")
+    cursor: Optional[str] = Field(None, description="Cursor from the previous page, takes precedence over page")
+    viewer_account: Optional[str] = Field(None, description="Set to get liked_by_me on every prompt")
\ No newline at end of file
@@ -1,3 +1,26 @@
+from typing import Optional
 from sqlalchemy.orm import Session
+from app.prompts import models
+from . import schemas
 
 
+def to_premium_prompt_response(prompt: models.Prompt, liked: Optional[set] = None) -> schemas.PremiumPromptResponse:
+    """`liked` is the set of prompt ids the viewer liked, None leaves `liked_by_me` unset."""
+    return schemas.PremiumPromptResponse(
+        id=prompt.id,
+        ipfs_image_url=prompt.ipfs_image_url,
+        prompt=prompt.prompt,
+        post_name=prompt.post_name,
+        ai_model=prompt.ai_model,
+        chain=prompt.chain,
+        public=prompt.public,
+        account_address=prompt.account_address,
+        cid=prompt.cid,
+        collection_name=prompt.collection_name,
+        max_supply=prompt.max_supply,
+        prompt_nft_price=prompt.prompt_nft_price,
+        likes=prompt.likes_count,
+        comments=prompt.comments_count,
+        grant_access=prompt.grant_access or False,
+        liked_by_me=prompt.id in liked if liked is not None else None
+    )
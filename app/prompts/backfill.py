@@ -0,0 +1,33 @@
+"""
+Recompute the denormalized `likes_count` / `comments_count` counters on prompts.
+
+The counters are maintained by the like and comment endpoints; run this after
+bulk imports or manual data fixes to bring them back in line:
+
+    python -m app.prompts.backfill
+"""
+from sqlalchemy import select, func, update
+from sqlalchemy.orm import Session
+
+from app.core.database import get_session_with_ctx_manager
+from app.prompts.models import Prompt
+from app.socialfeed.models import PostLike, PostComment
+
+
+def backfill_engagement_counts(db: Session) -> int:
+    """
+    Reset every prompt's counters from the post_likes / post_comments tables.
+    Returns the number of prompts updated.
+    """
+    likes = select(func.count(PostLike.id)).where(PostLike.prompt_id == Prompt.id).scalar_subquery()
+    comments = select(func.count(PostComment.id)).where(PostComment.prompt_id == Prompt.id).scalar_subquery()
+
+    result = db.execute(update(Prompt).values(likes_count=likes, comments_count=comments))
+    db.commit()
+    return result.rowcount
+
+
+if __name__ == "__main__":
+    with get_session_with_ctx_manager() as session:
+        updated = backfill_engagement_counts(session)
+    print(f"Backfilled engagement counters for {updated} prompts")
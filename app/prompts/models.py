@@ -1,31 +1,49 @@
 from datetime import datetime
-from sqlalchemy import Column, String, Boolean, Integer, ForeignKey, Enum, Float, DateTime
+from sqlalchemy import Column, String, Boolean, Integer, BigInteger, ForeignKey, Enum, Float, DateTime, Index, text
 from sqlalchemy.orm import relationship
 from app.core.database import Base  # Assuming you're using a Base class from SQLAlchemy setup
 from app.core.enums.tags import PromptTagEnum, PromptTypeEnum
+from app.prompts import scoring
 
 
 class Prompt(Base):
     __tablename__ = 'prompts'
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     ipfs_image_url = Column(String, nullable=False)
     prompt = Column(String, nullable=False)
-    account_address = Column(String, nullable=False, index=True)
-    post_name = Column(String, nullable=False, index=True)
-    public = Column(Boolean, default=True, index=True)
-    cid = Column(String, nullable=True, index=True, default=None) # only relevant for PREMIUM prompts
-    prompt_tag = Column(Enum(PromptTagEnum), nullable=False, index=True)
-    chain = Column(String, nullable=True, index=True)
-    ai_model = Column(String, index=True, nullable=True)
-    prompt_type = Column(Enum(PromptTypeEnum), nullable=False, index=True)  # PUBLIC or PREMIUM
-    collection_name = Column(String, nullable=True, index=True)  # Only relevant for PREMIUM prompts
-    max_supply = Column(Integer, nullable=True, index=True)  # Only relevant for PREMIUM prompts
-    prompt_nft_price = Column(Float, nullable=True, index=True)  # Only relevant for PREMIUM prompts
-    grant_access = Column(Boolean, default=False, index=True) # Only relevant for PREMIUM prompts
-    video_url = Column(String, nullable=True, index=True) # Only premium promots
+    account_address = Column(String, nullable=False)
+    post_name = Column(String, nullable=False)
+    public = Column(Boolean, default=True)
+    cid = Column(String, nullable=True, default=None) # only relevant for PREMIUM prompts
+    prompt_tag = Column(Enum(PromptTagEnum), nullable=False)
+    chain = Column(String, nullable=True)
+    ai_model = Column(String, nullable=True)
+    prompt_type = Column(Enum(PromptTypeEnum), nullable=False)  # PUBLIC or PREMIUM
+    collection_name = Column(String, nullable=True)  # Only relevant for PREMIUM prompts
+    max_supply = Column(Integer, nullable=True)  # Only relevant for PREMIUM prompts
+    prompt_nft_price = Column(Float, nullable=True)  # Only relevant for PREMIUM prompts
+    grant_access = Column(Boolean, default=False) # Only relevant for PREMIUM prompts
+    video_url = Column(String, nullable=True) # Only premium promots
     created_at = Column(DateTime, default=datetime.utcnow)
+    likes_count = Column(Integer, nullable=False, default=0, server_default='0')  # Kept in sync by like_prompt
+    comments_count = Column(Integer, nullable=False, default=0, server_default='0')  # Kept in sync by comment_prompt
+    popularity_score = Column(Float, nullable=False, default=scoring.initial_popularity_score, server_default='0')  # See app/prompts/scoring.py
+    trending_score = Column(Float, nullable=False, default=scoring.initial_trending_score, server_default='0')  # See app/prompts/scoring.py
+    engagement_seq = Column(BigInteger, nullable=False, default=0, server_default='0')  # Last write-behind event counted, see app/socialfeed/write_behind.py
 
     # Relationships
     comments = relationship('PostComment', back_populates='prompt', cascade="all, delete-orphan")
-    likes = relationship('PostLike', back_populates='prompt', cascade="all, delete-orphan")
\ No newline at end of file
+    likes = relationship('PostLike', back_populates='prompt', cascade="all, delete-orphan")
+
+    # Indexes follow the listing queries (see tests/test_query_plans.py), the
+    # search indexes are expression indexes that only exist in the migrations
+    __table_args__ = (
+        Index('ix_prompts_prompt_type_created_at', 'prompt_type', 'created_at', 'id'),
+        Index('ix_prompts_prompt_type_prompt_tag_created_at', 'prompt_type', 'prompt_tag', 'created_at', 'id'),
+        Index('ix_prompts_account_address_created_at', 'account_address', 'created_at', 'id'),
+        Index('ix_prompts_created_at', 'created_at', 'id'),
+        Index('ix_prompts_public_created_at', 'created_at', 'id', postgresql_where=text("prompt_type = 'PUBLIC' AND public")),
+        Index('ix_prompts_prompt_type_popularity_score', 'prompt_type', 'popularity_score'),
+        Index('ix_prompts_prompt_type_trending_score', 'prompt_type', 'trending_score'),
+    )
\ No newline at end of file
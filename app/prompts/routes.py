@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.core.database import get_session
-from . import schemas, services, models
-from app.socialfeed import models as socialfeed_models
-from app.core.helpers import paginate
-from app.socialfeed.services import update_user_stats
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from app.core.database import get_async_session, get_read_session
+from . import schemas, services, models, search
+from app.core.cache import cached, invalidate, PUBLIC_PROMPTS, PREMIUM_PROMPTS, STATIC
+from app.core.versioning import conditional_get
+from app.socialfeed.services import add_to_timeline
 
 
 
@@ -13,7 +14,7 @@ router = APIRouter()
 
 
 @router.post("/add-public-prompts/", response_model=schemas.PublicPromptResponse)
-async def add_public_prompt(public_data: schemas.PublicPromptCreate, db: Session = Depends(get_session)):
+async def add_public_prompt(public_data: schemas.PublicPromptCreate, db: AsyncSession = Depends(get_async_session)):
     """
     Add a new public prompt to the database.
     """
@@ -30,25 +31,15 @@ async def add_public_prompt(public_data: schemas.PublicPromptCreate, db: Session
         )
 
         db.add(new_prompt)
-        db.commit()
-        db.refresh(new_prompt)
+        await db.commit()
+        await db.refresh(new_prompt)
+        await invalidate(PUBLIC_PROMPTS)
 
-        # Count likes and comments (initially they are 0 since it's a new prompt)
-        likes_count = db.query(socialfeed_models.PostLike).filter(socialfeed_models.PostLike.prompt_id == new_prompt.id).count()
-        comments_count = db.query(socialfeed_models.PostComment).filter(socialfeed_models.PostComment.prompt_id == new_prompt.id).count()
+        # Deliver the prompt to the precomputed feed timeline
+        await add_to_timeline([new_prompt])
 
         # Return the response
-        return schemas.PublicPromptResponse(
-            id=new_prompt.id,
-            ipfs_image_url=new_prompt.ipfs_image_url,
-            prompt=new_prompt.prompt,
-            account_address=new_prompt.account_address,
-            post_name=new_prompt.post_name,
-            public=new_prompt.public,
-            prompt_tag=new_prompt.prompt_tag,
-            likes_count=likes_count,
-            comments_count=comments_count
-        )
+        return services.to_public_prompt_response(new_prompt)
     except Exception as e:
         detail = {
             "info": "Failed to add public prompt",
@@ -58,7 +49,43 @@ async def add_public_prompt(public_data: schemas.PublicPromptCreate, db: Session
 
 
 
+@router.post("/add-public-prompts/bulk/", response_model=List[schemas.PublicPromptResponse])
+async def add_public_prompts_bulk(bulk_data: schemas.PublicPromptBulkCreate, db: AsyncSession = Depends(get_async_session)):
+    """
+    Add up to 100 public prompts in one request, returned in the order given.
+    """
+    try:
+        new_prompts = await services.insert_prompts([
+            {
+                "ipfs_image_url": public_data.ipfs_image_url,
+                "prompt": public_data.prompt,
+                "account_address": public_data.account_address,
+                "post_name": public_data.post_name,
+                "public": True,
+                "prompt_tag": public_data.prompt_tag,
+                "prompt_type": models.PromptTypeEnum.PUBLIC
+            }
+            for public_data in bulk_data.prompts
+        ], db)
+
+        await db.commit()
+        await invalidate(PUBLIC_PROMPTS)
+
+        # Deliver the prompts to the precomputed feed timeline
+        await add_to_timeline(new_prompts)
+
+        return [services.to_public_prompt_response(prompt) for prompt in new_prompts]
+    except Exception as e:
+        detail = {
+            "info": "Failed to add public prompts",
+            "error": str(e),
+        }
+        raise HTTPException(status_code=500, detail=detail)
+
+
+
 @router.get("/prompt-tags/")
+@cached(STATIC, ttl=60 * 60)
 async def get_prompt_tags():
     """
     Get all available prompt tags.
@@ -75,67 +102,46 @@ async def get_prompt_tags():
 
 
 @router.get("/get-public-prompts/", response_model=schemas.PublicPromptListResponse)
-async def get_public_prompts(page: int = 1, page_size: int = 10, db: Session = Depends(get_session)):
-    # Query for all public prompts, ordered by creation date
-    query = db.query(models.Prompt).filter(models.Prompt.prompt_type == models.PromptTypeEnum.PUBLIC).order_by(models.Prompt.created_at.desc())
-
-    # Get total count for pagination
-    total_prompts = query.count()
-
-    # Apply pagination
-    public_prompts = query.offset((page - 1) * page_size).limit(page_size).all()
+@conditional_get(PUBLIC_PROMPTS)
+@cached(PUBLIC_PROMPTS)
+async def get_public_prompts(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    viewer_account: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Get public prompts, newest first.
 
-    # Get all prompt IDs for bulk fetching likes and comments
-    prompt_ids = [prompt.id for prompt in public_prompts]
+    - **page**: Page number, used when no cursor is given.
+    - **page_size**: Number of prompts per page.
+    - **cursor**: `next_cursor` from the previous response, pages in constant time regardless of depth.
+    - **include_total**: Set to false to skip counting every public prompt.
+    - **viewer_account**: Set to get `liked_by_me` on every prompt.
+    """
+    # Query for all public prompts, ordered by creation date
+    query = select(models.Prompt).filter(models.Prompt.prompt_type == models.PromptTypeEnum.PUBLIC)
 
-    # Fetch likes and comments in bulk for all prompts
-    likes_comments_data = (
-        db.query(
-            models.Prompt.id,
-            func.count(socialfeed_models.PostLike.id).label('likes_count'),
-            func.count(socialfeed_models.PostComment.id).label('comments_count')
-        )
-        .outerjoin(socialfeed_models.PostLike, socialfeed_models.PostLike.prompt_id == models.Prompt.id)
-        .outerjoin(socialfeed_models.PostComment, socialfeed_models.PostComment.prompt_id == models.Prompt.id)
-        .filter(models.Prompt.id.in_(prompt_ids))
-        .group_by(models.Prompt.id)
-        .all()
+    # Likes and comments are denormalized onto the prompt row
+    public_prompts, total_prompts, next_cursor = await services.list_prompts(
+        db, query, page, page_size, cursor=cursor, include_total=include_total
     )
-
-    # Create a mapping for likes and comments based on the fetched data
-    likes_comments_map = {lc[0]: lc for lc in likes_comments_data}
-
-    # Construct the response with counts
-    prompts_with_counts = []
-    for prompt in public_prompts:
-        likes_comments = likes_comments_map.get(prompt.id, None)
-        likes_count = likes_comments.likes_count if likes_comments else 0
-        comments_count = likes_comments.comments_count if likes_comments else 0
-
-        prompts_with_counts.append(
-            schemas.PublicPromptResponse(
-                id=prompt.id,
-                ipfs_image_url=prompt.ipfs_image_url,
-                prompt=prompt.prompt,
-                account_address=prompt.account_address,
-                post_name=prompt.post_name,
-                public=prompt.public,
-                prompt_tag=prompt.prompt_tag,
-                likes_count=likes_count,
-                comments_count=comments_count
-            )
-        )
+    liked = await services.viewer_likes(public_prompts, viewer_account, db)
+    prompts_with_counts = [services.to_public_prompt_response(prompt, liked) for prompt in public_prompts]
 
     # Return the list wrapped in the `PublicPromptListResponse` schema
     return schemas.PublicPromptListResponse(
         prompts=prompts_with_counts,
         total=total_prompts,
         page=page,
-        page_size=page_size
+        page_size=page_size,
+        next_cursor=next_cursor
     )
 
 @router.post("/filter-public-prompts/", response_model=schemas.PublicPromptListResponse)
-async def filter_public_prompts(filter_data: schemas.PublicPromptFilterRequest, db: Session = Depends(get_session)):
+async def filter_public_prompts(filter_data: schemas.PublicPromptFilterRequest, db: AsyncSession = Depends(get_read_session)):
     """
     Endpoint to filter public prompts with optional filtering by prompt tag and visibility.
 
@@ -143,10 +149,12 @@ async def filter_public_prompts(filter_data: schemas.PublicPromptFilterRequest,
     - **public**: Boolean flag to filter prompts by visibility. If `True`, returns only public prompts; if `False**, returns private ones.
     - **page**: Page number for pagination. Default is 1.
     - **page_size**: Number of prompts per page. Default is 10.
+    - **cursor**: `next_cursor` from the previous response, takes precedence over `page`.
+    - **viewer_account**: Set to get `liked_by_me` on every prompt.
 
     Returns a paginated list of public prompts matching the provided criteria.
     """
-    query = db.query(models.Prompt).filter(models.Prompt.prompt_type == models.PromptTypeEnum.PUBLIC)
+    query = select(models.Prompt).filter(models.Prompt.prompt_type == models.PromptTypeEnum.PUBLIC)
     
     # Filter by prompt_tag if it's not set to "all"
     if filter_data.prompt_tag and filter_data.prompt_tag.lower() != 'all':
@@ -157,66 +165,88 @@ async def filter_public_prompts(filter_data: schemas.PublicPromptFilterRequest,
         query = query.filter(models.Prompt.public == filter_data.public)
     
     # Apply pagination
-    total_prompts = query.count()
-    paginated_prompts = query.offset((filter_data.page - 1) * filter_data.page_size).limit(filter_data.page_size).all()
-    
-    # Get all prompt IDs for bulk fetching likes and comments
-    prompt_ids = [prompt.id for prompt in paginated_prompts]
-
-    # Fetch likes and comments in bulk for all prompts
-    likes_comments_data = (
-        db.query(
-            models.Prompt.id,
-            func.count(socialfeed_models.PostLike.id).label('likes_count'),
-            func.count(socialfeed_models.PostComment.id).label('comments_count')
-        )
-        .outerjoin(socialfeed_models.PostLike, socialfeed_models.PostLike.prompt_id == models.Prompt.id)
-        .outerjoin(socialfeed_models.PostComment, socialfeed_models.PostComment.prompt_id == models.Prompt.id)
-        .filter(models.Prompt.id.in_(prompt_ids))
-        .group_by(models.Prompt.id)
-        .all()
+    paginated_prompts, total_prompts, next_cursor = await services.list_prompts(
+        db, query, filter_data.page, filter_data.page_size, cursor=filter_data.cursor
     )
-
-    # Create a mapping for likes and comments based on the fetched data
-    likes_comments_map = {lc[0]: lc for lc in likes_comments_data}
-
-    # Construct the response with counts
-    prompts_with_counts = []
-    for prompt in paginated_prompts:
-        likes_comments = likes_comments_map.get(prompt.id, None)
-        likes_count = likes_comments.likes_count if likes_comments else 0
-        comments_count = likes_comments.comments_count if likes_comments else 0
-
-        prompts_with_counts.append(
-            schemas.PublicPromptResponse(
-                id=prompt.id,
-                ipfs_image_url=prompt.ipfs_image_url,
-                prompt=prompt.prompt,
-                account_address=prompt.account_address,
-                post_name=prompt.post_name,
-                public=prompt.public,
-                prompt_tag=prompt.prompt_tag,
-                likes_count=likes_count,
-                comments_count=comments_count
-            )
-        )
+    liked = await services.viewer_likes(paginated_prompts, filter_data.viewer_account, db)
+    prompts_with_counts = [services.to_public_prompt_response(prompt, liked) for prompt in paginated_prompts]
 
     # Return the list wrapped in the `PublicPromptListResponse` schema
     return schemas.PublicPromptListResponse(
         prompts=prompts_with_counts,
         total=total_prompts,
         page=filter_data.page,
-        page_size=filter_data.page_size
+        page_size=filter_data.page_size,
+        next_cursor=next_cursor
     )
 
 
+@router.get("/search/", response_model=schemas.PromptSearchResponse)
+async def search_prompts(
+    q: str = Query(..., min_length=1, max_length=200),
+    prompt_tag: Optional[models.PromptTagEnum] = None,
+    prompt_type: Optional[models.PromptTypeEnum] = None,
+    chain: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+):
+    """
+    Search public and premium prompts by text, best match first.
+
+    - **q**: Words to look for in the prompt, post name, collection name and AI model. Close spellings of the post and collection names match too.
+    - **prompt_tag**: Only return prompts with this tag.
+    - **prompt_type**: Only return `public` or `premium` prompts.
+    - **chain**: Only return prompts on this chain.
+    - **page**: Page number, used when no cursor is given.
+    - **page_size**: Number of results per page.
+    - **cursor**: `next_cursor` from the previous response, takes precedence over `page`.
+    """
+    try:
+        results, next_cursor = await search.search_prompts(
+            db, q, page, page_size, cursor=cursor, prompt_tag=prompt_tag, prompt_type=prompt_type, chain=chain
+        )
+        return schemas.PromptSearchResponse(
+            results=[
+                schemas.PromptSearchResult(
+                    id=prompt.id,
+                    prompt_type=prompt.prompt_type,
+                    ipfs_image_url=prompt.ipfs_image_url,
+                    prompt=prompt.prompt,
+                    account_address=prompt.account_address,
+                    post_name=prompt.post_name,
+                    prompt_tag=prompt.prompt_tag,
+                    collection_name=prompt.collection_name,
+                    ai_model=prompt.ai_model,
+                    chain=prompt.chain,
+                    likes_count=prompt.likes_count,
+                    comments_count=prompt.comments_count,
+                    rank=rank
+                )
+                for prompt, rank in results
+            ],
+            page=page,
+            page_size=page_size,
+            next_cursor=next_cursor
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        detail = {
+            "info": "Failed to search prompts",
+            "error": str(e),
+        }
+        raise HTTPException(status_code=500, detail=detail)
+
+
 @router.put("/prompts/{prompt_id}/grant_access")
-async def grant_access_to_prompt(prompt_id: int, db: Session = Depends(get_session)):  # Use your existing get_session dependency
+async def grant_access_to_prompt(prompt_id: int, db: AsyncSession = Depends(get_async_session)):  # Use your existing get_session dependency
     """
     Grants access to a premium prompt by setting grant_access to True.
     """
 
-    prompt = await db.query(models.Prompt).filter(models.Prompt.id == prompt_id).first()
+    prompt = await db.get(models.Prompt, prompt_id)
 
     if not prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
@@ -226,5 +256,6 @@ async def grant_access_to_prompt(prompt_id: int, db: Session = Depends(get_sessi
 
     prompt.grant_access = True
     await db.commit()
+    await invalidate(PREMIUM_PROMPTS)
 
     return {"message": "Access granted to prompt"}
\ No newline at end of file
@@ -14,6 +14,10 @@ class PublicPromptCreate(BaseModel):
         from_attributes = True
 
 
+class PublicPromptBulkCreate(BaseModel):
+    prompts: List[PublicPromptCreate] = Field(..., min_length=1, max_length=100, description="Prompts to add (at most 100)")
+
+
 class PublicPromptResponse(BaseModel):
     id: int
     ipfs_image_url: str
@@ -24,6 +28,7 @@ class PublicPromptResponse(BaseModel):
     prompt_tag: PromptTagEnum
     likes_count: Optional[int] = 0
     comments_count: Optional[int] = 0
+    liked_by_me: Optional[bool] = None  # Only set when the listing is requested with a viewer_account
 
     class Config:
         from_attributes = True
@@ -31,9 +36,10 @@ class PublicPromptResponse(BaseModel):
 
 class PublicPromptListResponse(BaseModel):
     prompts: List[PublicPromptResponse]
-    total: int  # Total number of prompts available
+    total: Optional[int] = None  # Total number of prompts available (omitted when include_total is false)
     page: int  # Current page number
     page_size: int  # Number of prompts per page
+    next_cursor: Optional[str] = None  # Opaque cursor for the next page, None on the last page
 
     class Config:
         from_attributes = True
@@ -42,8 +48,33 @@ class PublicPromptListResponse(BaseModel):
 class PublicPromptFilterRequest(BaseModel):
     prompt_tag: Optional[str] = "all"  # Allow 'all' as a valid string
     public: Optional[bool] = Field(True, description="Filter by visibility flag (public)")
-    page: Optional[int] = Field(1, description="Page number for pagination")
-    page_size: Optional[int] = Field(10, description="Number of prompts per page")
+    page: int = Field(1, ge=1, description="Page number for pagination")
+    page_size: int = Field(10, ge=1, le=100, description="Number of prompts per page")
+    cursor: Optional[str] = Field(None, description="Cursor from the previous page, takes precedence over page")
+    viewer_account: Optional[str] = Field(None, description="Set to get liked_by_me on every prompt")
 
 
+class PromptSearchResult(BaseModel):
+    id: int
+    prompt_type: PromptTypeEnum
+    ipfs_image_url: str
+    prompt: str
+    account_address: str
+    post_name: str
+    prompt_tag: PromptTagEnum
+    collection_name: Optional[str] = None  # Only set on premium prompts
+    ai_model: Optional[str] = None
+    chain: Optional[str] = None
+    likes_count: int
+    comments_count: int
+    rank: float  # Relevance, higher is better
+
+    class Config:
+        from_attributes = True
+
 
+class PromptSearchResponse(BaseModel):
+    results: List[PromptSearchResult]
+    page: int  # Current page number
+    page_size: int  # Number of results per page
+    next_cursor: Optional[str] = None  # Opaque cursor for the next page, None on the last page
@@ -0,0 +1,103 @@
+"""
+Time-decayed popularity and trending scores for prompts.
+
+A prompt's score is the exponentially decayed sum of its engagement events
+(likes, comments, plus one "creation" event so fresh prompts get a head start):
+
+    score(now) = sum(weight_i * exp(-(now - t_i) / tau))
+
+Every score shrinks by the same factor as time passes, so ranking only needs
+`sum(weight_i * exp((t_i - SCORE_EPOCH) / tau))`, which never changes except
+when an event is added. It is stored as its natural log to stay in range
+forever. Adding an event is then a log-add-exp, done in SQL inside the same
+UPDATE that bumps the like/comment counter, and the columns are indexed so
+the marketplace filters become an ordered index read.
+"""
+import math
+from datetime import datetime
+
+from sqlalchemy import Float, case, cast, extract, func, literal
+
+SCORE_EPOCH = datetime(2024, 1, 1)
+_SCORE_EPOCH_SECONDS = (SCORE_EPOCH - datetime(1970, 1, 1)).total_seconds()
+
+# Half-lives: popularity is long-lived, trending reacts within a day or so
+POPULARITY_HALF_LIFE_HOURS = 24 * 30
+TRENDING_HALF_LIFE_HOURS = 24
+
+CREATION_WEIGHT = 1.0
+LIKE_WEIGHT = 1.0
+COMMENT_WEIGHT = 2.0
+
+# Past this gap the smaller term no longer changes the sum in double precision
+_LOG_ADD_CUTOFF = 50.0
+
+
+def _tau_seconds(half_life_hours: float) -> float:
+    return half_life_hours * 3600 / math.log(2)
+
+
+def event_term(weight: float, at: datetime, half_life_hours: float) -> float:
+    """Log-space contribution of one event of `weight` happening at `at`."""
+    return math.log(weight) + (at - SCORE_EPOCH).total_seconds() / _tau_seconds(half_life_hours)
+
+
+def log_add(a: float, b: float) -> float:
+    """ln(exp(a) + exp(b)) without overflow."""
+    high, low = max(a, b), min(a, b)
+    if high - low >= _LOG_ADD_CUTOFF:
+        return high
+    return high + math.log1p(math.exp(low - high))
+
+
+def initial_popularity_score() -> float:
+    return event_term(CREATION_WEIGHT, datetime.utcnow(), POPULARITY_HALF_LIFE_HOURS)
+
+
+def initial_trending_score() -> float:
+    return event_term(CREATION_WEIGHT, datetime.utcnow(), TRENDING_HALF_LIFE_HOURS)
+
+
+def events_term(events, half_life_hours: float) -> float:
+    """Log-space contribution of several `(weight, at)` events, see `event_term`."""
+    terms = [event_term(weight, at, half_life_hours) for weight, at in events]
+    total = terms[0]
+    for term in terms[1:]:
+        total = log_add(total, term)
+    return total
+
+
+def event_term_sql(log_weight, at, half_life_hours: float):
+    """SQL twin of `event_term`, `log_weight` being ln(weight)."""
+    return log_weight + (cast(extract("epoch", at), Float) - _SCORE_EPOCH_SECONDS) / _tau_seconds(half_life_hours)
+
+
+def events_term_sql(term, peak):
+    """
+    Aggregate SQL twin of `events_term` over a group of `event_term_sql` values,
+    `peak` being their max (terms far below it are dropped, as in `log_add`).
+    """
+    return peak + func.ln(func.sum(case((term - peak > -_LOG_ADD_CUTOFF, func.exp(term - peak)), else_=0.0)))
+
+
+def log_add_sql(column, term):
+    """SQL twin of `log_add` for a score column and a constant (or bound parameter) term."""
+    if isinstance(term, (int, float)):
+        term = literal(term)
+    return case(
+        (column - term >= _LOG_ADD_CUTOFF, column),
+        (term - column >= _LOG_ADD_CUTOFF, term),
+        (column >= term, column + func.ln(1 + func.exp(term - column))),
+        else_=term + func.ln(1 + func.exp(column - term)),
+    )
+
+
+def score_bump(prompt_model, weight: float, at: datetime = None) -> dict:
+    """
+    `.values()` for an UPDATE on prompts that records one engagement event of `weight`.
+    """
+    at = at or datetime.utcnow()
+    return {
+        "popularity_score": log_add_sql(prompt_model.popularity_score, event_term(weight, at, POPULARITY_HALF_LIFE_HOURS)),
+        "trending_score": log_add_sql(prompt_model.trending_score, event_term(weight, at, TRENDING_HALF_LIFE_HOURS)),
+    }
@@ -0,0 +1,150 @@
+"""
+Full-text and fuzzy search over prompts.
+
+On PostgreSQL a prompt's search document is a weighted tsvector of its post
+name (A), collection name (B), AI model (C) and prompt text (D), matched with
+`websearch_to_tsquery` through the GIN expression index created by migration
+7c1d4e8a2f90. Post and collection names are also matched by pg_trgm word
+similarity (a second GIN index) so typos and partial words still find
+something. The SQL below must stay identical to the indexed expressions,
+otherwise PostgreSQL falls back to a sequential scan.
+
+SQLite (local runs) uses an FTS5 table `prompts_fts` over the same columns,
+created on the first search and kept in sync by triggers, plus a LIKE on the
+names in place of the trigram match.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import Float, case, func, literal, literal_column, or_, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.helpers import paginate_keyset_async
+from app.socialfeed import write_behind
+from . import models
+
+SEARCH_CONFIG = "'english'"
+
+# Indexed by ix_prompts_search_document
+SEARCH_DOCUMENT_SQL = (
+    "(setweight(to_tsvector('english', post_name), 'A') || "
+    "setweight(to_tsvector('english', coalesce(collection_name, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(ai_model, '')), 'C') || "
+    "setweight(to_tsvector('english', prompt), 'D'))"
+)
+
+# Indexed by ix_prompts_search_names_trgm
+SEARCH_NAMES_SQL = "(post_name || ' ' || coalesce(collection_name, ''))"
+
+_SQLITE_FTS_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS prompts_fts USING fts5(
+        post_name, collection_name, ai_model, prompt, content='prompts', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prompts_fts_insert AFTER INSERT ON prompts BEGIN
+        INSERT INTO prompts_fts(rowid, post_name, collection_name, ai_model, prompt)
+        VALUES (new.id, new.post_name, new.collection_name, new.ai_model, new.prompt);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prompts_fts_delete AFTER DELETE ON prompts BEGIN
+        INSERT INTO prompts_fts(prompts_fts, rowid, post_name, collection_name, ai_model, prompt)
+        VALUES ('delete', old.id, old.post_name, old.collection_name, old.ai_model, old.prompt);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS prompts_fts_update AFTER UPDATE OF post_name, collection_name, ai_model, prompt ON prompts BEGIN
+        INSERT INTO prompts_fts(prompts_fts, rowid, post_name, collection_name, ai_model, prompt)
+        VALUES ('delete', old.id, old.post_name, old.collection_name, old.ai_model, old.prompt);
+        INSERT INTO prompts_fts(rowid, post_name, collection_name, ai_model, prompt)
+        VALUES (new.id, new.post_name, new.collection_name, new.ai_model, new.prompt);
+    END
+    """,
+]
+
+# Set once `prompts_fts` is known to exist in this process' SQLite database
+_sqlite_fts_ready = False
+
+
+async def _ensure_sqlite_fts(db: AsyncSession):
+    global _sqlite_fts_ready
+    if _sqlite_fts_ready:
+        return
+    exists = await db.scalar(text("SELECT 1 FROM sqlite_master WHERE name = 'prompts_fts'"))
+    for statement in _SQLITE_FTS_DDL:
+        await db.execute(text(statement))
+    if not exists:
+        # Index the prompts inserted before the table existed
+        await db.execute(text("INSERT INTO prompts_fts(prompts_fts) VALUES ('rebuild')"))
+    await db.commit()
+    _sqlite_fts_ready = True
+
+
+def _postgres_match(q: str):
+    document = literal_column(SEARCH_DOCUMENT_SQL)
+    names = literal_column(SEARCH_NAMES_SQL)
+    query = func.websearch_to_tsquery(literal_column(SEARCH_CONFIG), q)
+    matches = or_(document.op("@@")(query), literal(q).op("<%")(names))
+    rank = func.ts_rank_cd(document, query, type_=Float) + func.word_similarity(q, names, type_=Float)
+    return matches, rank
+
+
+def _sqlite_match(q: str):
+    # Quote every word so user input can't inject FTS5 syntax, the last one as a prefix
+    words = re.findall(r"\w+", q)
+    terms = " ".join('"%s"' % word for word in words) + ("*" if words else "")
+    fts = (
+        select(literal_column("rowid").label("id"), (-func.bm25(literal_column("prompts_fts"), 4.0, 2.0, 1.0, 0.5)).label("rank"))
+        .select_from(text("prompts_fts"))
+        .where(text("prompts_fts MATCH :terms").bindparams(terms=terms or '""'))
+        .subquery()
+    )
+    pattern = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    name_match = or_(
+        models.Prompt.post_name.ilike(pattern, escape="\\"),
+        models.Prompt.collection_name.ilike(pattern, escape="\\"),
+    )
+    matches = or_(models.Prompt.id.in_(select(fts.c.id)), name_match)
+    rank = (
+        func.coalesce(select(fts.c.rank).where(fts.c.id == models.Prompt.id).scalar_subquery(), 0.0)
+        + case((name_match, 0.5), else_=0.0)
+    )
+    return matches, rank.cast(Float)
+
+
+async def search_prompts(
+    db: AsyncSession,
+    q: str,
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None,
+    prompt_tag: Optional[models.PromptTagEnum] = None,
+    prompt_type: Optional[models.PromptTypeEnum] = None,
+    chain: Optional[str] = None,
+):
+    """
+    One page of the prompts matching `q`, best match first.
+    Returns `([(prompt, rank)], next_cursor)`.
+    """
+    if db.bind.dialect.name == "postgresql":
+        matches, rank = _postgres_match(q)
+    else:
+        await _ensure_sqlite_fts(db)
+        matches, rank = _sqlite_match(q)
+
+    query = select(models.Prompt, rank.label("rank")).filter(matches)
+    if prompt_tag is not None:
+        query = query.filter(models.Prompt.prompt_tag == prompt_tag)
+    if prompt_type is not None:
+        query = query.filter(models.Prompt.prompt_type == prompt_type)
+    if chain is not None:
+        query = query.filter(models.Prompt.chain == chain)
+
+    rows, next_cursor = await paginate_keyset_async(
+        db, query, [rank, models.Prompt.id], page_size, cursor=cursor, page=page,
+        sort_key=lambda row: (row.rank, row.Prompt.id), scalars=False,
+    )
+    await write_behind.overlay_pending([row.Prompt for row in rows])
+    return [(row.Prompt, row.rank) for row in rows], next_cursor
@@ -1,3 +1,174 @@
+import math
+from typing import List, Optional
+from sqlalchemy import bindparam, func, insert, literal, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from . import models, schemas
+from . import models, schemas, scoring
+from app.core import cache
+from app.core.helpers import paginate_keyset_async, count_rows
+from app.socialfeed.models import PostLike, PostComment
+from app.socialfeed.services import liked_prompt_ids
+from app.socialfeed import write_behind
+
+
+def listing_namespace(prompt_type: models.PromptTypeEnum) -> str:
+    """Response cache namespace holding the listings of prompts of `prompt_type`."""
+    return cache.PUBLIC_PROMPTS if prompt_type == models.PromptTypeEnum.PUBLIC else cache.PREMIUM_PROMPTS
+
+
+# Default listing order: newest first, id breaks ties between equal timestamps
+RECENT_ORDER = (models.Prompt.created_at, models.Prompt.id)
+
+
+async def list_prompts(db, query, page: int, page_size: int, cursor: str = None, include_total: bool = True, order_by=RECENT_ORDER):
+    """
+    One page of the prompts selected by `query`, ordered by `order_by` (descending).
+
+    Shared by every prompt listing endpoint. Likes and comments are read from
+    the denormalized counters on the prompt row, so a page costs one query
+    (two with `include_total`) whatever its size. Returns
+    `(prompts, total, next_cursor)`.
+    """
+    total = await count_rows(db, query) if include_total else None
+    prompts, next_cursor = await paginate_keyset_async(db, query, list(order_by), page_size, cursor=cursor, page=page)
+    await write_behind.overlay_pending(prompts)
+    return prompts, total, next_cursor
+
+
+async def viewer_likes(prompts, viewer_account: Optional[str], db) -> Optional[set]:
+    """Ids of the listed prompts liked by `viewer_account`, None when no viewer was given."""
+    if not viewer_account:
+        return None
+    return await liked_prompt_ids([prompt.id for prompt in prompts], viewer_account, db)
+
+
+async def insert_prompts(rows: List[dict], db: AsyncSession) -> List[models.Prompt]:
+    """
+    Insert a batch of prompts as one multi-row `INSERT ... RETURNING` and return them in input order
+    (SQLite can't guarantee the order of a multi-row insert, so locally it goes one row at a time).
+    Doesn't commit. New prompts have no likes or comments, so their counters need no queries.
+    """
+    if not rows:
+        return []
+    prompts = (await db.scalars(insert(models.Prompt).returning(models.Prompt, sort_by_parameter_order=True), rows)).all()
+    return list(prompts)
+
+
+def to_public_prompt_response(prompt: models.Prompt, liked: Optional[set] = None) -> schemas.PublicPromptResponse:
+    """`liked` is the set of prompt ids the viewer liked, None leaves `liked_by_me` unset."""
+    return schemas.PublicPromptResponse(
+        id=prompt.id,
+        ipfs_image_url=prompt.ipfs_image_url,
+        prompt=prompt.prompt,
+        account_address=prompt.account_address,
+        post_name=prompt.post_name,
+        public=prompt.public,
+        prompt_tag=prompt.prompt_tag,
+        likes_count=prompt.likes_count,
+        comments_count=prompt.comments_count,
+        liked_by_me=prompt.id in liked if liked is not None else None
+    )
+
+
+def _score_batch(after_id: int, batch_size: int):
+    """
+    The next `batch_size` prompts after `after_id` with their stored scores and counters,
+    and the scores rebuilt from their events, summed by the database in the same statement.
+    """
+    prompts = models.Prompt.__table__
+    batch = (
+        select(
+            prompts.c.id, prompts.c.created_at, prompts.c.popularity_score, prompts.c.trending_score,
+            prompts.c.likes_count, prompts.c.comments_count,
+        )
+        .where(prompts.c.id > after_id)
+        .order_by(prompts.c.id)
+        .limit(batch_size)
+        .cte("batch")
+    )
+    batch_ids = select(batch.c.id)
+    events = union_all(
+        select(batch.c.id.label("prompt_id"), literal(math.log(scoring.CREATION_WEIGHT)).label("log_weight"), batch.c.created_at),
+        select(PostLike.prompt_id, literal(math.log(scoring.LIKE_WEIGHT)), PostLike.created_at).where(PostLike.prompt_id.in_(batch_ids)),
+        select(PostComment.prompt_id, literal(math.log(scoring.COMMENT_WEIGHT)), PostComment.created_at).where(PostComment.prompt_id.in_(batch_ids)),
+    ).subquery("events")
+    terms = (
+        select(
+            events.c.prompt_id,
+            scoring.event_term_sql(events.c.log_weight, events.c.created_at, scoring.POPULARITY_HALF_LIFE_HOURS).label("popularity"),
+            scoring.event_term_sql(events.c.log_weight, events.c.created_at, scoring.TRENDING_HALF_LIFE_HOURS).label("trending"),
+        )
+        .where(events.c.created_at.is_not(None))
+        .cte("terms")
+    )
+    peaks = (
+        select(terms.c.prompt_id, func.max(terms.c.popularity).label("popularity"), func.max(terms.c.trending).label("trending"))
+        .group_by(terms.c.prompt_id)
+        .subquery("peaks")
+    )
+    scores = (
+        select(
+            peaks.c.prompt_id,
+            scoring.events_term_sql(terms.c.popularity, peaks.c.popularity).label("popularity"),
+            scoring.events_term_sql(terms.c.trending, peaks.c.trending).label("trending"),
+        )
+        .join_from(peaks, terms, terms.c.prompt_id == peaks.c.prompt_id)
+        .group_by(peaks.c.prompt_id, peaks.c.popularity, peaks.c.trending)
+        .subquery("scores")
+    )
+    return (
+        select(
+            batch.c.id, batch.c.popularity_score, batch.c.trending_score, batch.c.likes_count, batch.c.comments_count,
+            scores.c.popularity.label("new_popularity"), scores.c.trending.label("new_trending"),
+        )
+        .outerjoin(scores, scores.c.prompt_id == batch.c.id)
+        .order_by(batch.c.id)
+    )
+
+
+def recompute_prompt_scores(db: Session, batch_size: int = 1000) -> int:
+    """
+    Rebuild every prompt's popularity/trending score from its likes and comments.
+
+    The API keeps the scores up to date incrementally; this corrects any drift
+    (deleted likes, backfills, scoring constant changes). Prompts are rebuilt
+    `batch_size` at a time, each batch computed in SQL and committed on its own.
+    A score is only replaced while the prompt's like and comment counters are
+    still the ones read with its events. Every like or comment bumps a counter
+    together with the scores, so one landing meanwhile is kept and the prompt
+    is corrected on the next run. Returns the number of prompts updated.
+    """
+    prompts = models.Prompt.__table__
+    set_scores = (
+        update(prompts)
+        .where(
+            prompts.c.id == bindparam("b_id"),
+            prompts.c.likes_count == bindparam("b_read_likes"),
+            prompts.c.comments_count == bindparam("b_read_comments"),
+        )
+        .values(popularity_score=bindparam("b_popularity"), trending_score=bindparam("b_trending"))
+    )
+
+    updated, after_id = 0, 0
+    while True:
+        batch = db.execute(_score_batch(after_id, batch_size)).all()
+        if not batch:
+            break
+        after_id = batch[-1].id
+        rows = [
+            {
+                "b_id": row.id,
+                "b_read_likes": row.likes_count,
+                "b_read_comments": row.comments_count,
+                "b_popularity": row.new_popularity,
+                "b_trending": row.new_trending,
+            }
+            for row in batch
+            if row.new_popularity is not None
+            and (row.new_popularity, row.new_trending) != (row.popularity_score, row.trending_score)
+        ]
+        if rows:
+            updated += db.execute(set_scores, rows).rowcount
+        db.commit()
+    return updated
 
@@ -0,0 +1,147 @@
+"""
+Precomputed social feed timeline.
+
+The social feed is every prompt, newest first, whoever follows whom, so one
+global timeline serves every user: the ids of the newest FEED_MAX_LENGTH
+prompts in a sorted set scored by creation time. `/socialfeed/feed/` reads
+its first pages straight from it and continues from the database past its
+end.
+
+The timeline only counts as *warm* once it has been rebuilt from the
+database (see `services.warm_timeline`). New prompts are pushed onto a warm
+timeline and refresh its expiry; a cold one is left alone until the next
+rebuild. Rebuilding also records the number of prompts, which pushes keep
+counting up, so the feed's total needs no `COUNT(*)`.
+"""
+import asyncio
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from app.core.constants import FEED_MAX_LENGTH, FEED_TTL_SECONDS
+from app.core.redis import redis_client
+
+TIMELINE_KEY = "feed:timeline"
+WARM_KEY = "feed:warm"
+PROMPT_COUNT_KEY = "feed:prompt_count"
+
+
+def feed_score(created_at: datetime) -> float:
+    """Sorted-set score for a prompt, its (naive UTC) creation time as epoch seconds."""
+    return created_at.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _page(entries: Iterable[Tuple[int, float]], before: Optional[Tuple[float, int]], limit: int):
+    """Newest-first page of `(prompt_id, score)` entries strictly older than `before`."""
+    entries = [(prompt_id, score) for prompt_id, score in entries if before is None or (score, prompt_id) < before]
+    return sorted(entries, key=lambda item: (item[1], item[0]), reverse=True)[:limit]
+
+
+class InMemoryFeedStore:
+    """In-process stand-in for `RedisFeedStore`, used for local runs and tests."""
+
+    def __init__(self, max_length: int = FEED_MAX_LENGTH):
+        self.max_length = max_length
+        self._timeline = {}
+        self._warm = False
+        self._prompt_count = None
+        self._lock = asyncio.Lock()
+
+    def _trim(self):
+        if len(self._timeline) > self.max_length:
+            keep = sorted(self._timeline.items(), key=lambda item: (item[1], item[0]), reverse=True)[:self.max_length]
+            self._timeline = dict(keep)
+
+    async def is_warm(self) -> bool:
+        return self._warm
+
+    async def rebuild(self, entries: List[Tuple[int, float]], prompt_count: Optional[int] = None):
+        async with self._lock:
+            self._timeline = dict(entries)
+            self._trim()
+            self._warm = True
+            self._prompt_count = prompt_count
+
+    async def push(self, entries: List[Tuple[int, float]]):
+        async with self._lock:
+            if not self._warm:
+                return
+            self._timeline.update(entries)
+            self._trim()
+            if self._prompt_count is not None:
+                self._prompt_count += len(entries)
+
+    async def prompt_count(self) -> Optional[int]:
+        """Number of prompts, None while the timeline is cold."""
+        return self._prompt_count if self._warm else None
+
+    async def page(self, before: Optional[Tuple[float, int]], limit: int):
+        return _page(self._timeline.items(), before, limit)
+
+
+def _member(prompt_id: int) -> str:
+    # Zero-padded, so Redis orders (and trims) prompts with equal scores by id
+    return f"{prompt_id:020d}"
+
+
+class RedisFeedStore:
+    """The timeline kept as the Redis sorted set `feed:timeline` scored by creation time."""
+
+    def __init__(self, client, max_length: int = FEED_MAX_LENGTH, ttl: int = FEED_TTL_SECONDS):
+        self.client = client
+        self.max_length = max_length
+        self.ttl = ttl
+
+    async def is_warm(self) -> bool:
+        return bool(await self.client.exists(WARM_KEY))
+
+    async def rebuild(self, entries: List[Tuple[int, float]], prompt_count: Optional[int] = None):
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.delete(TIMELINE_KEY)
+            if entries:
+                pipe.zadd(TIMELINE_KEY, {_member(prompt_id): score for prompt_id, score in entries})
+                pipe.zremrangebyrank(TIMELINE_KEY, 0, -(self.max_length + 1))
+                pipe.expire(TIMELINE_KEY, self.ttl)
+            if prompt_count is None:
+                pipe.delete(PROMPT_COUNT_KEY)
+            else:
+                pipe.set(PROMPT_COUNT_KEY, prompt_count, ex=self.ttl)
+            pipe.set(WARM_KEY, 1, ex=self.ttl)
+            await pipe.execute()
+
+    async def push(self, entries: List[Tuple[int, float]]):
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.exists(WARM_KEY)
+            pipe.exists(PROMPT_COUNT_KEY)
+            is_warm, has_count = await pipe.execute()
+        if not is_warm:
+            return
+
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.zadd(TIMELINE_KEY, {_member(prompt_id): score for prompt_id, score in entries})
+            pipe.zremrangebyrank(TIMELINE_KEY, 0, -(self.max_length + 1))
+            pipe.expire(TIMELINE_KEY, self.ttl)
+            pipe.expire(WARM_KEY, self.ttl)
+            if has_count:
+                pipe.incrby(PROMPT_COUNT_KEY, len(entries))
+                pipe.expire(PROMPT_COUNT_KEY, self.ttl)
+            await pipe.execute()
+
+    async def prompt_count(self) -> Optional[int]:
+        """Number of prompts, None while the timeline is cold."""
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.exists(WARM_KEY)
+            pipe.get(PROMPT_COUNT_KEY)
+            is_warm, count = await pipe.execute()
+        return int(count) if is_warm and count is not None else None
+
+    async def page(self, before: Optional[Tuple[float, int]], limit: int):
+        async with self.client.pipeline(transaction=False) as pipe:
+            if before is not None:
+                # Prompts created in the same second as the cursor's are told apart by their id
+                pipe.zrangebyscore(TIMELINE_KEY, before[0], before[0], withscores=True)
+            pipe.zrevrangebyscore(TIMELINE_KEY, f"({before[0]}" if before else "+inf", "-inf", start=0, num=limit, withscores=True)
+            results = await pipe.execute()
+        return _page([(int(member), score) for result in results for member, score in result], before, limit)
+
+
+feed_store = RedisFeedStore(redis_client) if redis_client else InMemoryFeedStore()
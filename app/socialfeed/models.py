@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Enum, ForeignKey, Index
 from app.prompts.schemas import PromptTypeEnum
 from sqlalchemy.orm import relationship
 from app.core.database import Base  # Assuming you have a Base model class
@@ -19,31 +19,47 @@ class SocialFeedPost(Base):
 class PostLike(Base):
     __tablename__ = 'post_likes'
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     prompt_id = Column(Integer, ForeignKey('prompts.id', ondelete="CASCADE"), nullable=False) 
     prompt_type = Column(Enum(PromptTypeEnum), nullable=False)  # Type: public or premium
-    user_account = Column(String, nullable=False, index=True)
+    user_account = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     prompt = relationship('Prompt', back_populates='likes')
 
+    __table_args__ = (
+        # One like per user and prompt, lets the like endpoint insert with ON CONFLICT DO NOTHING
+        Index('uq_post_likes_prompt_id_user_account', 'prompt_id', 'user_account', unique=True),
+    )
+
 
 class PostComment(Base):
     __tablename__ = 'post_comments'
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     prompt_id = Column(Integer, ForeignKey('prompts.id', ondelete="CASCADE"), nullable=False) 
     prompt_type = Column(Enum(PromptTypeEnum), nullable=False)  # Type: public or premium
-    user_account = Column(String, nullable=False, index=True)
+    user_account = Column(String, nullable=False)
     comment = Column(String, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     prompt = relationship('Prompt', back_populates='comments')
 
+    __table_args__ = (
+        # Latest comments of a prompt
+        Index('ix_post_comments_prompt_id_created_at', 'prompt_id', 'created_at', 'id'),
+    )
+
 
 class Follow(Base):
     __tablename__ = 'follows'
 
-    id = Column(Integer, primary_key=True, index=True)
-    follower_account = Column(String, nullable=False, index=True)  # The account of the user who follows
-    creator_account = Column(String, nullable=False, index=True)   # The account of the creator being followed
\ No newline at end of file
+    id = Column(Integer, primary_key=True)
+    follower_account = Column(String, nullable=False)  # The account of the user who follows
+    creator_account = Column(String, nullable=False)   # The account of the creator being followed
+
+    __table_args__ = (
+        # Who a user follows / who follows a creator, both covering the other account
+        Index('ix_follows_follower_account_creator_account', 'follower_account', 'creator_account'),
+        Index('ix_follows_creator_account_follower_account', 'creator_account', 'follower_account'),
+    )
@@ -1,16 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, select
+from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, select, union, update
 from datetime import datetime, timedelta
-from app.core.database import get_session
-from . import schemas, services, models
+from app.core.database import get_async_session, get_read_session
+from . import schemas, services, models, write_behind
+from .feed_store import feed_store
 from app.prompts.models import Prompt
-from app.core.helpers import paginate
+from app.prompts import scoring
+from app.prompts import services as prompt_services
+from app.core.cache import invalidate, PUBLIC_PROMPTS, PREMIUM_PROMPTS
+from app.core.versioning import conditional_get, bump_versions, follows_scope
+from app.core.constants import ENGAGEMENT_WRITE_BEHIND, FEED_TOP_COMMENTS
+from app.core.helpers import paginate_keyset_async, count_rows, new_shuffle_seed, shuffle_key, shuffle_value
 router = APIRouter()
 
 
 @router.post("/like-prompt/")
-async def like_prompt(like_data: schemas.LikePromptRequest, db: Session = Depends(get_session)):
+async def like_prompt(like_data: schemas.LikePromptRequest, db: AsyncSession = Depends(get_async_session)):
     """
     Like a public or premium prompt.
 
@@ -19,47 +26,96 @@ async def like_prompt(like_data: schemas.LikePromptRequest, db: Session = Depend
     - **user_account**: The account of the user liking the prompt.
     """
     try:
-        # Check if the prompt exists
-        prompt = db.query(Prompt).filter(
-            Prompt.id == like_data.prompt_id,
-            Prompt.prompt_type == like_data.prompt_type
-        ).first()
+        if ENGAGEMENT_WRITE_BEHIND:
+            # Queue the like, the write-behind flusher inserts it with others in a batch
+            queued = await services.queue_like(like_data.prompt_id, like_data.prompt_type, like_data.user_account, db)
+            if queued is None:
+                raise HTTPException(status_code=404, detail="Prompt not found")
+
+            queued, total_likes = queued
+            if queued:
+                await invalidate(prompt_services.listing_namespace(like_data.prompt_type))
+            return {
+                "message": "Prompt liked successfully" if queued else "Prompt already liked",
+                "total_likes": total_likes
+            }
+
+        # Insert the like and bump the counter/scores together, the unique index makes repeats a no-op
+        total_likes = await services.record_like(like_data.prompt_id, like_data.prompt_type, like_data.user_account, db)
+
+        if total_likes is None:
+            # Nothing was inserted: either the prompt doesn't exist or the user already liked it
+            total_likes = await db.scalar(select(Prompt.likes_count).filter(
+                Prompt.id == like_data.prompt_id,
+                Prompt.prompt_type == like_data.prompt_type
+            ))
+            if total_likes is None:
+                raise HTTPException(status_code=404, detail="Prompt not found")
+
+            return {
+                "message": "Prompt already liked",
+                "total_likes": total_likes
+            }
+
+        await db.commit()
+        await invalidate(prompt_services.listing_namespace(like_data.prompt_type))
 
-        if not prompt:
-            raise HTTPException(status_code=404, detail="Prompt not found")
+        return {
+            "message": "Prompt liked successfully",
+            "total_likes": total_likes
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        detail = {
+            "info": "Failed to like prompt",
+            "error": str(e),
+        }
+        raise HTTPException(status_code=500, detail=detail)
 
-        # Check if the user has already liked the prompt
-        existing_like = db.query(models.PostLike).filter(
-            models.PostLike.prompt_id == like_data.prompt_id,
-            models.PostLike.prompt_type == like_data.prompt_type,
-            models.PostLike.user_account == like_data.user_account
-        ).first()
-
-        if existing_like:
-            raise HTTPException(status_code=409, detail="User has already liked this prompt")
-
-        # Create a new like
-        new_like = models.PostLike(
-            prompt_id=like_data.prompt_id,
-            prompt_type=like_data.prompt_type,
-            user_account=like_data.user_account
-        )
-        db.add(new_like)
-        db.commit()
 
-        # Get the updated number of likes
-        total_likes = db.query(models.PostLike).filter(
-            models.PostLike.prompt_id == like_data.prompt_id,
-            models.PostLike.prompt_type == like_data.prompt_type
-        ).count()
+
+@router.delete("/unlike-prompt/")
+async def unlike_prompt(prompt_id: int, prompt_type: schemas.PromptTypeEnum, user_account: str, db: AsyncSession = Depends(get_async_session)):
+    """
+    Remove a like from a public or premium prompt.
+
+    - **prompt_id**: ID of the prompt (public or premium).
+    - **prompt_type**: Whether the prompt is public or premium.
+    - **user_account**: The account of the user who liked the prompt.
+    """
+    # A queued like isn't in the database yet, so there is nothing to remove until it is flushed
+    if ENGAGEMENT_WRITE_BEHIND and prompt_id in await write_behind.engagement_queue.pending_liked([prompt_id], user_account):
+        raise HTTPException(status_code=409, detail="Like is still being saved, try again shortly")
+
+    try:
+        total_likes = await services.remove_like(prompt_id, prompt_type, user_account, db)
+
+        if total_likes is None:
+            total_likes = await db.scalar(select(Prompt.likes_count).filter(
+                Prompt.id == prompt_id,
+                Prompt.prompt_type == prompt_type
+            ))
+            if total_likes is None:
+                raise HTTPException(status_code=404, detail="Prompt not found")
+
+            return {
+                "message": "Prompt was not liked",
+                "total_likes": total_likes
+            }
+
+        await db.commit()
+        await invalidate(prompt_services.listing_namespace(prompt_type))
 
         return {
-            "message": "Prompt liked successfully",
+            "message": "Prompt unliked successfully",
             "total_likes": total_likes
         }
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
-            "info": "Failed to like prompt",
+            "info": "Failed to unlike prompt",
             "error": str(e),
         }
         raise HTTPException(status_code=500, detail=detail)
@@ -67,7 +123,7 @@ async def like_prompt(like_data: schemas.LikePromptRequest, db: Session = Depend
 
 
 @router.post("/comment-prompt/")
-async def comment_prompt(comment_data: schemas.CommentPromptRequest, db: Session = Depends(get_session)):
+async def comment_prompt(comment_data: schemas.CommentPromptRequest, db: AsyncSession = Depends(get_async_session)):
     """
     Add a comment to a public or premium prompt.
 
@@ -77,11 +133,47 @@ async def comment_prompt(comment_data: schemas.CommentPromptRequest, db: Session
     - **comment**: The comment text.
     """
     try:
+        if ENGAGEMENT_WRITE_BEHIND:
+            # Queue the comment, the write-behind flusher inserts it with others in a batch
+            queued = await services.queue_comment(
+                comment_data.prompt_id, comment_data.prompt_type, comment_data.user_account, comment_data.comment, db
+            )
+            if queued is None:
+                raise HTTPException(status_code=404, detail="Prompt not found")
+
+            event, total_comments = queued
+            await invalidate(prompt_services.listing_namespace(comment_data.prompt_type))
+
+            # The queued comment is the newest one, followed by the latest stored comment
+            latest_stored = (await db.execute(select(models.PostComment).filter(
+                models.PostComment.prompt_id == comment_data.prompt_id,
+                models.PostComment.prompt_type == comment_data.prompt_type
+            ).order_by(models.PostComment.created_at.desc()).limit(1))).scalars().all()
+
+            return {
+                "message": "Comment added successfully",
+                "total_comments": total_comments,
+                "latest_comments": [
+                    {
+                        "user_account": event["user_account"],
+                        "comment": event["comment"],
+                        "created_at": datetime.fromisoformat(event["at"])
+                    }
+                ] + [
+                    {
+                        "user_account": comment.user_account,
+                        "comment": comment.comment,
+                        "created_at": comment.created_at
+                    }
+                    for comment in latest_stored
+                ]
+            }
+
         # Check if the prompt exists
-        prompt = db.query(Prompt).filter(
+        prompt = (await db.execute(select(Prompt).filter(
             Prompt.id == comment_data.prompt_id,
             Prompt.prompt_type == comment_data.prompt_type
-        ).first()
+        ))).scalars().first()
 
         if not prompt:
             raise HTTPException(status_code=404, detail="Prompt not found")
@@ -94,22 +186,22 @@ async def comment_prompt(comment_data: schemas.CommentPromptRequest, db: Session
             comment=comment_data.comment
         )
         db.add(new_comment)
-        db.commit()
 
-        # Get updated total comments count
-        total_comments = db.query(models.PostComment).filter(
-            models.PostComment.prompt_id == comment_data.prompt_id,
-            models.PostComment.prompt_type == comment_data.prompt_type
-        ).count()
+        # Bump the denormalized counter and the popularity scores in the same transaction as the comment
+        total_comments = await db.scalar(
+            update(Prompt)
+            .where(Prompt.id == comment_data.prompt_id)
+            .values(comments_count=Prompt.comments_count + 1, **scoring.score_bump(Prompt, scoring.COMMENT_WEIGHT))
+            .returning(Prompt.comments_count)
+        )
+        await db.commit()
+        await invalidate(prompt_services.listing_namespace(comment_data.prompt_type))
 
         # Get the latest comments (e.g., top 2)
-        top_comments = db.query(models.PostComment).filter(
+        top_comments = (await db.execute(select(models.PostComment).filter(
             models.PostComment.prompt_id == comment_data.prompt_id,
             models.PostComment.prompt_type == comment_data.prompt_type
-        ).order_by(models.PostComment.created_at.desc()).limit(2).all()
-
-        # Commit the changes to the database
-        db.commit()
+        ).order_by(models.PostComment.created_at.desc()).limit(2))).scalars().all()
 
         return {
             "message": "Comment added successfully",
@@ -123,6 +215,8 @@ async def comment_prompt(comment_data: schemas.CommentPromptRequest, db: Session
                 for comment in top_comments
             ]
         }
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to comment on prompt",
@@ -132,53 +226,29 @@ async def comment_prompt(comment_data: schemas.CommentPromptRequest, db: Session
 
 
 @router.get("/get-prompt-comments/", response_model=schemas.CommentsListResponse)
-async def get_prompt_comments(prompt_id: int, prompt_type: schemas.PromptTypeEnum, limit: int = 2, db: Session = Depends(get_session)):
+async def get_prompt_comments(
+    prompt_id: int,
+    prompt_type: schemas.PromptTypeEnum,
+    limit: int = Query(2, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_read_session),
+):
     """
-    Retrieve comments for a specific public or premium prompt.
+    Retrieve comments for a specific public or premium prompt, newest first.
     
-    By default, only the top 2 comments are returned. You can specify a different limit via the query parameter.
+    By default, only the latest 2 comments are returned. You can specify a different limit via the query parameter,
+    and fetch the older ones page by page with the returned `next_cursor`. Comments still queued by the
+    write-behind buffer come first on the first page, marked `pending`.
 
     - **prompt_id**: ID of the prompt (public or premium).
     - **prompt_type**: Whether the prompt is public or premium.
-    - **limit**: The number of comments to return (default is 2).
+    - **limit**: The number of comments per page (default is 2).
+    - **cursor**: `next_cursor` from the previous page.
     """
     try:
-        # Fetch the prompt and its comments in a single query using join
-        prompt_with_comments = (
-            db.query(Prompt, models.PostComment)
-            .outerjoin(models.PostComment, models.PostComment.prompt_id == Prompt.id)
-            .filter(
-                Prompt.id == prompt_id,
-                Prompt.prompt_type == prompt_type
-            )
-            .limit(limit)
-            .all()
-        )
-
-        # Check if the prompt exists
-        if not prompt_with_comments:
-            raise HTTPException(status_code=404, detail="Prompt not found")
-
-        # Extract the prompt and comments
-        prompt = prompt_with_comments[0][0]  # The prompt itself
-        comments = [pc[1] for pc in prompt_with_comments if pc[1] is not None]
-
-        # Fetch total comments count in one go
-        total_comments = db.query(func.count(models.PostComment.id)).filter(
-            models.PostComment.prompt_id == prompt_id,
-            models.PostComment.prompt_type == prompt_type
-        ).scalar()
-
-        # Return the response with comments and total count
-        return schemas.CommentsListResponse(
-            comments=[
-                schemas.CommentResponse(
-                    user_account=comment.user_account,
-                    comment=comment.comment
-                ) for comment in comments
-            ],
-            total_comments=total_comments
-        )
+        comments_page = await services.read_comments_page(prompt_id, prompt_type, limit, cursor, db)
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get prompt comments",
@@ -186,13 +256,24 @@ async def get_prompt_comments(prompt_id: int, prompt_type: schemas.PromptTypeEnu
         }
         raise HTTPException(status_code=500, detail=detail)
 
+    # Check if the prompt exists
+    if comments_page is None:
+        raise HTTPException(status_code=404, detail="Prompt not found")
+
+    comments, total_comments, next_cursor = comments_page
+    return schemas.CommentsListResponse(
+        comments=[schemas.CommentResponse.model_validate(comment) for comment in comments],
+        total_comments=total_comments,
+        next_cursor=next_cursor
+    )
+
 
 
 
 
 
 @router.post("/follow-creator/")
-async def follow_creator(follower_account: str, creator_account: str, db: Session = Depends(get_session)):
+async def follow_creator(follower_account: str, creator_account: str, db: AsyncSession = Depends(get_async_session)):
     """
     Follow a creator.
     
@@ -201,10 +282,10 @@ async def follow_creator(follower_account: str, creator_account: str, db: Sessio
     """
     try:
         # Check if already following
-        existing_follow = db.query(models.Follow).filter(
+        existing_follow = (await db.execute(select(models.Follow).filter(
             models.Follow.follower_account == follower_account,
             models.Follow.creator_account == creator_account
-        ).first()
+        ))).scalars().first()
 
         if existing_follow:
             raise HTTPException(status_code=400, detail="Already following this creator")
@@ -212,7 +293,9 @@ async def follow_creator(follower_account: str, creator_account: str, db: Sessio
         # Add new follow relationship
         new_follow = models.Follow(follower_account=follower_account, creator_account=creator_account)
         db.add(new_follow)
-        db.commit()
+        await db.commit()
+
+        await bump_versions(follows_scope(follower_account))
 
         return {"message": "Successfully followed the creator"}
     except Exception as e:
@@ -224,7 +307,7 @@ async def follow_creator(follower_account: str, creator_account: str, db: Sessio
 
 
 @router.delete("/unfollow-creator/")
-async def unfollow_creator(follower_account: str, creator_account: str, db: Session = Depends(get_session)):
+async def unfollow_creator(follower_account: str, creator_account: str, db: AsyncSession = Depends(get_async_session)):
     """
     Unfollow a creator.
     
@@ -232,16 +315,18 @@ async def unfollow_creator(follower_account: str, creator_account: str, db: Sess
     - **creator_account**: The account of the creator to be unfollowed.
     """
     try:
-        follow_relationship = db.query(models.Follow).filter(
+        follow_relationship = (await db.execute(select(models.Follow).filter(
             models.Follow.follower_account == follower_account,
             models.Follow.creator_account == creator_account
-        ).first()
+        ))).scalars().first()
 
         if not follow_relationship:
             raise HTTPException(status_code=404, detail="Not following this creator")
 
-        db.delete(follow_relationship)
-        db.commit()
+        await db.delete(follow_relationship)
+        await db.commit()
+
+        await bump_versions(follows_scope(follower_account))
 
         return {"message": "Successfully unfollowed the creator"}
     except Exception as e:
@@ -252,47 +337,62 @@ async def unfollow_creator(follower_account: str, creator_account: str, db: Sess
         raise HTTPException(status_code=500, detail=detail)
 
 
+def _top_prompt_item(prompt: Prompt) -> dict:
+    return {
+        "prompt": prompt.prompt,
+        "prompt_id": prompt.id,
+        "ipfs_image_url": prompt.ipfs_image_url,
+        "likes": prompt.likes_count,
+        "comments": prompt.comments_count,
+        "created_at": prompt.created_at
+    }
+
+
 @router.get("/creator-followers/")
-async def get_creator_followers(creator_account: str, db: Session = Depends(get_session)):
+async def get_creator_followers(
+    creator_account: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    db: AsyncSession = Depends(get_read_session),
+):
     """
-    Get a list of followers for a specific creator along with their top 5 most liked prompts.
+    Get a page of followers for a specific creator along with their top 5 most liked prompts.
     
     - **creator_account**: The account of the creator whose followers are being retrieved.
+    - **page**: Page number, used when no cursor is given.
+    - **page_size**: Number of followers per page.
+    - **cursor**: `next_cursor` from the previous response.
+    - **include_total**: Set to false to skip counting every follower.
     """
     try:
-        followers = db.query(models.Follow).filter(models.Follow.creator_account == creator_account).all()
+        query = select(models.Follow).filter(models.Follow.creator_account == creator_account)
+        total = await count_rows(db, query) if include_total else None
+        followers, next_cursor = await paginate_keyset_async(db, query, [models.Follow.id], page_size, cursor=cursor, page=page)
 
-        if not followers:
+        if not followers and page == 1 and not cursor:
             return {"message": "This creator has no followers"}
 
-        result = []
-        for follow in followers:
-            # Get follower's top 5 most liked prompts
-            prompts = (
-                db.query(Prompt, func.count(models.PostLike.id).label('likes_count'))
-                .outerjoin(models.PostLike, models.PostLike.prompt_id == Prompt.id)
-                .filter(Prompt.account_address == follow.follower_account)
-                .group_by(Prompt.id)
-                .order_by(func.count(models.PostLike.id).desc())  # Sort by the number of likes
-                .limit(5)
-                .all()
-            )
-
-            result.append({
+        # Top prompts of every follower on the page in one windowed query
+        top_prompts = await services.top_prompts_by_account([follow.follower_account for follow in followers], db)
+        result = [
+            {
                 "follower_account": follow.follower_account,
-                "top_5_prompts": [
-                    {
-                        "prompt": prompt.prompt,
-                        "prompt_id": prompt.id,
-                        "ipfs_image_url": prompt.ipfs_image_url,
-                        "likes": likes_count,
-                        "comments": len(prompt.comments),
-                        "created_at": prompt.created_at
-                    } for prompt, likes_count in prompts
-                ]
-            })
+                "top_5_prompts": [_top_prompt_item(prompt) for prompt in top_prompts[follow.follower_account]]
+            } for follow in followers
+        ]
 
-        return {"creator_account": creator_account, "followers_with_top_prompts": result}
+        return {
+            "creator_account": creator_account,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+            "followers_with_top_prompts": result
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get creator followers",
@@ -303,46 +403,50 @@ async def get_creator_followers(creator_account: str, db: Session = Depends(get_
 
 
 @router.get("/user-following/")
-async def get_user_following(follower_account: str, db: Session = Depends(get_session)):
+async def get_user_following(
+    follower_account: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    db: AsyncSession = Depends(get_read_session),
+):
     """
-    Get a list of creators a user is following along with their top 5 most liked prompts.
+    Get a page of creators a user is following along with their top 5 most liked prompts.
     
     - **follower_account**: The account of the user whose following list is being retrieved.
+    - **page**: Page number, used when no cursor is given.
+    - **page_size**: Number of creators per page.
+    - **cursor**: `next_cursor` from the previous response.
+    - **include_total**: Set to false to skip counting every followed creator.
     """
     try:
-        following = db.query(models.Follow).filter(models.Follow.follower_account == follower_account).all()
+        query = select(models.Follow).filter(models.Follow.follower_account == follower_account)
+        total = await count_rows(db, query) if include_total else None
+        following, next_cursor = await paginate_keyset_async(db, query, [models.Follow.id], page_size, cursor=cursor, page=page)
 
-        if not following:
+        if not following and page == 1 and not cursor:
             return {"message": "This user is not following any creators"}
 
-        result = []
-        for follow in following:
-            # Get the top 5 most liked prompts for the creator being followed
-            prompts = (
-                db.query(Prompt, func.count(models.PostLike.id).label('likes_count'))
-                .outerjoin(models.PostLike, models.PostLike.prompt_id == Prompt.id)
-                .filter(Prompt.account_address == follow.creator_account)
-                .group_by(Prompt.id)
-                .order_by(func.count(models.PostLike.id).desc())
-                .limit(5)
-                .all()
-            )
-
-            result.append({
+        # Top prompts of every creator on the page in one windowed query
+        top_prompts = await services.top_prompts_by_account([follow.creator_account for follow in following], db)
+        result = [
+            {
                 "creator_account": follow.creator_account,
-                "top_5_prompts": [
-                    {
-                        "prompt": prompt.prompt,
-                        "prompt_id": prompt.id,
-                        "ipfs_image_url": prompt.ipfs_image_url,
-                        "likes": likes_count,
-                        "comments": len(prompt.comments),
-                        "created_at": prompt.created_at
-                    } for prompt, likes_count in prompts
-                ]
-            })
+                "top_5_prompts": [_top_prompt_item(prompt) for prompt in top_prompts[follow.creator_account]]
+            } for follow in following
+        ]
 
-        return {"follower_account": follower_account, "following_with_top_prompts": result}
+        return {
+            "follower_account": follower_account,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "next_cursor": next_cursor,
+            "following_with_top_prompts": result
+        }
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get user following",
@@ -353,92 +457,77 @@ async def get_user_following(follower_account: str, db: Session = Depends(get_se
 
 
 
-@router.get("/feed/")
-async def social_feed(user_account: str, page: int = 1, page_size: int = 10, db: Session = Depends(get_session)):
+async def _query_social_feed(user_account: str, page: int, page_size: int, cursor: Optional[str], include_total: bool, db: AsyncSession):
     """
-    Social feed: Return prompts from creators the user is following and random new creators, along with total number
-    of comments and likes, as well as the top 2 comments for each prompt.
+    Database fallback for the social feed, used while the precomputed timeline is cold
+    and for offset pages.
+    Returns `(prompts, total, next_cursor)`.
     """
-    try:
-
-        # Get the list of creators the user is following
-        followed_creators_subquery = (
-            db.query(models.Follow.creator_account)
-            .filter(models.Follow.follower_account == user_account)
-            .subquery()
-        )
-
-        # Fetch prompts from followed creators
-        followed_prompts_query = (
-            db.query(Prompt)
-            .filter(Prompt.account_address.in_(followed_creators_subquery))
-        )
-
-        # Fetch random creators (excluding those already followed)
-        random_creators_query = (
-            db.query(Prompt)
-            .filter(~Prompt.account_address.in_(followed_creators_subquery))
-            .order_by(func.random())
-        )
+    # Prompts from followed creators plus prompts from every other creator is every
+    # prompt, so the feed is read newest first straight off the (created_at, id) index
+    query = select(Prompt)
 
-        # Combine both followed prompts and random creator prompts
-        combined_query = followed_prompts_query.union(random_creators_query)
+    # Paginate the feed
+    total_prompts = await count_rows(db, query) if include_total else None
+    paginated_prompts, next_cursor = await paginate_keyset_async(
+        db, query, services.FEED_ORDER, page_size, cursor=cursor, page=page
+    )
+    return paginated_prompts, total_prompts, next_cursor
 
-        # Paginate the feed
-        total_prompts = combined_query.count()
-        paginated_prompts = combined_query.order_by(desc(Prompt.created_at)).offset((page - 1) * page_size).limit(page_size).all()
 
-        # Fetch all necessary data (likes, comments, top 2 comments) in one go
-        prompt_ids = [prompt.id for prompt in paginated_prompts]
+@router.get("/feed/")
+@conditional_get(PUBLIC_PROMPTS, PREMIUM_PROMPTS, lambda params: follows_scope(params["user_account"]))
+async def social_feed(
+    user_account: str,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(10, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    comments_per_prompt: int = Query(FEED_TOP_COMMENTS, ge=0, le=20),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Social feed: Return prompts from creators the user is following and random new creators, along with total number
+    of comments and likes, as well as the latest comments for each prompt.
 
-        # Fetch total likes and comments counts for all prompts in a single batch query
-        likes_comments_data = (
-            db.query(
-                Prompt.id,
-                func.count(models.PostLike.id).label('likes_count'),
-                func.count(models.PostComment.id).label('comments_count')
+    Pass the returned `next_cursor` as **cursor** to fetch the next page without an offset scan,
+    and **include_total**=false to skip counting the whole feed. **comments_per_prompt** sets how
+    many comments come with each prompt (`FEED_TOP_COMMENTS` by default).
+    """
+    try:
+        # Serve from the precomputed timeline when it's warm (no offset paging there)
+        timeline_page = None
+        if cursor or page == 1:
+            timeline_page = await services.read_timeline_page(cursor, page_size, db)
+
+        if timeline_page is not None:
+            paginated_prompts, next_cursor = timeline_page
+            # The feed store keeps the prompt count up to date, no need to count every prompt
+            total_prompts = await feed_store.prompt_count() if include_total else None
+            if include_total and total_prompts is None:
+                total_prompts = await count_rows(db, select(Prompt))
+        else:
+            paginated_prompts, total_prompts, next_cursor = await _query_social_feed(
+                user_account, page, page_size, cursor, include_total, db
             )
-            .outerjoin(models.PostLike, models.PostLike.prompt_id == Prompt.id)
-            .outerjoin(models.PostComment, models.PostComment.prompt_id == Prompt.id)
-            .filter(Prompt.id.in_(prompt_ids))
-            .group_by(Prompt.id)
-            .all()
-        )
+            # Cold timeline: rebuild it so the next request is served from the feed store
+            if not await feed_store.is_warm():
+                await services.warm_timeline(db)
 
-        # Fetch top 2 comments for each prompt in a single batch query
-        top_comments_data = (
-            db.query(
-                models.PostComment.prompt_id,
-                models.PostComment.user_account,
-                models.PostComment.comment,
-                models.PostComment.created_at
-            )
-            .filter(models.PostComment.prompt_id.in_(prompt_ids))
-            .order_by(models.PostComment.prompt_id, models.PostComment.created_at.desc())
-            .limit(2 * len(prompt_ids))
-            .all()
-        )
+        # Likes and comments counts are denormalized onto the prompt row, only the latest comments need fetching
+        prompt_ids = [prompt.id for prompt in paginated_prompts]
+        await write_behind.overlay_pending(paginated_prompts)
+        liked = await services.liked_prompt_ids(prompt_ids, user_account, db)
 
-        # Convert top_comments_data to a more usable structure (group by prompt_id)
-        from collections import defaultdict
-        top_comments_by_prompt = defaultdict(list)
-        for comment in top_comments_data:
-            top_comments_by_prompt[comment.prompt_id].append({
-                "user_account": comment.user_account,
-                "comment": comment.comment,
-                "created_at": comment.created_at
-            })
+        # Fetch the latest comments of each prompt in a single windowed query
+        top_comments_by_prompt = await services.top_comments_by_prompt(prompt_ids, comments_per_prompt, db)
 
         # Construct the final feed using the fetched data
         feed = []
         for prompt in paginated_prompts:
-            # Get likes and comments data for the prompt
-            likes_comments = next((lc for lc in likes_comments_data if lc[0] == prompt.id), None)
-            likes_count = likes_comments.likes_count if likes_comments else 0
-            comments_count = likes_comments.comments_count if likes_comments else 0
 
-            # Get top 2 comments for the prompt
-            top_comments = top_comments_by_prompt[prompt.id][:2]
+            # Latest comments of the prompt
+            top_comments = top_comments_by_prompt[prompt.id]
 
             # Append the prompt data
             feed.append({
@@ -448,9 +537,10 @@ async def social_feed(user_account: str, page: int = 1, page_size: int = 10, db:
                 "prompt_type": prompt.prompt_type,
                 "account_address": prompt.account_address,
                 "post_name": prompt.post_name,
-                "likes_count": likes_count,
-                "comments_count": comments_count,
+                "likes_count": prompt.likes_count,
+                "comments_count": prompt.comments_count,
                 "top_comments": top_comments,
+                "liked_by_me": prompt.id in liked,
                 "public": prompt.public
             })
 
@@ -458,8 +548,11 @@ async def social_feed(user_account: str, page: int = 1, page_size: int = 10, db:
             "results": feed,
             "total": total_prompts,
             "page": page,
-            "page_size": page_size
+            "page_size": page_size,
+            "next_cursor": next_cursor
         }
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get social feed",
@@ -469,87 +562,75 @@ async def social_feed(user_account: str, page: int = 1, page_size: int = 10, db:
 
 
 
+async def _shuffled_feed(accounts_query, user_account: str, page: int, page_size: int, seed: Optional[int], cursor: Optional[str], include_total: bool, comments_per_prompt: int, db: AsyncSession):
+    """
+    One page of the prompts posted by `accounts_query`'s accounts, in a seeded random order.
+
+    A cursor only continues the order of the seed it was returned with, so it
+    is rejected without one.
+    """
+    if cursor and seed is None:
+        raise HTTPException(status_code=400, detail="cursor requires the seed it was returned with")
+
+    query = select(Prompt).filter(Prompt.account_address.in_(accounts_query))
+
+    # Seeded shuffle instead of ORDER BY random(): the same seed always gives the same order
+    if seed is None:
+        seed = new_shuffle_seed()
+    total_prompts = await count_rows(db, query) if include_total else None
+    paginated_prompts, next_cursor = await paginate_keyset_async(
+        db, query, [shuffle_key(Prompt.id, seed), Prompt.id], page_size, cursor=cursor, page=page,
+        sort_key=lambda prompt: (shuffle_value(prompt.id, seed), prompt.id)
+    )
+
+    # Likes and comments counts are denormalized onto the prompt row, only the latest comments need fetching
+    prompt_ids = [prompt.id for prompt in paginated_prompts]
+    await write_behind.overlay_pending(paginated_prompts)
+    liked = await services.liked_prompt_ids(prompt_ids, user_account, db)
+
+    # Fetch the latest comments of each prompt in a single windowed query
+    top_comments_by_prompt = await services.top_comments_by_prompt(prompt_ids, comments_per_prompt, db)
+
+    feed = []
+    for prompt in paginated_prompts:
+        # Latest comments of the prompt
+        top_comments = top_comments_by_prompt[prompt.id]
+
+        feed.append({
+            "ipfs_image_url": prompt.ipfs_image_url,
+            "prompt_id": prompt.id,
+            "prompt": prompt.prompt,
+            "prompt_type": prompt.prompt_type,
+            "likes": prompt.likes_count,
+            "comments": prompt.comments_count,
+            "top_comments": top_comments,
+            "liked_by_me": prompt.id in liked,
+            "created_at": prompt.created_at,
+            "account_address": prompt.account_address
+        })
+
+    return {"total": total_prompts, "page": page, "page_size": page_size, "seed": seed, "next_cursor": next_cursor, "feed": feed}
+
+
 @router.get("/feed/followers/")
-async def get_feed_for_followers(user_account: str, db: Session = Depends(get_session), page: int = 1, page_size: int = 10):
+async def get_feed_for_followers(user_account: str, db: AsyncSession = Depends(get_read_session), page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100), seed: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = True, comments_per_prompt: int = Query(FEED_TOP_COMMENTS, ge=0, le=20)):
     """
     Get a randomized feed consisting of the prompts from accounts following a given user.
     
     - **user_account**: The account of the user to get the followers' feed for.
     - **page**: Page number for pagination.
     - **page_size**: Number of prompts per page.
+    - **seed**: Shuffle seed from the previous response, keeps the random order stable across pages.
+    - **cursor**: `next_cursor` from the previous response, only valid together with the **seed** it was returned with.
+    - **include_total**: Set to false to skip counting the feed's prompts.
+    - **comments_per_prompt**: Number of latest comments returned with each prompt.
     """
     try:
         # Get list of followers
-        followers_subquery = db.query(models.Follow.follower_account).filter(models.Follow.creator_account == user_account).subquery()
-
-        # Fetch prompts from followers with random ordering
-        query = db.query(Prompt).filter(Prompt.account_address.in_(followers_subquery))
-
-        total_prompts = query.count()
-        paginated_prompts = query.order_by(func.random()).offset((page - 1) * page_size).limit(page_size).all()
-
-        # Fetch all necessary data (likes, comments) in one go
-        prompt_ids = [prompt.id for prompt in paginated_prompts]
-
-        likes_comments_data = (
-            db.query(
-                Prompt.id,
-                func.count(models.PostLike.id).label('likes_count'),
-                func.count(models.PostComment.id).label('comments_count')
-            )
-            .outerjoin(models.PostLike, models.PostLike.prompt_id == Prompt.id)
-            .outerjoin(models.PostComment, models.PostComment.prompt_id == Prompt.id)
-            .filter(Prompt.id.in_(prompt_ids))
-            .group_by(Prompt.id)
-            .all()
-        )
-
-        # Fetch top 2 comments for each prompt in a single batch query
-        top_comments_data = (
-            db.query(
-                models.PostComment.prompt_id,
-                models.PostComment.user_account,
-                models.PostComment.comment,
-                models.PostComment.created_at
-            )
-            .filter(models.PostComment.prompt_id.in_(prompt_ids))
-            .order_by(models.PostComment.prompt_id, models.PostComment.created_at.desc())
-            .limit(2 * len(prompt_ids))
-            .all()
-        )
-
-        # Convert top_comments_data to a more usable structure (group by prompt_id)
-        from collections import defaultdict
-        top_comments_by_prompt = defaultdict(list)
-        for comment in top_comments_data:
-            top_comments_by_prompt[comment.prompt_id].append({
-                "user_account": comment.user_account,
-                "comment": comment.comment,
-                "created_at": comment.created_at
-            })
-
-        feed = []
-        for prompt in paginated_prompts:
-            # Get likes and comments data for the prompt
-            likes_comments = next((lc for lc in likes_comments_data if lc[0] == prompt.id), None)
-            likes_count = likes_comments.likes_count if likes_comments else 0
-            comments_count = likes_comments.comments_count if likes_comments else 0
-            # Get top 2 comments for the prompt
-            top_comments = top_comments_by_prompt[prompt.id][:2]
-
-            feed.append({
-                "ipfs_image_url": prompt.ipfs_image_url,
-                "prompt_id": prompt.id,
-                "prompt": prompt.prompt,
-                "prompt_type": prompt.prompt_type,
-                "likes": likes_count,
-                "comments": comments_count,
-                "top_comments": top_comments,
-                "created_at": prompt.created_at,
-                "account_address": prompt.account_address
-            })
-
-        return {"total": total_prompts, "page": page, "page_size": page_size, "feed": feed}
+        accounts_query = select(models.Follow.follower_account).filter(models.Follow.creator_account == user_account)
+        return await _shuffled_feed(accounts_query, user_account, page, page_size, seed, cursor, include_total, comments_per_prompt, db)
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get feed for followers",
@@ -559,86 +640,24 @@ async def get_feed_for_followers(user_account: str, db: Session = Depends(get_se
 
 
 @router.get("/feed/following/")
-async def get_feed_for_following(user_account: str, db: Session = Depends(get_session), page: int = 1, page_size: int = 10):
+async def get_feed_for_following(user_account: str, db: AsyncSession = Depends(get_read_session), page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100), seed: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = True, comments_per_prompt: int = Query(FEED_TOP_COMMENTS, ge=0, le=20)):
     """
     Get a randomized feed consisting of the prompts from accounts the user is following.
     
     - **user_account**: The account of the user to get the following feed for.
     - **page**: Page number for pagination.
     - **page_size**: Number of prompts per page.
+    - **seed**: Shuffle seed from the previous response, keeps the random order stable across pages.
+    - **cursor**: `next_cursor` from the previous response, only valid together with the **seed** it was returned with.
+    - **include_total**: Set to false to skip counting the feed's prompts.
+    - **comments_per_prompt**: Number of latest comments returned with each prompt.
     """
     try:
         # Get list of accounts the user is following
-        following_subquery = db.query(models.Follow.creator_account).filter(models.Follow.follower_account == user_account).subquery()
-
-        # Fetch prompts from the creators the user is following with random ordering
-        query = db.query(Prompt).filter(Prompt.account_address.in_(following_subquery))
-
-        total_prompts = query.count()
-        paginated_prompts = query.order_by(func.random()).offset((page - 1) * page_size).limit(page_size).all()
-
-        # Fetch all necessary data (likes, comments) in one go
-        prompt_ids = [prompt.id for prompt in paginated_prompts]
-
-        likes_comments_data = (
-            db.query(
-                Prompt.id,
-                func.count(models.PostLike.id).label('likes_count'),
-                func.count(models.PostComment.id).label('comments_count')
-            )
-            .outerjoin(models.PostLike, models.PostLike.prompt_id == Prompt.id)
-            .outerjoin(models.PostComment, models.PostComment.prompt_id == Prompt.id)
-            .filter(Prompt.id.in_(prompt_ids))
-            .group_by(Prompt.id)
-            .all()
-        )
-
-        # Fetch top 2 comments for each prompt in a single batch query
-        top_comments_data = (
-            db.query(
-                models.PostComment.prompt_id,
-                models.PostComment.user_account,
-                models.PostComment.comment,
-                models.PostComment.created_at
-            )
-            .filter(models.PostComment.prompt_id.in_(prompt_ids))
-            .order_by(models.PostComment.prompt_id, models.PostComment.created_at.desc())
-            .limit(2 * len(prompt_ids))
-            .all()
-        )
-
-        # Convert top_comments_data to a more usable structure (group by prompt_id)
-        from collections import defaultdict
-        top_comments_by_prompt = defaultdict(list)
-        for comment in top_comments_data:
-            top_comments_by_prompt[comment.prompt_id].append({
-                "user_account": comment.user_account,
-                "comment": comment.comment,
-                "created_at": comment.created_at
-            })
-
-        feed = []
-        for prompt in paginated_prompts:
-            # Get likes and comments data for the prompt
-            likes_comments = next((lc for lc in likes_comments_data if lc[0] == prompt.id), None)
-            likes_count = likes_comments.likes_count if likes_comments else 0
-            comments_count = likes_comments.comments_count if likes_comments else 0
-            # Get top 2 comments for the prompt
-            top_comments = top_comments_by_prompt[prompt.id][:2]
-
-            feed.append({
-                "ipfs_image_url": prompt.ipfs_image_url,
-                "prompt_id": prompt.id,
-                "prompt": prompt.prompt,
-                "prompt_type": prompt.prompt_type,
-                "likes": likes_count,
-                "comments": comments_count,
-                "top_comments": top_comments,
-                "created_at": prompt.created_at,
-                "account_address": prompt.account_address
-            })
-
-        return {"total": total_prompts, "page": page, "page_size": page_size, "feed": feed}
+        accounts_query = select(models.Follow.creator_account).filter(models.Follow.follower_account == user_account)
+        return await _shuffled_feed(accounts_query, user_account, page, page_size, seed, cursor, include_total, comments_per_prompt, db)
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get feed for following",
@@ -650,93 +669,30 @@ async def get_feed_for_following(user_account: str, db: Session = Depends(get_se
 
 
 @router.get("/feed/combined/")
-async def get_combined_feed(user_account: str, db: Session = Depends(get_session), page: int = 1, page_size: int = 10):
+async def get_combined_feed(user_account: str, db: AsyncSession = Depends(get_read_session), page: int = Query(1, ge=1), page_size: int = Query(10, ge=1, le=100), seed: Optional[int] = None, cursor: Optional[str] = None, include_total: bool = True, comments_per_prompt: int = Query(FEED_TOP_COMMENTS, ge=0, le=20)):
     """
     Get a randomized combined feed consisting of prompts from both the user's followers and the accounts the user is following.
     
     - **user_account**: The account of the user to get the combined feed for.
     - **page**: Page number for pagination.
     - **page_size**: Number of prompts per page.
+    - **seed**: Shuffle seed from the previous response, keeps the random order stable across pages.
+    - **cursor**: `next_cursor` from the previous response, only valid together with the **seed** it was returned with.
+    - **include_total**: Set to false to skip counting the feed's prompts.
+    - **comments_per_prompt**: Number of latest comments returned with each prompt.
     """
     try:
         # Get followers' accounts
-        followers_query = db.query(models.Follow.follower_account).filter(models.Follow.creator_account == user_account)
+        followers_query = select(models.Follow.follower_account).filter(models.Follow.creator_account == user_account)
 
         # Get following accounts
-        following_query = db.query(models.Follow.creator_account).filter(models.Follow.follower_account == user_account)
+        following_query = select(models.Follow.creator_account).filter(models.Follow.follower_account == user_account)
 
         # Combine followers and following accounts using union
-        all_accounts_query = followers_query.union(following_query).subquery()
-
-        # Fetch prompts from all combined accounts with random ordering
-        query = db.query(Prompt).filter(Prompt.account_address.in_(all_accounts_query))
-
-        total_prompts = query.count()
-        paginated_prompts = query.order_by(func.random()).offset((page - 1) * page_size).limit(page_size).all()
-
-        # Fetch all necessary data (likes, comments) in one go
-        prompt_ids = [prompt.id for prompt in paginated_prompts]
-
-        likes_comments_data = (
-            db.query(
-                Prompt.id,
-                func.count(models.PostLike.id).label('likes_count'),
-                func.count(models.PostComment.id).label('comments_count')
-            )
-            .outerjoin(models.PostLike, models.PostLike.prompt_id == Prompt.id)
-            .outerjoin(models.PostComment, models.PostComment.prompt_id == Prompt.id)
-            .filter(Prompt.id.in_(prompt_ids))
-            .group_by(Prompt.id)
-            .all()
-        )
-
-        # Fetch top 2 comments for each prompt in a single batch query
-        top_comments_data = (
-            db.query(
-                models.PostComment.prompt_id,
-                models.PostComment.user_account,
-                models.PostComment.comment,
-                models.PostComment.created_at
-            )
-            .filter(models.PostComment.prompt_id.in_(prompt_ids))
-            .order_by(models.PostComment.prompt_id, models.PostComment.created_at.desc())
-            .limit(2 * len(prompt_ids))
-            .all()
-        )
-
-        # Convert top_comments_data to a more usable structure (group by prompt_id)
-        from collections import defaultdict
-        top_comments_by_prompt = defaultdict(list)
-        for comment in top_comments_data:
-            top_comments_by_prompt[comment.prompt_id].append({
-                "user_account": comment.user_account,
-                "comment": comment.comment,
-                "created_at": comment.created_at
-            })
-
-
-        feed = []
-        for prompt in paginated_prompts:
-            # Get likes and comments data for the prompt
-            likes_comments = next((lc for lc in likes_comments_data if lc[0] == prompt.id), None)
-            likes_count = likes_comments.likes_count if likes_comments else 0
-            comments_count = likes_comments.comments_count if likes_comments else 0
-            # Get top 2 comments for the prompt
-            top_comments = top_comments_by_prompt[prompt.id][:2]
-
-            feed.append({
-                "ipfs_image_url": prompt.ipfs_image_url,
-                "prompt_id": prompt.id,
-                "prompt": prompt.prompt,
-                "prompt_type": prompt.prompt_type,
-                "likes": likes_count,
-                "comments": comments_count,
-                "top_comments": top_comments,
-                "created_at": prompt.created_at,
-                "account_address": prompt.account_address
-            })
-
-        return {"total": total_prompts, "page": page, "page_size": page_size, "feed": feed}
+        accounts_query = union(followers_query, following_query)
+        return await _shuffled_feed(accounts_query, user_account, page, page_size, seed, cursor, include_total, comments_per_prompt, db)
+    except HTTPException:
+        raise
     except Exception as e:
         detail = {
             "info": "Failed to get combined feed",
@@ -748,7 +704,7 @@ async def get_combined_feed(user_account: str, db: Session = Depends(get_session
 
 
 @router.get("/prompt-likes/")
-async def get_prompt_likes(prompt_id: int, account_address: str, db: Session = Depends(get_session)):
+async def get_prompt_likes(prompt_id: int, account_address: str, db: AsyncSession = Depends(get_read_session)):
     """
     Retrieve the number of likes for a specific prompt and whether the user has liked it or not.
 
@@ -756,26 +712,45 @@ async def get_prompt_likes(prompt_id: int, account_address: str, db: Session = D
     - **account_address**: The account address of the user to check if they have liked the prompt.
     """
     try:
-        # Check if the prompt exists
-        prompt = db.query(Prompt).filter(Prompt.id == prompt_id).first()
-        if not prompt:
+        statuses = await services.like_statuses([prompt_id], account_address, db)
+        if not statuses:
             raise HTTPException(status_code=404, detail="Prompt not found")
 
-        # Count the number of likes for the prompt
-        likes_count = db.query(models.PostLike).filter(
-            models.PostLike.prompt_id == prompt_id
-        ).count()
-
-        # Check if the user has liked the prompt
-        user_liked = db.query(models.PostLike).filter(
-            models.PostLike.prompt_id == prompt_id,
-            models.PostLike.user_account == account_address
-        ).first()
-
+        _, likes_count, user_liked = statuses[0]
         return {
             "prompt_id": prompt_id,
             "likes_count": likes_count,
-            "user_liked": bool(user_liked)  # Return True if the user has liked, False otherwise
+            "user_liked": user_liked
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        detail = {
+            "info": "Failed to get prompt likes",
+            "error": str(e),
+        }
+        raise HTTPException(status_code=500, detail=detail)
+
+
+
+@router.post("/prompt-likes/bulk/")
+async def get_prompt_likes_bulk(request: schemas.PromptLikesBulkRequest, db: AsyncSession = Depends(get_read_session)):
+    """
+    Like counts and whether the user liked each prompt, for a whole page of prompts in one query.
+
+    - **prompt_ids**: IDs of the prompts (at most 100). Unknown IDs are left out of the results.
+    - **account_address**: The account address of the user to check likes for.
+    """
+    try:
+        statuses = await services.like_statuses(request.prompt_ids, request.account_address, db)
+        return {
+            "results": [
+                {
+                    "prompt_id": prompt_id,
+                    "likes_count": likes_count,
+                    "user_liked": user_liked
+                } for prompt_id, likes_count, user_liked in statuses
+            ]
         }
     except Exception as e:
         detail = {
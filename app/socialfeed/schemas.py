@@ -1,6 +1,8 @@
 from pydantic import BaseModel
 from app.prompts.schemas import PromptTypeEnum
-from typing import List
+from typing import List, Optional
+from datetime import datetime
+from pydantic import Field
 class LikePromptRequest(BaseModel):
     prompt_id: int
     prompt_type: PromptTypeEnum
@@ -12,9 +14,16 @@ class CommentPromptRequest(BaseModel):
     user_account: str
     comment: str
 
+class PromptLikesBulkRequest(BaseModel):
+    prompt_ids: List[int] = Field(..., max_length=100, description="IDs of the prompts on the page (at most 100)")
+    account_address: str
+
 class CommentResponse(BaseModel):
+    id: Optional[int] = None
     user_account: str
     comment: str
+    created_at: Optional[datetime] = None
+    pending: bool = False  # Still queued for the write-behind flusher, has no id yet
 
     class Config:
         from_attributes = True
@@ -22,6 +31,7 @@ class CommentResponse(BaseModel):
 class CommentsListResponse(BaseModel):
     comments: List[CommentResponse]
     total_comments: int
+    next_cursor: Optional[str] = None  # Opaque cursor for the next page, None on the last page
 
     class Config:
         from_attributes = True
\ No newline at end of file
@@ -1,39 +1,390 @@
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from . import schemas
+import logging
+from typing import Dict, List, Optional
+from sqlalchemy import and_, case, func, select, update, delete, literal, DateTime, String
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta, timezone
+from . import schemas, feed_store, write_behind
+from . import models as socialfeed_models
 from app.leaderboard import models
+from app.leaderboard import services as leaderboard_services
+from app.prompts.models import Prompt
+from app.prompts import scoring
+from app.core.database import dialect_insert
+from app.core.constants import FEED_MAX_LENGTH, ENGAGEMENT_WRITE_BEHIND
+from app.core.helpers import encode_keyset_cursor, decode_keyset_cursor, paginate_keyset_async
 
-def update_user_stats(user_account: str, db: Session):
+logger = logging.getLogger(__name__)
+
+async def update_user_stats(user_account: str, db: AsyncSession) -> models.UserStats:
     """
     Update the user stats after a generation:
     - Add 2 XP per generation.
     - Update the streak if generations happen on consecutive days.
+
+    A single upsert, so concurrent generations by the same account can't lose increments.
+    Doesn't commit: the caller commits it together with the prompt and then pushes the
+    returned stats to the leaderboards with `record_user_stats`.
+    """
+    user_stat, = await update_user_stats_bulk({user_account: 1}, db)
+    return user_stat
+
+
+async def update_user_stats_bulk(generations: Dict[str, int], db: AsyncSession) -> List[models.UserStats]:
+    """
+    `update_user_stats` for a batch of generations (account -> number of generations),
+    all accounts in one `INSERT ... ON CONFLICT (user_account) DO UPDATE`.
+    """
+    if not generations:
+        return []
+
+    now = datetime.utcnow()
+    today = datetime.combine(now.date(), datetime.min.time())
+    yesterday = today - timedelta(days=1)
+
+    UserStats = models.UserStats
+    stmt = dialect_insert(db, UserStats).values([
+        {
+            "user_account": account,
+            "xp": 2 * count,
+            "total_generations": count,
+            "streak_days": 1,
+            "last_generation": now,
+        }
+        for account, count in generations.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserStats.user_account],
+        set_={
+            "xp": func.coalesce(UserStats.xp, 0) + stmt.excluded.xp,
+            "total_generations": func.coalesce(UserStats.total_generations, 0) + stmt.excluded.total_generations,
+            # Same day keeps the streak, the day after extends it, anything else restarts it
+            "streak_days": case(
+                (UserStats.last_generation >= today, func.coalesce(UserStats.streak_days, 0)),
+                (UserStats.last_generation >= yesterday, func.coalesce(UserStats.streak_days, 0) + 1),
+                else_=1,
+            ),
+            "last_generation": stmt.excluded.last_generation,
+        },
+    ).returning(UserStats)
+
+    return list((await db.scalars(stmt, execution_options={"populate_existing": True})).all())
+
+
+
+# The social feed's order, newest first, shared by the timeline and the database query
+FEED_ORDER = [Prompt.created_at, Prompt.id]
+
+
+async def warm_timeline(db: AsyncSession):
+    """
+    Rebuild the precomputed feed timeline from the newest FEED_MAX_LENGTH prompts,
+    along with the prompt count the feed reports as its total.
+    """
+    prompt_count = await db.scalar(select(func.count(Prompt.id)))
+    rows = (await db.execute(
+        select(Prompt.id, Prompt.created_at).order_by(Prompt.created_at.desc(), Prompt.id.desc()).limit(FEED_MAX_LENGTH)
+    )).all()
+    await feed_store.feed_store.rebuild([(row.id, feed_store.feed_score(row.created_at)) for row in rows], prompt_count)
+
+
+async def add_to_timeline(prompts: List[Prompt]):
     """
-    user_stat = db.query(models.UserStats).filter(models.UserStats.user_account == user_account).first()
-    
-    if not user_stat:
-        # Create new user stat if not present with default values for xp and generations
-        user_stat = models.UserStats(user_account=user_account, xp=0, total_generations=0, streak_days=0)
-        db.add(user_stat)
-    
-    # Calculate XP
-    user_stat.xp += 2
-    user_stat.total_generations += 1
-
-    # Update streak if the last generation was yesterday
-    if user_stat.last_generation:
-        last_generation_date = user_stat.last_generation.date()
-        today_date = datetime.utcnow().date()
-        
-        if today_date == last_generation_date + timedelta(days=1):
-            user_stat.streak_days += 1
-        elif today_date != last_generation_date:
-            user_stat.streak_days = 1  # Reset streak if a day is skipped
+    Push newly created prompts onto the precomputed feed timeline.
+    Feed delivery is best effort, a Redis outage must not fail the prompt insert.
+    """
+    try:
+        await feed_store.feed_store.push([(prompt.id, feed_store.feed_score(prompt.created_at)) for prompt in prompts])
+    except Exception as e:
+        logger.warning("Failed to add prompts %s to the feed timeline: %s", [prompt.id for prompt in prompts], e)
+
+
+async def read_timeline_page(cursor: Optional[str], page_size: int, db: AsyncSession):
+    """
+    Serve one feed page from the precomputed timeline, newest first. Returns
+    `(prompts, next_cursor)`, or None when the timeline is cold and the caller has
+    to fall back to the database query.
+
+    The timeline keeps the newest FEED_MAX_LENGTH prompts, past them the page is filled
+    from the database with the same keyset query the cold path uses.
+    """
+    store = feed_store.feed_store
+    if not await store.is_warm():
+        return None
+
+    before = None
+    if cursor:
+        created_at, prompt_id = decode_keyset_cursor(cursor, FEED_ORDER)
+        before = (feed_store.feed_score(created_at), prompt_id)
+
+    entries = await store.page(before, page_size + 1)
+    prompt_ids = [prompt_id for prompt_id, _ in entries[:page_size]]
+    prompts_by_id = {
+        prompt.id: prompt
+        for prompt in (await db.execute(select(Prompt).filter(Prompt.id.in_(prompt_ids)))).scalars().all()
+    }
+    # Prompts deleted since they were pushed are simply skipped
+    prompts = [prompts_by_id[prompt_id] for prompt_id in prompt_ids if prompt_id in prompts_by_id]
+
+    if entries:
+        last_id, last_score = entries[min(len(entries), page_size) - 1]
+        last = prompts_by_id.get(last_id)
+        last_cursor = encode_keyset_cursor(
+            FEED_ORDER,
+            last.created_at if last else datetime.fromtimestamp(last_score, timezone.utc).replace(tzinfo=None), last_id
+        )
     else:
-        user_stat.streak_days = 1  # First day of streak
+        last_cursor = cursor
+
+    if len(entries) > page_size:
+        return prompts, last_cursor
+    if len(entries) == page_size:
+        # Full page, the database tells whether anything older is left
+        older, _ = await paginate_keyset_async(db, select(Prompt.id), FEED_ORDER, 1, cursor=last_cursor)
+        return prompts, last_cursor if older else None
+
+    # The timeline ran out, continue with the older prompts from the database
+    rest, next_cursor = await paginate_keyset_async(
+        db, select(Prompt), FEED_ORDER, page_size - len(entries), cursor=last_cursor
+    )
+    return prompts + rest, next_cursor
+
+
+async def top_prompts_by_account(accounts: List[str], db: AsyncSession, limit: int = 5):
+    """
+    The `limit` most liked prompts of each account, fetched with a single windowed query.
+    Returns `{account: [Prompt, ...]}`, most liked first.
+    """
+    if not accounts:
+        return {}
+
+    rank = func.row_number().over(
+        partition_by=Prompt.account_address,
+        order_by=(Prompt.likes_count.desc(), Prompt.id.desc())
+    ).label("rank")
+    ranked = select(Prompt.id, rank).filter(Prompt.account_address.in_(accounts)).subquery()
+    prompts = (await db.execute(
+        select(Prompt)
+        .join(ranked, ranked.c.id == Prompt.id)
+        .filter(ranked.c.rank <= limit)
+        .order_by(Prompt.account_address, ranked.c.rank)
+    )).scalars().all()
+
+    await write_behind.overlay_pending(prompts)
+    top_prompts = {account: [] for account in accounts}
+    for prompt in prompts:
+        top_prompts[prompt.account_address].append(prompt)
+    return top_prompts
+
+
+async def read_comments_page(prompt_id: int, prompt_type, page_size: int, cursor: Optional[str], db: AsyncSession):
+    """
+    One page of a prompt's comments, newest first, keyset-paginated on `(created_at, id)`.
+    Returns `(comments, total_comments, next_cursor)`, or None when the prompt doesn't exist.
+    The total is the prompt's denormalized counter, no comments are counted.
+
+    With write-behind on, the first page also starts with the comments still queued, as
+    `CommentResponse`s marked `pending` (on top of `page_size`), and the total counts them.
+    """
+    row = (await db.execute(
+        select(Prompt.comments_count, Prompt.engagement_seq).filter(Prompt.id == prompt_id, Prompt.prompt_type == prompt_type)
+    )).first()
+    if row is None:
+        return None
+    total_comments, engagement_seq = row
+
+    pending = []
+    if ENGAGEMENT_WRITE_BEHIND:
+        queued = await write_behind.engagement_queue.pending_comments(prompt_id, engagement_seq)
+        total_comments += len(queued)
+        if not cursor:
+            pending = [
+                schemas.CommentResponse(
+                    user_account=comment["user_account"],
+                    comment=comment["comment"],
+                    created_at=datetime.fromisoformat(comment["at"]),
+                    pending=True
+                )
+                for comment in queued
+            ]
+
+    PostComment = socialfeed_models.PostComment
+    comments, next_cursor = await paginate_keyset_async(
+        db, select(PostComment).filter(PostComment.prompt_id == prompt_id),
+        [PostComment.created_at, PostComment.id], page_size, cursor=cursor
+    )
+    return pending + comments, total_comments, next_cursor
+
+
+def top_comments_query(prompt_ids: List[int], limit: int):
+    """The `limit` latest comments of each prompt: every prompt gets its own top N, however chatty the others are."""
+    PostComment = socialfeed_models.PostComment
+    rank = func.row_number().over(
+        partition_by=PostComment.prompt_id,
+        order_by=(PostComment.created_at.desc(), PostComment.id.desc())
+    ).label("rank")
+    ranked = (
+        select(PostComment.prompt_id, PostComment.user_account, PostComment.comment, PostComment.created_at, rank)
+        .filter(PostComment.prompt_id.in_(prompt_ids))
+        .subquery()
+    )
+    return (
+        select(ranked.c.prompt_id, ranked.c.user_account, ranked.c.comment, ranked.c.created_at)
+        .filter(ranked.c.rank <= limit)
+        .order_by(ranked.c.prompt_id, ranked.c.rank)
+    )
+
+
+async def top_comments_by_prompt(prompt_ids: List[int], limit: int, db: AsyncSession) -> dict:
+    """
+    The `limit` latest comments of each prompt, fetched with a single windowed query.
+    Returns `{prompt_id: [comment dict, ...]}`, newest first.
+    """
+    top_comments = {prompt_id: [] for prompt_id in prompt_ids}
+    if not prompt_ids or limit <= 0:
+        return top_comments
+
+    rows = (await db.execute(top_comments_query(prompt_ids, limit))).all()
+    for row in rows:
+        top_comments[row.prompt_id].append({
+            "user_account": row.user_account,
+            "comment": row.comment,
+            "created_at": row.created_at
+        })
+    return top_comments
+
+
+async def record_like(prompt_id: int, prompt_type, user_account: str, db: AsyncSession) -> Optional[int]:
+    """
+    Insert a like and bump the prompt's counter and scores with it, as a single statement on PostgreSQL.
+    Returns the new like count, or None when nothing was inserted (already liked, or no such prompt).
+    The caller commits.
+    """
+    now = datetime.utcnow()
+    like = (
+        dialect_insert(db, socialfeed_models.PostLike)
+        .from_select(
+            ["prompt_id", "prompt_type", "user_account", "created_at"],
+            select(Prompt.id, Prompt.prompt_type, literal(user_account, String), literal(now, DateTime))
+            .where(Prompt.id == prompt_id, Prompt.prompt_type == prompt_type)
+        )
+        .on_conflict_do_nothing(index_elements=["prompt_id", "user_account"])
+        .returning(socialfeed_models.PostLike.prompt_id)
+    )
+    bump = (
+        update(Prompt)
+        .values(likes_count=Prompt.likes_count + 1, **scoring.score_bump(Prompt, scoring.LIKE_WEIGHT, now))
+        .returning(Prompt.likes_count)
+    )
+
+    if db.bind.dialect.name == "postgresql":
+        inserted = like.cte("inserted_like")
+        return await db.scalar(bump.where(Prompt.id.in_(select(inserted.c.prompt_id))))
+
+    # SQLite has no data-modifying CTEs: two statements in the same transaction
+    if (await db.execute(like)).first() is None:
+        return None
+    return await db.scalar(bump.where(Prompt.id == prompt_id))
+
 
-    # Update last generation timestamp
-    user_stat.last_generation = datetime.utcnow()
+async def remove_like(prompt_id: int, prompt_type, user_account: str, db: AsyncSession) -> Optional[int]:
+    """
+    Delete a like and decrement the prompt's counter with it, the counterpart of `record_like`.
+    Returns the new like count, or None when there was no such like. The scores keep the event
+    until the next `recompute_prompt_scores` run. The caller commits.
+    """
+    unlike = (
+        delete(socialfeed_models.PostLike)
+        .where(
+            socialfeed_models.PostLike.prompt_id == prompt_id,
+            socialfeed_models.PostLike.prompt_type == prompt_type,
+            socialfeed_models.PostLike.user_account == user_account
+        )
+        .returning(socialfeed_models.PostLike.prompt_id)
+    )
+    drop = update(Prompt).values(likes_count=Prompt.likes_count - 1).returning(Prompt.likes_count)
+
+    if db.bind.dialect.name == "postgresql":
+        deleted = unlike.cte("deleted_like")
+        return await db.scalar(drop.where(Prompt.id.in_(select(deleted.c.prompt_id))))
+
+    if (await db.execute(unlike)).first() is None:
+        return None
+    return await db.scalar(drop.where(Prompt.id == prompt_id))
+
+
+async def liked_prompt_ids(prompt_ids: List[int], user_account: str, db: AsyncSession) -> set:
+    """The subset of `prompt_ids` liked by `user_account`, one lookup on the (prompt_id, user_account) index."""
+    if not prompt_ids:
+        return set()
+    liked = set((await db.execute(
+        select(socialfeed_models.PostLike.prompt_id).filter(
+            socialfeed_models.PostLike.prompt_id.in_(prompt_ids),
+            socialfeed_models.PostLike.user_account == user_account
+        )
+    )).scalars().all())
+    if ENGAGEMENT_WRITE_BEHIND:
+        liked |= await write_behind.engagement_queue.pending_liked(prompt_ids, user_account)
+    return liked
+
+
+async def like_statuses(prompt_ids: List[int], user_account: str, db: AsyncSession) -> list:
+    """
+    Like count and whether `user_account` liked it, for each existing prompt in `prompt_ids`, in one query.
+    Returns `[(prompt_id, likes_count, user_liked)]` in the order of `prompt_ids`.
+    """
+    if not prompt_ids:
+        return []
+    PostLike = socialfeed_models.PostLike
+    rows = (await db.execute(
+        select(Prompt.id, Prompt.likes_count, PostLike.id.is_not(None), Prompt.engagement_seq)
+        .outerjoin(PostLike, and_(PostLike.prompt_id == Prompt.id, PostLike.user_account == user_account))
+        .filter(Prompt.id.in_(prompt_ids))
+    )).all()
+    by_id = {prompt_id: (prompt_id, likes_count, bool(liked)) for prompt_id, likes_count, liked, _ in rows}
 
-    db.commit()
+    if ENGAGEMENT_WRITE_BEHIND and by_id:
+        # Count the likes still waiting in the write-behind queue
+        pending = await write_behind.engagement_queue.pending_counts({row.id: row.engagement_seq for row in rows})
+        pending_liked = await write_behind.engagement_queue.pending_liked(list(by_id), user_account)
+        by_id = {
+            prompt_id: (prompt_id, likes_count + pending[prompt_id][0], liked or prompt_id in pending_liked)
+            for prompt_id, (_, likes_count, liked) in by_id.items()
+        }
+    return [by_id[prompt_id] for prompt_id in dict.fromkeys(prompt_ids) if prompt_id in by_id]
+
+
+async def queue_like(prompt_id: int, prompt_type, user_account: str, db: AsyncSession):
+    """
+    Write-behind counterpart of `record_like`: queue the like instead of inserting it.
+    Returns `(queued, total_likes)` with pending likes included, or None when the prompt doesn't exist.
+    """
+    PostLike = socialfeed_models.PostLike
+    row = (await db.execute(
+        select(Prompt.likes_count, PostLike.id.is_not(None), Prompt.engagement_seq)
+        .outerjoin(PostLike, and_(PostLike.prompt_id == Prompt.id, PostLike.user_account == user_account))
+        .filter(Prompt.id == prompt_id, Prompt.prompt_type == prompt_type)
+    )).first()
+    if row is None:
+        return None
+
+    likes_count, already_liked, engagement_seq = row
+    queued = not already_liked and await write_behind.engagement_queue.enqueue_like(prompt_id, prompt_type, user_account)
+    pending = (await write_behind.engagement_queue.pending_counts({prompt_id: engagement_seq}))[prompt_id][0]
+    return queued, likes_count + pending
+
+
+async def queue_comment(prompt_id: int, prompt_type, user_account: str, comment: str, db: AsyncSession):
+    """
+    Write-behind counterpart of the comment insert. Returns `(event, total_comments)` with pending
+    comments included, or None when the prompt doesn't exist.
+    """
+    row = (await db.execute(
+        select(Prompt.comments_count, Prompt.engagement_seq).filter(Prompt.id == prompt_id, Prompt.prompt_type == prompt_type)
+    )).first()
+    if row is None:
+        return None
 
+    comments_count, engagement_seq = row
+    event = await write_behind.engagement_queue.enqueue_comment(prompt_id, prompt_type, user_account, comment)
+    pending = (await write_behind.engagement_queue.pending_counts({prompt_id: engagement_seq}))[prompt_id][1]
+    return event, comments_count + pending
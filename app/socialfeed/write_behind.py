@@ -0,0 +1,378 @@
+"""
+Write-behind buffering for likes and comments (opt-in, `ENGAGEMENT_WRITE_BEHIND`).
+
+Instead of writing to the database, the like and comment endpoints queue an
+event and answer straight away. A flusher drains the queue in batches: one
+multi-row INSERT per kind of event and one counter/score UPDATE per touched
+prompt (a single executemany), all in one transaction.
+
+Every event is numbered from one global sequence and stays pending until it
+is flushed. The read paths add the pending likes and comments to the stored
+counters (`overlay_pending`), and list pending comments first, so users see
+their own engagement immediately. The flush records the highest sequence it
+applied to each prompt in `prompts.engagement_seq`, in the same transaction
+as the counters, and the overlay only counts events past it: an event that is
+committed but not yet cleared from the pending set is never counted twice.
+With several flushers an event may briefly go uncounted while a batch with
+later events for the same prompt commits before its own.
+
+With Redis the queue is the `engagement:events` stream, drained by the celery
+`flush_engagement_events` task. Without it the queue lives in process and is
+drained by `run_in_process_flusher`, started with the app.
+
+Delivery is at-least-once: a batch is acknowledged after it commits. Replayed
+likes are absorbed by the unique (prompt_id, user_account) index, a comment
+replayed after a crash between commit and acknowledgement is stored twice.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+from collections import defaultdict, deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import bindparam, case, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.constants import ENGAGEMENT_WRITE_BEHIND, ENGAGEMENT_BATCH_SIZE, ENGAGEMENT_FLUSH_INTERVAL_SECONDS
+from app.core.database import dialect_insert
+from app.core.redis import redis_client
+from app.core.enums.tags import PromptTypeEnum
+from app.prompts import scoring
+from app.prompts.models import Prompt
+from . import models
+
+logger = logging.getLogger(__name__)
+
+EVENTS_STREAM = "engagement:events"
+CONSUMER_GROUP = "engagement-flushers"
+SEQ_KEY = "engagement:seq"  # Last event number handed out
+
+# Stream entries left unacknowledged this long (crashed worker) are claimed by the next flush
+CLAIM_IDLE_MS = 60 * 1000
+
+
+def _pending_likes_key(prompt_id) -> str:
+    return f"engagement:pending:likes:{prompt_id}"  # Sorted set account -> seq of queued likes
+
+
+def _pending_comments_key(prompt_id) -> str:
+    return f"engagement:pending:comments:{prompt_id}"  # Sorted set "<seq>:<comment json>" -> seq of queued comments
+
+
+def _event(kind: str, prompt_id: int, prompt_type: PromptTypeEnum, user_account: str, comment: str = "") -> dict:
+    return {
+        "kind": kind,
+        "prompt_id": str(prompt_id),
+        "prompt_type": PromptTypeEnum(prompt_type).value,
+        "user_account": user_account,
+        "comment": comment,
+        "at": datetime.utcnow().isoformat(),
+    }
+
+
+def _pending_comment(event: dict) -> dict:
+    return {"seq": int(event["seq"]), "user_account": event["user_account"], "comment": event["comment"], "at": event["at"]}
+
+
+class InMemoryEngagementQueue:
+    """In-process stand-in for `RedisEngagementQueue`, used for local runs and tests."""
+
+    def __init__(self):
+        self._events = deque()
+        self._seq = itertools.count(1)
+        self._pending_likes = defaultdict(dict)  # prompt_id -> {account: seq}
+        self._pending_comments = defaultdict(dict)  # prompt_id -> {seq: pending comment}
+
+    async def enqueue_like(self, prompt_id: int, prompt_type: PromptTypeEnum, user_account: str) -> bool:
+        if user_account in self._pending_likes[prompt_id]:
+            return False
+        event = {**_event("like", prompt_id, prompt_type, user_account), "seq": str(next(self._seq))}
+        self._pending_likes[prompt_id][user_account] = int(event["seq"])
+        self._events.append(event)
+        return True
+
+    async def enqueue_comment(self, prompt_id: int, prompt_type: PromptTypeEnum, user_account: str, comment: str) -> dict:
+        event = {**_event("comment", prompt_id, prompt_type, user_account, comment), "seq": str(next(self._seq))}
+        self._pending_comments[prompt_id][int(event["seq"])] = _pending_comment(event)
+        self._events.append(event)
+        return event
+
+    async def pending_counts(self, applied: Dict[int, int]) -> Dict[int, Tuple[int, int]]:
+        """Queued `(likes, comments)` per prompt, counting only events past its `applied` sequence."""
+        return {
+            prompt_id: (
+                sum(1 for seq in self._pending_likes.get(prompt_id, {}).values() if seq > seq_applied),
+                sum(1 for seq in self._pending_comments.get(prompt_id, {}) if seq > seq_applied),
+            )
+            for prompt_id, seq_applied in applied.items()
+        }
+
+    async def pending_liked(self, prompt_ids: List[int], user_account: str) -> set:
+        return {prompt_id for prompt_id in prompt_ids if user_account in self._pending_likes.get(prompt_id, {})}
+
+    async def pending_comments(self, prompt_id: int, applied: int) -> List[dict]:
+        """A prompt's queued comments past its `applied` sequence, newest first."""
+        comments = self._pending_comments.get(prompt_id, {})
+        return [comments[seq] for seq in sorted(comments, reverse=True) if seq > applied]
+
+    def take(self, limit: int) -> List[dict]:
+        return [self._events.popleft() for _ in range(min(limit, len(self._events)))]
+
+    def requeue(self, events: List[dict]):
+        self._events.extendleft(reversed(events))
+
+    def done(self, events: List[dict]):
+        for event in events:
+            prompt_id, seq = int(event["prompt_id"]), int(event["seq"])
+            if event["kind"] == "like":
+                if self._pending_likes[prompt_id].get(event["user_account"]) == seq:
+                    del self._pending_likes[prompt_id][event["user_account"]]
+                pending = self._pending_likes
+            else:
+                self._pending_comments[prompt_id].pop(seq, None)
+                pending = self._pending_comments
+            if not pending[prompt_id]:
+                del pending[prompt_id]
+
+
+# Numbers the like, marks it pending and queues the event in one atomic step, so a
+# failure can't leave a like marked pending that will never be flushed
+ENQUEUE_LIKE_SCRIPT = """
+if redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    return 0
+end
+local seq = redis.call('INCR', KEYS[2])
+redis.call('ZADD', KEYS[1], seq, ARGV[1])
+redis.call('XADD', KEYS[3], '*', 'seq', seq, unpack(ARGV, 2))
+return seq
+"""
+
+# Same for a comment, whose pending entry carries the text for the comment listings
+ENQUEUE_COMMENT_SCRIPT = """
+local seq = redis.call('INCR', KEYS[2])
+redis.call('ZADD', KEYS[1], seq, seq .. ':' .. ARGV[1])
+redis.call('XADD', KEYS[3], '*', 'seq', seq, unpack(ARGV, 2))
+return seq
+"""
+
+
+class RedisEngagementQueue:
+    """API side of the Redis stream, the celery worker drains it with `drain_stream`."""
+
+    def __init__(self, client):
+        self.client = client
+        self._enqueue_like = client.register_script(ENQUEUE_LIKE_SCRIPT)
+        self._enqueue_comment = client.register_script(ENQUEUE_COMMENT_SCRIPT)
+
+    async def enqueue_like(self, prompt_id: int, prompt_type: PromptTypeEnum, user_account: str) -> bool:
+        fields = [item for pair in _event("like", prompt_id, prompt_type, user_account).items() for item in pair]
+        seq = await self._enqueue_like(
+            keys=[_pending_likes_key(prompt_id), SEQ_KEY, EVENTS_STREAM],
+            args=[user_account, *fields],
+        )
+        return bool(seq)
+
+    async def enqueue_comment(self, prompt_id: int, prompt_type: PromptTypeEnum, user_account: str, comment: str) -> dict:
+        event = _event("comment", prompt_id, prompt_type, user_account, comment)
+        body = json.dumps({"user_account": user_account, "comment": comment, "at": event["at"]})
+        fields = [item for pair in event.items() for item in pair]
+        seq = await self._enqueue_comment(keys=[_pending_comments_key(prompt_id), SEQ_KEY, EVENTS_STREAM], args=[body, *fields])
+        return {**event, "seq": str(seq)}
+
+    async def pending_counts(self, applied: Dict[int, int]) -> Dict[int, Tuple[int, int]]:
+        """Queued `(likes, comments)` per prompt, counting only events past its `applied` sequence."""
+        if not applied:
+            return {}
+        async with self.client.pipeline(transaction=False) as pipe:
+            for prompt_id, seq_applied in applied.items():
+                pipe.zcount(_pending_likes_key(prompt_id), f"({seq_applied}", "+inf")
+                pipe.zcount(_pending_comments_key(prompt_id), f"({seq_applied}", "+inf")
+            counts = await pipe.execute()
+        return {prompt_id: (counts[2 * i], counts[2 * i + 1]) for i, prompt_id in enumerate(applied)}
+
+    async def pending_liked(self, prompt_ids: List[int], user_account: str) -> set:
+        if not prompt_ids:
+            return set()
+        async with self.client.pipeline(transaction=False) as pipe:
+            for prompt_id in prompt_ids:
+                pipe.zscore(_pending_likes_key(prompt_id), user_account)
+            scores = await pipe.execute()
+        return {prompt_id for prompt_id, score in zip(prompt_ids, scores) if score is not None}
+
+    async def pending_comments(self, prompt_id: int, applied: int) -> List[dict]:
+        """A prompt's queued comments past its `applied` sequence, newest first."""
+        members = await self.client.zrevrangebyscore(_pending_comments_key(prompt_id), "+inf", f"({applied}")
+        comments = []
+        for member in members:
+            seq, body = (member.decode() if isinstance(member, bytes) else member).split(":", 1)
+            comments.append({"seq": int(seq), **json.loads(body)})
+        return comments
+
+
+engagement_queue = RedisEngagementQueue(redis_client) if redis_client else InMemoryEngagementQueue()
+
+
+async def overlay_pending(prompts: Iterable[Prompt]):
+    """
+    Add the queued likes and comments to the prompts' counters for the response.
+    Only the loaded values change, nothing is marked dirty or written back.
+    """
+    prompts = list(prompts)
+    if not ENGAGEMENT_WRITE_BEHIND or not prompts:
+        return
+    try:
+        pending = await engagement_queue.pending_counts({prompt.id: prompt.engagement_seq for prompt in prompts})
+    except Exception as e:
+        logger.warning("Failed to read pending engagement: %s", e)
+        return
+    for prompt in prompts:
+        likes, comments = pending.get(prompt.id, (0, 0))
+        if likes:
+            set_committed_value(prompt, "likes_count", prompt.likes_count + likes)
+        if comments:
+            set_committed_value(prompt, "comments_count", prompt.comments_count + comments)
+
+
+def apply_engagement_events(db: Session, events: List[dict]) -> int:
+    """
+    Write a batch of queued events: multi-row inserts of the likes and comments, then one
+    executemany bumping each touched prompt's counters and scores and recording the last
+    event applied to it. Commits, returns the number of rows inserted.
+    """
+    prompt_ids = {int(event["prompt_id"]) for event in events}
+    # Prompts deleted since the event was queued are skipped rather than failing the batch
+    existing = set(db.scalars(select(Prompt.id).where(Prompt.id.in_(prompt_ids))))
+    rows = defaultdict(list)
+    for event in events:
+        if int(event["prompt_id"]) in existing:
+            rows[event["kind"]].append({
+                "prompt_id": int(event["prompt_id"]),
+                "prompt_type": PromptTypeEnum(event["prompt_type"]),
+                "user_account": event["user_account"],
+                "created_at": datetime.fromisoformat(event["at"]),
+                **({"comment": event["comment"]} if event["kind"] == "comment" else {}),
+            })
+
+    inserted = []  # (prompt_id, kind, weight, created_at)
+    if rows["like"]:
+        likes = db.execute(
+            dialect_insert(db, models.PostLike).values(rows["like"])
+            .on_conflict_do_nothing(index_elements=["prompt_id", "user_account"])
+            .returning(models.PostLike.prompt_id, models.PostLike.created_at)
+        ).all()
+        inserted += [(prompt_id, "like", scoring.LIKE_WEIGHT, created_at) for prompt_id, created_at in likes]
+    if rows["comment"]:
+        comments = db.execute(
+            dialect_insert(db, models.PostComment).values(rows["comment"])
+            .returning(models.PostComment.prompt_id, models.PostComment.created_at)
+        ).all()
+        inserted += [(prompt_id, "comment", scoring.COMMENT_WEIGHT, created_at) for prompt_id, created_at in comments]
+
+    by_prompt = defaultdict(list)
+    for prompt_id, kind, weight, created_at in inserted:
+        by_prompt[prompt_id].append((kind, weight, created_at))
+    last_seq = defaultdict(int)
+    for event in events:
+        last_seq[int(event["prompt_id"])] = max(last_seq[int(event["prompt_id"])], int(event["seq"]))
+
+    if by_prompt:
+        prompts = Prompt.__table__
+        db.execute(
+            update(prompts)
+            .where(prompts.c.id == bindparam("b_id"))
+            .values(
+                likes_count=prompts.c.likes_count + bindparam("b_likes"),
+                comments_count=prompts.c.comments_count + bindparam("b_comments"),
+                popularity_score=scoring.log_add_sql(prompts.c.popularity_score, bindparam("b_popularity")),
+                trending_score=scoring.log_add_sql(prompts.c.trending_score, bindparam("b_trending")),
+                # Another flusher may have committed later events for the prompt first
+                engagement_seq=case((prompts.c.engagement_seq < bindparam("b_seq"), bindparam("b_seq")), else_=prompts.c.engagement_seq),
+            ),
+            [
+                {
+                    "b_id": prompt_id,
+                    "b_likes": sum(1 for kind, _, _ in prompt_events if kind == "like"),
+                    "b_comments": sum(1 for kind, _, _ in prompt_events if kind == "comment"),
+                    "b_popularity": scoring.events_term([(weight, at) for _, weight, at in prompt_events], scoring.POPULARITY_HALF_LIFE_HOURS),
+                    "b_trending": scoring.events_term([(weight, at) for _, weight, at in prompt_events], scoring.TRENDING_HALF_LIFE_HOURS),
+                    "b_seq": last_seq[prompt_id],
+                }
+                for prompt_id, prompt_events in by_prompt.items()
+            ],
+        )
+    db.commit()
+    return len(inserted)
+
+
+def drain_stream(client, db_factory, batch_size: int = ENGAGEMENT_BATCH_SIZE, max_batches: int = 20) -> int:
+    """
+    Celery side: flush up to `max_batches` batches from the Redis stream, each in its own
+    transaction. `db_factory` is a context manager yielding a sync Session. Returns the
+    number of events processed.
+    """
+    consumer = f"{socket.gethostname()}-{os.getpid()}"
+    try:
+        client.xgroup_create(EVENTS_STREAM, CONSUMER_GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+    processed = 0
+    for _ in range(max_batches):
+        # Entries a crashed worker read but never acknowledged come first
+        messages = client.xautoclaim(EVENTS_STREAM, CONSUMER_GROUP, consumer, CLAIM_IDLE_MS, "0-0", count=batch_size)[1]
+        if not messages:
+            response = client.xreadgroup(CONSUMER_GROUP, consumer, {EVENTS_STREAM: ">"}, count=batch_size)
+            messages = response[0][1] if response else []
+        messages = [(message_id, fields) for message_id, fields in messages if fields]
+        if not messages:
+            break
+
+        events = [fields for _, fields in messages]
+        with db_factory() as db:
+            apply_engagement_events(db, events)
+
+        # The prompts' engagement_seq already hides these events from the overlay
+        pipe = client.pipeline(transaction=True)
+        for event in events:
+            key = (_pending_likes_key if event["kind"] == "like" else _pending_comments_key)(event["prompt_id"])
+            pipe.zremrangebyscore(key, event["seq"], event["seq"])
+        message_ids = [message_id for message_id, _ in messages]
+        pipe.xack(EVENTS_STREAM, CONSUMER_GROUP, *message_ids)
+        pipe.xdel(EVENTS_STREAM, *message_ids)
+        pipe.execute()
+        processed += len(events)
+    return processed
+
+
+def flush_in_process(queue: InMemoryEngagementQueue, db_factory, batch_size: int = ENGAGEMENT_BATCH_SIZE) -> int:
+    """
+    Write one batch from the in-process queue. A batch that fails goes back to the head of
+    the queue and the error is raised. Returns the number of events processed.
+    """
+    events = queue.take(batch_size)
+    if not events:
+        return 0
+    try:
+        with db_factory() as db:
+            apply_engagement_events(db, events)
+    except Exception:
+        queue.requeue(events)
+        raise
+    queue.done(events)
+    return len(events)
+
+
+async def run_in_process_flusher(queue: InMemoryEngagementQueue, db_factory, interval: float = ENGAGEMENT_FLUSH_INTERVAL_SECONDS):
+    """Drain the in-process queue every `interval` seconds, the local counterpart of the celery task."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(flush_in_process, queue, db_factory)
+        except Exception as e:
+            logger.warning("Failed to flush engagement events, will retry: %s", e)
@@ -0,0 +1,73 @@
+"""
+Shared fixtures: the API on a throwaway database filled by tests/seed.py.
+
+Tests run against `TEST_DATABASE_URL`, a database they are free to wipe, or
+by default a temporary SQLite file. Redis is never used, every store falls
+back to its in-process version.
+"""
+import os
+import tempfile
+from pathlib import Path
+
+os.environ["SQLALCHEMY_DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["ASYNC_SQLALCHEMY_DATABASE_URL"] = ""
+os.environ["SQLALCHEMY_REPLICA_URLS"] = ""
+os.environ["REDIS_URL"] = ""
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi.testclient import TestClient
+
+from app.core import cache
+from app.core.database import Base, engine, get_session_with_ctx_manager
+from app.core.query_budget import query_budget as _query_budget
+from app.main import app
+from app.socialfeed import feed_store, routes as socialfeed_routes
+from tests import seed
+
+ROOT = Path(__file__).parent.parent
+SEED_ARGS = ["--users", "40", "--prompts", "300", "--likes", "1500", "--comments", "400", "--fixed-clock"]
+
+
+@pytest.fixture(scope="session")
+def manifest():
+    """Seeds the database once per run, returns the seeder's manifest (accounts, prompt ids)."""
+    if engine.dialect.name == "postgresql":
+        # The migrations also create the search indexes the models don't declare
+        config = Config(str(ROOT / "alembic.ini"))
+        config.set_main_option("script_location", str(ROOT / "alembic"))
+        command.upgrade(config, "head")
+    else:
+        Base.metadata.create_all(engine)
+    rows, manifest = seed.generate(seed.parse_args(SEED_ARGS))
+    with get_session_with_ctx_manager() as db:
+        seed.seed(db, rows, reset=True)
+    return manifest
+
+
+@pytest.fixture(scope="session")
+def client(manifest):
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(autouse=True)
+def empty_response_cache(monkeypatch):
+    """Every test starts with an empty response cache, so its requests reach the database."""
+    monkeypatch.setattr(cache, "response_cache", cache.InMemoryCache())
+
+
+@pytest.fixture(autouse=True)
+def cold_feed_timeline(monkeypatch):
+    """Every test starts with a cold feed timeline, so the first feed request rebuilds it."""
+    store = feed_store.InMemoryFeedStore()
+    monkeypatch.setattr(feed_store, "feed_store", store)
+    monkeypatch.setattr(socialfeed_routes, "feed_store", store)
+    return store
+
+
+@pytest.fixture
+def query_budget():
+    """`app.core.query_budget.query_budget`: fails the test if a request inside the block runs more queries than allowed."""
+    return _query_budget
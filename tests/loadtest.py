@@ -0,0 +1,132 @@
+"""
+Run the Locust suite headless and record a JSON report, or compare two reports.
+
+    python -m tests.loadtest --host http://localhost:8000 --users 100 --run-time 2m
+    python -m tests.loadtest --compare tests/reports/<old>.json tests/reports/<new>.json
+
+A report holds, per endpoint (`METHOD /route/`), the request and failure
+counts, throughput and latency percentiles in milliseconds, along with the
+commit it was taken on and the run settings. It is written with sorted keys
+to `tests/reports/<commit>.json` by default, so reports of two commits can be
+diffed directly or with `--compare`, which prints the change of each metric.
+Seed the database first (tests/seed.py) with the same arguments for both runs.
+"""
+import argparse
+import csv
+import json
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+TESTS_DIR = Path(__file__).parent
+DEFAULT_LOCUSTFILE = TESTS_DIR / "locustfile.py"
+REPORTS_DIR = TESTS_DIR / "reports"
+
+PERCENTILES = ["50%", "90%", "95%", "99%", "99.9%"]
+COMPARED = ["rps", "p50", "p95", "p99", "failures"]
+
+
+def _git(*args) -> str:
+    try:
+        return subprocess.run(["git", *args], cwd=TESTS_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _number(value: str) -> float:
+    return float(value) if value not in ("", "N/A") else 0.0
+
+
+def _endpoint_stats(row: dict) -> dict:
+    stats = {
+        "requests": int(row["Request Count"]),
+        "failures": int(row["Failure Count"]),
+        "rps": round(_number(row["Requests/s"]), 2),
+        "avg_ms": round(_number(row["Average Response Time"]), 1),
+        "max_ms": round(_number(row["Max Response Time"]), 1),
+    }
+    for percentile in PERCENTILES:
+        stats["p" + percentile.rstrip("%")] = _number(row[percentile])
+    return stats
+
+
+def parse_stats(stats_csv: Path) -> dict:
+    """Locust's `<prefix>_stats.csv` as `{"endpoints": {...}, "total": {...}}`."""
+    endpoints, total = {}, {}
+    with stats_csv.open() as file:
+        for row in csv.DictReader(file):
+            if row["Name"] == "Aggregated":
+                total = _endpoint_stats(row)
+            else:
+                endpoints[f"{row['Type']} {row['Name']}"] = _endpoint_stats(row)
+    return {"endpoints": endpoints, "total": total}
+
+
+def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        prefix = Path(directory) / "run"
+        command = [
+            sys.executable, "-m", "locust", "-f", str(args.locustfile), "--headless", "--only-summary",
+            "--host", args.host, "--users", str(args.users), "--spawn-rate", str(args.spawn_rate),
+            "--run-time", args.run_time, "--csv", str(prefix), "--exit-code-on-error", "0",
+        ]
+        subprocess.run(command, check=True)
+        report = parse_stats(prefix.with_name("run_stats.csv"))
+
+    report.update(
+        commit=_git("rev-parse", "HEAD"),
+        dirty=bool(_git("status", "--porcelain", "--untracked-files=no")),
+        created_at=datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        settings={"host": args.host, "users": args.users, "spawn_rate": args.spawn_rate, "run_time": args.run_time},
+    )
+    return report
+
+
+def _change(old: float, new: float) -> str:
+    if not old:
+        return "new" if new else "-"
+    return f"{(new - old) / old * 100:+.0f}%"
+
+
+def compare(old: dict, new: dict) -> str:
+    """A table of each endpoint's metrics in `old` and `new` and their relative change."""
+    lines = [f"{'endpoint':60} " + " ".join(f"{metric:>22}" for metric in COMPARED)]
+    rows = [(name, old["endpoints"].get(name, {}), new["endpoints"].get(name, {}))
+            for name in sorted(set(old["endpoints"]) | set(new["endpoints"]))]
+    rows.append(("TOTAL", old.get("total", {}), new.get("total", {})))
+    for name, before, after in rows:
+        cells = []
+        for metric in COMPARED:
+            a, b = before.get(metric, 0), after.get(metric, 0)
+            cells.append(f"{f'{a:g} -> {b:g} ({_change(a, b)})':>22}")
+        lines.append(f"{name[:60]:60} " + " ".join(cells))
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the Locust suite and record, or compare, latency reports.")
+    parser.add_argument("--host", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=50, help="Concurrent simulated users")
+    parser.add_argument("--spawn-rate", type=float, default=10, help="Users started per second")
+    parser.add_argument("--run-time", default="1m", help="e.g. 30s, 5m")
+    parser.add_argument("--locustfile", type=Path, default=DEFAULT_LOCUSTFILE)
+    parser.add_argument("--out", type=Path, help="Report path, tests/reports/<commit>.json by default")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("OLD", "NEW"), help="Compare two reports instead of running")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.compare:
+        old, new = (json.loads(path.read_text()) for path in args.compare)
+        print(compare(old, new))
+        sys.exit(0)
+
+    report = run(args)
+    out = args.out or REPORTS_DIR / f"{report['commit'][:12] or 'report'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+    total = report["total"]
+    print(f"{total.get('requests', 0)} requests, {total.get('rps', 0)} req/s, p95 {total.get('p95', 0)} ms -> {out}")
@@ -1,38 +1,273 @@
+"""
+Locust scenarios for every router, over the data seeded by tests/seed.py.
+
+    python -m tests.seed --reset
+    locust -f tests/locustfile.py --host http://localhost:8000
+
+`Viewer`s browse (listings, filters, search, feeds, comments, likes and
+leaderboards), `Creator`s also write (prompts, likes, comments, follows).
+Accounts and prompts are picked with the same power-law skew as the seeded
+data, so the viral prompts and popular creators stay hot. Requests are named
+by route, not URL, so every endpoint is one row in the stats. The manifest
+written by the seeder is read from `LOAD_MANIFEST` (default
+tests/load_manifest.json). tests/loadtest.py runs this headless and writes a
+JSON report.
+"""
+import itertools
+import json
+import os
 import random
-from locust import HttpUser, TaskSet, task, between
+from pathlib import Path
 
-class UserBehavior(TaskSet):
-    @task(1)
-    def get_public_prompts(self):
+from locust import HttpUser, between, task
+
+MANIFEST = json.loads(Path(os.getenv("LOAD_MANIFEST", Path(__file__).with_name("load_manifest.json"))).read_text())
+
+SKEW = 1.1  # Same as the seeder's default
+TAGS = ["3D Art", "Anime", "Photography", "Vector", "Sci-Fi", "Fantasy", "all"]
+BOARDS = ["xp", "streaks", "generations-24h"]
+
+
+def _cum_weights(count):
+    return list(itertools.accumulate(1 / rank ** SKEW for rank in range(1, count + 1)))
+
+
+ACCOUNT_WEIGHTS = _cum_weights(len(MANIFEST["accounts"]))
+CREATOR_WEIGHTS = _cum_weights(len(MANIFEST["creators"]))
+PUBLIC_WEIGHTS = _cum_weights(len(MANIFEST["public_prompt_ids"]))
+PREMIUM_WEIGHTS = _cum_weights(len(MANIFEST["premium_prompt_ids"]))
+
+
+def account():
+    return random.choices(MANIFEST["accounts"], cum_weights=ACCOUNT_WEIGHTS)[0]
+
+
+def creator():
+    return random.choices(MANIFEST["creators"], cum_weights=CREATOR_WEIGHTS)[0]
+
+
+def prompt(prompt_type=None):
+    """`(prompt_id, prompt_type)`, viral prompts most often."""
+    prompt_type = prompt_type or random.choices(["public", "premium"], weights=[7, 3])[0]
+    if prompt_type == "premium":
+        return random.choices(MANIFEST["premium_prompt_ids"], cum_weights=PREMIUM_WEIGHTS)[0], prompt_type
+    return random.choices(MANIFEST["public_prompt_ids"], cum_weights=PUBLIC_WEIGHTS)[0], prompt_type
+
+
+def words(count):
+    return " ".join(random.choice(MANIFEST["words"]) for _ in range(count))
+
+
+def public_prompt_body(owner):
+    return {
+        "ipfs_image_url": f"ipfs://load/new/{random.getrandbits(32)}",
+        "prompt": words(12),
+        "account_address": owner,
+        "post_name": words(3),
+        "public": True,
+        "prompt_tag": random.choice(TAGS[:-1]),
+    }
+
+
+def premium_prompt_body(owner):
+    return {
+        **public_prompt_body(owner),
+        "cid": f"bafyloadnew{random.getrandbits(32)}",
+        "ai_model": "stable-diffusion-xl",
+        "chain": "aptos",
+        "collection_name": words(2),
+        "max_supply": 100,
+        "prompt_nft_price": 1.5,
+    }
+
+
+class Viewer(HttpUser):
+    """Someone browsing: reads only, mostly the first pages."""
+
+    weight = 4
+    wait_time = between(0.5, 2)
+
+    def on_start(self):
+        self.account = account()
+
+    def _pages(self, url, params=None, body=None, pages=2):
         """
-        Test for fetching public prompts with pagination.
+        GET `params` (or POST `body`) to `url`, then follow `next_cursor` for up to `pages` pages.
+        A shuffled feed's `seed` is sent back with its cursor.
         """
-        page = random.randint(1, 10)
-        page_size = random.choice([5, 10, 20])
-        self.client.get(f"/prompts/get-public-prompts/?page={page}&page_size={page_size}")
+        data, cursor = None, None
+        for _ in range(pages):
+            page = {"cursor": cursor} if cursor else {}
+            if cursor and data.get("seed") is not None:
+                page["seed"] = data["seed"]
+            if body is None:
+                response = self.client.get(url, params={**params, **page}, name=url)
+            else:
+                response = self.client.post(url, json={**body, **page}, name=url)
+            if not response.ok:
+                return None
+            data = response.json()
+            cursor = data.get("next_cursor") if isinstance(data, dict) else None
+            if not cursor or random.random() < 0.5:
+                break
+        return data
+
+    @task(8)
+    def get_public_prompts(self):
+        data = self._pages("/prompts/get-public-prompts/", {
+            "page_size": random.choice([10, 20]), "include_total": False, "viewer_account": self.account,
+        })
+        prompt_ids = [item["id"] for item in (data or {}).get("prompts", [])]
+        if prompt_ids:
+            self.client.post("/socialfeed/prompt-likes/bulk/", json={
+                "prompt_ids": prompt_ids, "account_address": self.account,
+            }, name="/socialfeed/prompt-likes/bulk/")
+
+    @task(4)
+    def filter_public_prompts(self):
+        self._pages("/prompts/filter-public-prompts/", body={
+            "prompt_tag": random.choice(TAGS), "public": True, "page_size": random.choice([10, 20]),
+        })
 
     @task(2)
+    def prompt_tags(self):
+        self.client.get("/prompts/prompt-tags/", name="/prompts/prompt-tags/")
+
+    @task(3)
+    def search_prompts(self):
+        self._pages("/prompts/search/", {"q": words(random.choice([1, 2])), "page_size": 10})
+
+    @task(6)
     def get_premium_prompts(self):
-        """
-        Test for fetching premium prompts.
-        """
-        page = random.randint(1, 10)
-        page_size = random.choice([5, 10, 20])
-        self.client.get(f"/marketplace/get-premium-prompts/?page={page}&page_size={page_size}")
+        self._pages("/marketplace/get-premium-prompts/", {
+            "page_size": random.choice([10, 20]), "include_total": False,
+        })
 
     @task(1)
-    def filter_public_prompts(self):
-        """
-        Test for filtering public prompts.
-        """
-        payload = {
-            "prompt_tag": random.choice(["3D Art", "Anime", "all"]),
-            "public": random.choice([True]),
-            "page": random.randint(1, 5),
-            "page_size": random.choice([5, 10, 20])
-        }
-        self.client.post("/prompts/filter-public-prompts/", json=payload)
-
-class APIUser(HttpUser):
-    tasks = [UserBehavior]
-    wait_time = between(1, 5)  # Simulate wait time between tasks (1 to 5 seconds)
+    def premium_prompt_filters(self):
+        self.client.get("/marketplace/premium-prompt-filters/", name="/marketplace/premium-prompt-filters/")
+
+    @task(4)
+    def filter_premium_prompts(self):
+        self._pages("/marketplace/filter-premium-prompts/", body={
+            "filter_type": random.choice(["recent", "popular", "trending"]), "page_size": 10,
+        })
+
+    @task(8)
+    def feed(self):
+        self._pages("/socialfeed/feed/", {"user_account": self.account, "include_total": False})
+
+    @task(3)
+    def feed_following(self):
+        self._pages("/socialfeed/feed/following/", {"user_account": self.account, "include_total": False})
+
+    @task(2)
+    def feed_followers(self):
+        self._pages("/socialfeed/feed/followers/", {"user_account": self.account, "include_total": False})
+
+    @task(2)
+    def feed_combined(self):
+        self._pages("/socialfeed/feed/combined/", {"user_account": self.account, "include_total": False})
+
+    @task(4)
+    def prompt_comments(self):
+        prompt_id, prompt_type = prompt()
+        self._pages("/socialfeed/get-prompt-comments/", {
+            "prompt_id": prompt_id, "prompt_type": prompt_type, "limit": 10,
+        })
+
+    @task(3)
+    def prompt_likes(self):
+        prompt_id, _ = prompt()
+        self.client.get("/socialfeed/prompt-likes/", params={
+            "prompt_id": prompt_id, "account_address": self.account,
+        }, name="/socialfeed/prompt-likes/")
+
+    @task(2)
+    def creator_followers(self):
+        self._pages("/socialfeed/creator-followers/", {
+            "creator_account": creator(), "page_size": 20, "include_total": False,
+        })
+
+    @task(1)
+    def user_following(self):
+        self._pages("/socialfeed/user-following/", {
+            "follower_account": self.account, "page_size": 20, "include_total": False,
+        })
+
+    @task(3)
+    def leaderboard(self):
+        board = random.choice(BOARDS)
+        self._pages(f"/leaderboard/{board}/", {"page_size": 10, "include_total": False})
+
+    @task(2)
+    def leaderboard_me(self):
+        board = random.choice(BOARDS)
+        route = random.choice(["rank", "around"])
+        with self.client.get(f"/leaderboard/{board}/{route}/", params={
+            "user_account": self.account, **({"radius": 5} if route == "around" else {}),
+        }, name=f"/leaderboard/{{board}}/{route}/", catch_response=True) as response:
+            if response.status_code == 404:  # Viewers who never generated anything aren't ranked
+                response.success()
+
+
+class Creator(Viewer):
+    """An active user: browses like a `Viewer`, and also posts, likes, comments and follows."""
+
+    weight = 1
+
+    @task(6)
+    def like_and_unlike(self):
+        prompt_id, prompt_type = prompt()
+        self.client.post("/socialfeed/like-prompt/", json={
+            "prompt_id": prompt_id, "prompt_type": prompt_type, "user_account": self.account,
+        }, name="/socialfeed/like-prompt/")
+        if random.random() < 0.2:
+            # 409 while a write-behind like is still queued, which isn't a failure
+            with self.client.delete("/socialfeed/unlike-prompt/", params={
+                "prompt_id": prompt_id, "prompt_type": prompt_type, "user_account": self.account,
+            }, name="/socialfeed/unlike-prompt/", catch_response=True) as response:
+                if response.status_code == 409:
+                    response.success()
+
+    @task(3)
+    def comment(self):
+        prompt_id, prompt_type = prompt()
+        self.client.post("/socialfeed/comment-prompt/", json={
+            "prompt_id": prompt_id, "prompt_type": prompt_type, "user_account": self.account, "comment": words(8),
+        }, name="/socialfeed/comment-prompt/")
+
+    @task(2)
+    def follow_and_unfollow(self):
+        params = {"follower_account": self.account, "creator_account": creator()}
+        with self.client.post("/socialfeed/follow-creator/", params=params, name="/socialfeed/follow-creator/", catch_response=True) as response:
+            if "Already following" in response.text:
+                response.success()
+        if random.random() < 0.3:
+            with self.client.delete("/socialfeed/unfollow-creator/", params=params, name="/socialfeed/unfollow-creator/", catch_response=True) as response:
+                if "Not following" in response.text:
+                    response.success()
+
+    @task(2)
+    def add_public_prompt(self):
+        self.client.post("/prompts/add-public-prompts/", json=public_prompt_body(self.account), name="/prompts/add-public-prompts/")
+
+    @task(1)
+    def add_premium_prompt(self):
+        self.client.post("/marketplace/add-premium-prompts/", json=premium_prompt_body(self.account), name="/marketplace/add-premium-prompts/")
+
+    @task(1)
+    def add_prompts_bulk(self):
+        if random.random() < 0.5:
+            self.client.post("/prompts/add-public-prompts/bulk/", json={
+                "prompts": [public_prompt_body(self.account) for _ in range(10)],
+            }, name="/prompts/add-public-prompts/bulk/")
+        else:
+            self.client.post("/marketplace/add-premium-prompts/bulk/", json={
+                "prompts": [premium_prompt_body(self.account) for _ in range(10)],
+            }, name="/marketplace/add-premium-prompts/bulk/")
+
+    @task(1)
+    def grant_access(self):
+        prompt_id, _ = prompt("premium")
+        self.client.put(f"/prompts/prompts/{prompt_id}/grant_access", name="/prompts/prompts/{prompt_id}/grant_access")
@@ -0,0 +1,222 @@
+"""
+Deterministic load-test data for the Locust suite (tests/locustfile.py).
+
+Generates users, prompts, follows, likes, comments and user_stats with the
+skew of a real social app: follower counts and creator output follow a power
+law (a few creators have most of the audience), and a handful of viral
+prompts collect most of the likes and comments. The same arguments always
+produce the same rows (dated relative to the time of seeding, or to a fixed
+day with `--fixed-clock`), so load-test reports of different commits compare
+like with like.
+
+    python -m tests.seed --users 2000 --prompts 20000 --reset
+
+Writes through the sync engine (`SQLALCHEMY_DATABASE_URL`) into a migrated
+database, then saves a manifest (`tests/load_manifest.json` by default) with
+the accounts and prompt ids the Locust users pick from. Refuses to touch a
+database that already has prompts unless `--reset` is given, which empties
+every table it seeds. Restart the API (or flush Redis) afterwards so cached
+listings, feeds and leaderboards are rebuilt from the new data.
+"""
+import argparse
+import itertools
+import json
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import delete, func, insert, select
+
+from app.core.database import get_session_with_ctx_manager
+from app.core.enums.tags import PromptTagEnum, PromptTypeEnum
+from app.leaderboard.models import UserStats
+from app.prompts import scoring
+from app.prompts.models import Prompt
+from app.socialfeed.models import Follow, PostComment, PostLike
+
+DEFAULT_MANIFEST = Path(__file__).with_name("load_manifest.json")
+
+BATCH_SIZE = 1000
+XP_PER_GENERATION = 2  # Same as update_user_stats
+
+WORDS = [
+    "neon", "city", "dragon", "forest", "portrait", "cyberpunk", "sunset", "castle", "robot", "ocean",
+    "samurai", "galaxy", "watercolor", "desert", "cat", "mountain", "noir", "temple", "garden", "storm",
+]
+AI_MODELS = ["stable-diffusion-xl", "dall-e-3", "midjourney-v6", "flux-1"]
+CHAINS = ["aptos", "ethereum", "polygon"]
+
+
+def zipf_weights(count: int, exponent: float):
+    """Power-law weights for ranks 1..count: rank r gets 1 / r^exponent."""
+    return [1 / rank ** exponent for rank in range(1, count + 1)]
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def generate(args):
+    """Every row to insert, by model, plus the manifest. Uses nothing but `args.seed` for randomness."""
+    rng = random.Random(args.seed)
+    now = datetime(2024, 6, 1) if args.fixed_clock else datetime.utcnow()
+
+    accounts = ["0x%040x" % rng.getrandbits(160) for _ in range(args.users)]
+    # Rank 1 is the most followed creator and, independently, the most active viewer
+    account_weights = list(itertools.accumulate(zipf_weights(len(accounts), args.skew)))
+
+    prompts, premium_ids = [], []
+    creators = rng.choices(accounts, cum_weights=account_weights, k=args.prompts)
+    for prompt_id, creator in enumerate(creators, start=1):
+        premium = rng.random() < args.premium_share
+        created_at = now - timedelta(seconds=rng.randint(0, args.days * 24 * 3600))
+        row = dict(
+            id=prompt_id,
+            ipfs_image_url=f"ipfs://load/{prompt_id}",
+            prompt=_sentence(rng, rng.randint(6, 20)),
+            account_address=creator,
+            post_name=_sentence(rng, 3),
+            public=rng.random() < 0.95,
+            prompt_tag=rng.choice(list(PromptTagEnum)),
+            prompt_type=PromptTypeEnum.PREMIUM if premium else PromptTypeEnum.PUBLIC,
+            created_at=created_at,
+            grant_access=False,
+            likes_count=0,
+            comments_count=0,
+        )
+        if premium:
+            premium_ids.append(prompt_id)
+            row.update(
+                cid=f"bafyload{prompt_id}",
+                chain=rng.choice(CHAINS),
+                ai_model=rng.choice(AI_MODELS),
+                collection_name=_sentence(rng, 2),
+                max_supply=rng.choice([10, 50, 100, 1000]),
+                prompt_nft_price=round(rng.uniform(0.1, 50), 2),
+            )
+        prompts.append(row)
+
+    # A few viral prompts get most of the engagement, regardless of age or creator
+    viral_order = list(range(len(prompts)))
+    rng.shuffle(viral_order)
+    prompt_weights = [0.0] * len(prompts)
+    for rank, index in enumerate(viral_order, start=1):
+        prompt_weights[index] = 1 / rank ** args.skew
+    prompt_weights = list(itertools.accumulate(prompt_weights))
+
+    follows = set()
+    for follower in accounts:
+        count = min(int(rng.expovariate(1 / args.follows_per_user)), len(accounts))
+        for creator in rng.choices(accounts, cum_weights=account_weights, k=count):
+            if creator != follower:
+                follows.add((follower, creator))
+
+    likes, comments = {}, []
+    liked = rng.choices(range(len(prompts)), cum_weights=prompt_weights, k=args.likes)
+    likers = rng.choices(accounts, cum_weights=account_weights, k=args.likes)
+    for index, user in zip(liked, likers):
+        if (index, user) in likes:
+            continue
+        prompt = prompts[index]
+        likes[(index, user)] = dict(
+            prompt_id=prompt["id"], prompt_type=prompt["prompt_type"], user_account=user,
+            created_at=prompt["created_at"] + (now - prompt["created_at"]) * rng.random(),
+        )
+        prompt["likes_count"] += 1
+    commented = rng.choices(range(len(prompts)), cum_weights=prompt_weights, k=args.comments)
+    commenters = rng.choices(accounts, cum_weights=account_weights, k=args.comments)
+    for index, user in zip(commented, commenters):
+        prompt = prompts[index]
+        comments.append(dict(
+            prompt_id=prompt["id"], prompt_type=prompt["prompt_type"], user_account=user,
+            comment=_sentence(rng, rng.randint(2, 12)),
+            created_at=prompt["created_at"] + (now - prompt["created_at"]) * rng.random(),
+        ))
+        prompt["comments_count"] += 1
+
+    # Scores as the like/comment endpoints would have left them
+    events = {prompt["id"]: [(scoring.CREATION_WEIGHT, prompt["created_at"])] for prompt in prompts}
+    for like in likes.values():
+        events[like["prompt_id"]].append((scoring.LIKE_WEIGHT, like["created_at"]))
+    for comment in comments:
+        events[comment["prompt_id"]].append((scoring.COMMENT_WEIGHT, comment["created_at"]))
+    for prompt in prompts:
+        prompt["popularity_score"] = scoring.events_term(events[prompt["id"]], scoring.POPULARITY_HALF_LIFE_HOURS)
+        prompt["trending_score"] = scoring.events_term(events[prompt["id"]], scoring.TRENDING_HALF_LIFE_HOURS)
+
+    stats = []
+    by_creator = sorted((prompt["account_address"], prompt["created_at"]) for prompt in prompts)
+    for account, generations in itertools.groupby(by_creator, key=lambda pair: pair[0]):
+        dates = [created_at for _, created_at in generations]
+        days = sorted({created_at.date() for created_at in dates}, reverse=True)
+        streak = 1
+        while streak < len(days) and days[streak - 1] - days[streak] == timedelta(days=1):
+            streak += 1
+        stats.append(dict(
+            user_account=account, xp=XP_PER_GENERATION * len(dates), total_generations=len(dates),
+            streak_days=streak, last_generation=max(dates),
+        ))
+
+    premium_ids = set(premium_ids)
+    by_virality = [prompts[index]["id"] for index in viral_order]
+    manifest = {
+        "seed": args.seed,
+        "accounts": accounts,  # Most active / most followed first
+        "creators": [account for account, _ in sorted(
+            ((stat["user_account"], stat["total_generations"]) for stat in stats), key=lambda pair: -pair[1]
+        )],
+        "public_prompt_ids": [prompt_id for prompt_id in by_virality if prompt_id not in premium_ids],
+        "premium_prompt_ids": [prompt_id for prompt_id in by_virality if prompt_id in premium_ids],
+        "words": WORDS,
+    }
+    rows = {
+        Prompt: prompts,
+        Follow: [dict(follower_account=follower, creator_account=creator) for follower, creator in sorted(follows)],
+        PostLike: list(likes.values()),
+        PostComment: comments,
+        UserStats: stats,
+    }
+    return rows, manifest
+
+
+def seed(db, rows, reset: bool):
+    if db.scalar(select(func.count(Prompt.id))) and not reset:
+        raise SystemExit("The database already has prompts, pass --reset to replace every seeded table")
+    # Children first, for the foreign keys
+    for model in (PostLike, PostComment, Follow, UserStats, Prompt):
+        db.execute(delete(model))
+    for model, model_rows in rows.items():
+        for start in range(0, len(model_rows), BATCH_SIZE):
+            db.execute(insert(model), model_rows[start:start + BATCH_SIZE])
+    db.commit()
+
+    if db.bind.dialect.name == "postgresql":
+        # Explicit ids were inserted, move the sequence past them
+        db.execute(select(func.setval(func.pg_get_serial_sequence("prompts", "id"), select(func.max(Prompt.id)).scalar_subquery())))
+        db.commit()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed the database with skewed, reproducible load-test data.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--prompts", type=int, default=10000)
+    parser.add_argument("--likes", type=int, default=50000)
+    parser.add_argument("--comments", type=int, default=10000)
+    parser.add_argument("--follows-per-user", type=float, default=20, help="Mean number of creators each user follows")
+    parser.add_argument("--premium-share", type=float, default=0.3, help="Fraction of prompts that are premium")
+    parser.add_argument("--days", type=int, default=60, help="Prompts are spread over this many days")
+    parser.add_argument("--skew", type=float, default=1.1, help="Power-law exponent of followers and virality")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--fixed-clock", action="store_true", help="Date the data relative to a fixed day instead of now")
+    parser.add_argument("--manifest", type=Path, default=DEFAULT_MANIFEST)
+    parser.add_argument("--reset", action="store_true", help="Delete the existing rows of the seeded tables first")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    rows, manifest = generate(args)
+    with get_session_with_ctx_manager() as session:
+        seed(session, rows, args.reset)
+    args.manifest.write_text(json.dumps(manifest))
+    print(", ".join(f"{len(model_rows)} {model.__tablename__}" for model, model_rows in rows.items()) + f"; manifest in {args.manifest}")
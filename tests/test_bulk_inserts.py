@@ -0,0 +1,43 @@
+"""
+Bulk inserts return the prompts in the order given and take at most 100 at a time.
+"""
+import pytest
+
+PUBLIC = "/prompts/add-public-prompts/bulk/"
+PREMIUM = "/marketplace/add-premium-prompts/bulk/"
+
+
+def _public(i):
+    return {
+        "ipfs_image_url": f"ipfs://bulk/{i}", "prompt": f"bulk prompt {i}", "account_address": f"bulk-test-{i % 3}",
+        "post_name": f"bulk {i}", "public": True, "prompt_tag": "Anime",
+    }
+
+
+def _premium(i):
+    return {
+        **_public(i), "cid": f"bafybulk{i}", "ai_model": "flux-1", "chain": "aptos",
+        "collection_name": "bulk", "max_supply": 10, "prompt_nft_price": 1.5,
+    }
+
+
+@pytest.mark.parametrize("url, row", [(PUBLIC, _public), (PREMIUM, _premium)])
+def test_bulk_insert_returns_prompts_in_input_order(client, manifest, url, row):
+    rows = [row(i) for i in range(12)]
+
+    response = client.post(url, json={"prompts": rows})
+
+    assert response.status_code == 200, response.text
+    prompts = response.json()
+    assert [prompt["post_name"] for prompt in prompts] == [r["post_name"] for r in rows]
+    assert [prompt["account_address"] for prompt in prompts] == [r["account_address"] for r in rows]
+    assert len({prompt["id"] for prompt in prompts}) == len(rows)
+
+
+@pytest.mark.parametrize("url, row", [(PUBLIC, _public), (PREMIUM, _premium)])
+def test_bulk_insert_takes_at_most_100_prompts(client, manifest, url, row):
+    response = client.post(url, json={"prompts": [row(i) for i in range(101)]})
+    assert response.status_code == 422
+
+    response = client.post(url, json={"prompts": []})
+    assert response.status_code == 422
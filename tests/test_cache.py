@@ -0,0 +1,55 @@
+"""
+Response cache and ETags: repeated listings are served from the cache, and
+revalidated with 304s, until a write invalidates their namespace, after
+which the next request sees the write under a new ETag.
+"""
+from app.core.cache import PUBLIC_PROMPTS
+
+
+def _stats(client):
+    return client.get("/cache-stats").json().get(PUBLIC_PROMPTS, {"hits": 0, "misses": 0})
+
+
+def test_listing_is_cached_until_a_write(client, manifest):
+    listing = {"page_size": 3, "include_total": False}
+    before = _stats(client)
+
+    first = client.get("/prompts/get-public-prompts/", params=listing)
+    second = client.get("/prompts/get-public-prompts/", params=listing)
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert _stats(client) == {"hits": before["hits"] + 1, "misses": before["misses"] + 1}
+
+    added = client.post("/prompts/add-public-prompts/", json={
+        "ipfs_image_url": "ipfs://cache", "prompt": "cache test", "account_address": manifest["accounts"][0],
+        "post_name": "cache", "public": True, "prompt_tag": "Anime",
+    })
+    assert added.status_code == 200, added.text
+
+    third = client.get("/prompts/get-public-prompts/", params=listing)
+    assert third.json()["prompts"][0]["id"] == added.json()["id"]
+    assert third.json()["prompts"][1:] == first.json()["prompts"][:2]
+    assert _stats(client) == {"hits": before["hits"] + 1, "misses": before["misses"] + 2}
+
+
+def test_etag_revalidates_until_a_write(client, manifest):
+    listing = {"page_size": 3, "include_total": False}
+    first = client.get("/marketplace/get-premium-prompts/", params=listing)
+    etag = first.headers["ETag"]
+
+    unchanged = client.get("/marketplace/get-premium-prompts/", params=listing, headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["ETag"] == etag
+    assert unchanged.content == b""
+    # Another page has its own ETag
+    assert client.get("/marketplace/get-premium-prompts/", params={**listing, "page": 2}).headers["ETag"] != etag
+
+    prompt_id = first.json()["prompts"][0]["id"]
+    liked = client.post("/socialfeed/like-prompt/", json={"prompt_id": prompt_id, "prompt_type": "premium", "user_account": "etag-test"})
+    assert liked.status_code == 200, liked.text
+
+    changed = client.get("/marketplace/get-premium-prompts/", params=listing, headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()["prompts"][0]["likes"] == first.json()["prompts"][0]["likes"] + 1
+    assert client.get("/marketplace/get-premium-prompts/", params=listing, headers={"If-None-Match": changed.headers["ETag"]}).status_code == 304
@@ -0,0 +1,74 @@
+"""
+Latest comments per prompt: `top_comments_by_prompt` gives every prompt its
+own newest N in one query, however many comments the others have.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core import database
+from app.core.database import get_session_with_ctx_manager
+from app.core.enums.tags import PromptTypeEnum
+from app.socialfeed import services
+from app.socialfeed.models import PostComment
+
+AT = datetime(2024, 6, 1, 12, 0)
+
+
+def _new_prompt(client, manifest, name):
+    response = client.post("/prompts/add-public-prompts/", json={
+        "ipfs_image_url": f"ipfs://{name}", "prompt": name, "account_address": manifest["accounts"][0],
+        "post_name": name, "public": True, "prompt_tag": "Anime",
+    })
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _add_comments(prompt_id, *created_at):
+    """Comments `c0`, `c1`, ... on the prompt, created at the given times."""
+    with get_session_with_ctx_manager() as db:
+        comments = [
+            PostComment(prompt_id=prompt_id, prompt_type=PromptTypeEnum.PUBLIC, user_account="comments-test", comment=f"c{i}", created_at=at)
+            for i, at in enumerate(created_at)
+        ]
+        db.add_all(comments)
+        db.commit()
+
+
+def _top_comments(prompt_ids, limit):
+    async def run():
+        # Its own engine, the app's pool belongs to the test client's event loop
+        engine = create_async_engine(database.async_engine.url)
+        try:
+            async with AsyncSession(engine) as db:
+                return await services.top_comments_by_prompt(prompt_ids, limit, db)
+        finally:
+            await engine.dispose()
+
+    return asyncio.run(run())
+
+
+def test_each_prompt_gets_its_own_latest_comments(client, manifest):
+    chatty = _new_prompt(client, manifest, "top comments chatty")
+    quiet = _new_prompt(client, manifest, "top comments quiet")
+    silent = _new_prompt(client, manifest, "top comments silent")
+    _add_comments(chatty, *[AT + timedelta(minutes=i) for i in range(5)])
+    _add_comments(quiet, AT - timedelta(days=1))
+
+    top = _top_comments([chatty, quiet, silent], 2)
+
+    assert list(top) == [chatty, quiet, silent]
+    assert [comment["comment"] for comment in top[chatty]] == ["c4", "c3"]
+    # Fewer comments than asked for
+    assert [comment["comment"] for comment in top[quiet]] == ["c0"]
+    assert top[silent] == []
+
+
+def test_comments_created_together_are_ordered_by_id(client, manifest):
+    prompt_id = _new_prompt(client, manifest, "top comments ties")
+    _add_comments(prompt_id, AT - timedelta(minutes=1), AT, AT, AT)
+
+    assert [comment["comment"] for comment in _top_comments([prompt_id], 2)[prompt_id]] == ["c3", "c2"]
+    assert [comment["comment"] for comment in _top_comments([prompt_id], 10)[prompt_id]] == ["c3", "c2", "c1", "c0"]
+    assert _top_comments([prompt_id], 0) == {prompt_id: []}
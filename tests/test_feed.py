@@ -0,0 +1,50 @@
+"""
+The social feed is every prompt, newest first, for every user: served from
+the precomputed timeline while it's warm and from the database past its end.
+"""
+from sqlalchemy import select
+
+from app.core.database import get_session_with_ctx_manager
+from app.prompts.models import Prompt
+
+
+def _newest_first():
+    with get_session_with_ctx_manager() as db:
+        return list(db.scalars(select(Prompt.id).order_by(Prompt.created_at.desc(), Prompt.id.desc())))
+
+
+def _walk(client, user, page_size=7):
+    ids, cursor = [], None
+    while True:
+        params = {"user_account": user, "page_size": page_size, "include_total": False}
+        response = client.get("/socialfeed/feed/", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert response.status_code == 200, response.text
+        ids += [item["prompt_id"] for item in response.json()["results"]]
+        cursor = response.json()["next_cursor"]
+        if not cursor:
+            return ids
+
+
+def test_feed_walks_every_prompt_newest_first(client, manifest, cold_feed_timeline):
+    # Short timeline, so the walk runs past its end into the database
+    cold_feed_timeline.max_length = 40
+    expected = _newest_first()
+    follower, loner = manifest["accounts"][0], "feed-test-follows-nobody"
+
+    assert _walk(client, follower) == expected  # Cold, rebuilds the timeline
+    assert _walk(client, follower) == expected
+    assert _walk(client, loner) == expected
+
+
+def test_new_prompt_tops_the_warm_feed(client, manifest):
+    user = manifest["accounts"][1]
+    before = client.get("/socialfeed/feed/", params={"user_account": user}).json()
+
+    added = client.post("/prompts/add-public-prompts/", json={
+        "ipfs_image_url": "ipfs://feed", "prompt": "feed test", "account_address": manifest["creators"][-1],
+        "post_name": "feed", "public": True, "prompt_tag": "Anime",
+    }).json()
+
+    after = client.get("/socialfeed/feed/", params={"user_account": user}).json()
+    assert after["results"][0]["prompt_id"] == added["id"]
+    assert after["total"] == before["total"] + 1
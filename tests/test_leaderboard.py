@@ -0,0 +1,48 @@
+"""
+Leaderboard lookups: a user's rank and the entries around them agree with
+the paged board, and an account that isn't ranked is a 404.
+"""
+import pytest
+
+
+def _board(client, board="xp", page_size=10):
+    response = client.get(f"/leaderboard/{board}/", params={"page_size": page_size})
+    assert response.status_code == 200, response.text
+    return response.json()["results"]
+
+
+@pytest.mark.parametrize("board", ["xp", "streaks"])
+def test_rank_matches_the_board(client, manifest, board):
+    for entry in _board(client, board):
+        response = client.get(f"/leaderboard/{board}/rank/", params={"user_account": entry["user_account"]})
+        assert response.status_code == 200, response.text
+        assert response.json() == entry
+
+
+def test_around_is_the_slice_of_the_board_centered_on_the_user(client, manifest):
+    board = _board(client)
+    user = board[4]["user_account"]
+
+    around = client.get("/leaderboard/xp/around/", params={"user_account": user, "radius": 2}).json()
+    assert around == {"user_account": user, "results": board[2:7]}
+
+    # Cut short at the top of the board
+    top = client.get("/leaderboard/xp/around/", params={"user_account": board[0]["user_account"], "radius": 2}).json()
+    assert top["results"] == board[:3]
+
+    alone = client.get("/leaderboard/xp/around/", params={"user_account": user, "radius": 0}).json()
+    assert alone["results"] == [board[4]]
+
+
+@pytest.mark.parametrize("radius", [-1, 51])
+def test_around_radius_is_bounded(client, manifest, radius):
+    user = _board(client)[0]["user_account"]
+    response = client.get("/leaderboard/xp/around/", params={"user_account": user, "radius": radius})
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("lookup", ["rank", "around"])
+def test_unknown_user_is_not_found(client, manifest, lookup):
+    response = client.get(f"/leaderboard/xp/{lookup}/", params={"user_account": "leaderboard-test-nobody"})
+    assert response.status_code == 404
+    assert response.json()["detail"] == "User is not on this leaderboard"
@@ -0,0 +1,56 @@
+"""
+Likes are idempotent: liking twice or unliking a prompt that isn't liked
+changes nothing, and a missing prompt is a 404.
+"""
+MISSING_PROMPT_ID = 10 ** 9
+
+
+def _like(client, prompt_id, user):
+    return client.post("/socialfeed/like-prompt/", json={"prompt_id": prompt_id, "prompt_type": "public", "user_account": user})
+
+
+def _unlike(client, prompt_id, user):
+    return client.delete("/socialfeed/unlike-prompt/", params={"prompt_id": prompt_id, "prompt_type": "public", "user_account": user})
+
+
+def test_missing_prompt_is_not_found(client, manifest):
+    user = manifest["accounts"][0]
+    assert _like(client, MISSING_PROMPT_ID, user).status_code == 404
+    assert _unlike(client, MISSING_PROMPT_ID, user).status_code == 404
+
+
+def test_double_like_is_a_no_op(client, manifest):
+    prompt_id, user = manifest["public_prompt_ids"][-1], "likes-test-double"
+
+    first = _like(client, prompt_id, user).json()
+    second = _like(client, prompt_id, user)
+
+    assert first["message"] == "Prompt liked successfully"
+    assert second.status_code == 200
+    assert second.json() == {"message": "Prompt already liked", "total_likes": first["total_likes"]}
+    _unlike(client, prompt_id, user)
+
+
+def test_unlike_when_not_liked_is_a_no_op(client, manifest):
+    prompt_id, user = manifest["public_prompt_ids"][-1], "likes-test-never-liked"
+    likes = client.get("/socialfeed/prompt-likes/", params={"prompt_id": prompt_id, "account_address": user}).json()
+
+    response = _unlike(client, prompt_id, user)
+
+    assert response.status_code == 200
+    assert response.json()["message"] == "Prompt was not liked"
+    assert response.json()["total_likes"] == likes["likes_count"]
+
+
+def test_unlike_removes_the_like(client, manifest):
+    prompt_id, user = manifest["public_prompt_ids"][-2], "likes-test-unlike"
+    liked = _like(client, prompt_id, user).json()
+
+    response = _unlike(client, prompt_id, user).json()
+
+    assert response == {"message": "Prompt unliked successfully", "total_likes": liked["total_likes"] - 1}
+
+
+def test_like_status_of_missing_prompt_is_not_found(client, manifest):
+    response = client.get("/socialfeed/prompt-likes/", params={"prompt_id": MISSING_PROMPT_ID, "account_address": manifest["accounts"][0]})
+    assert response.status_code == 404
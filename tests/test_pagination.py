@@ -0,0 +1,149 @@
+"""
+Paging parameters are validated before any query runs: an out-of-range
+`page` or `page_size` is a 422, and a cursor that does not decode, or
+belongs to another ordering, is a 400 on every cursor-paginated endpoint,
+never a 500. Cursor pages neither repeat nor skip rows, even when rows are
+added while a client pages through.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.database import get_session_with_ctx_manager
+from app.core.enums.tags import PromptTypeEnum
+from app.core.helpers import encode_keyset_cursor
+from app.prompts.services import RECENT_ORDER
+from app.socialfeed.models import PostComment
+
+
+def _listings(manifest):
+    user, creator = manifest["accounts"][0], manifest["creators"][0]
+    return [
+        ("get", "/prompts/get-public-prompts/", {}),
+        ("post", "/prompts/filter-public-prompts/", {"prompt_tag": "all"}),
+        ("get", "/prompts/search/", {"q": "dragon"}),
+        ("get", "/marketplace/get-premium-prompts/", {}),
+        ("post", "/marketplace/filter-premium-prompts/", {"filter_type": "recent"}),
+        ("get", "/socialfeed/creator-followers/", {"creator_account": creator}),
+        ("get", "/socialfeed/user-following/", {"follower_account": user}),
+        ("get", "/socialfeed/feed/", {"user_account": user}),
+        ("get", "/socialfeed/feed/followers/", {"user_account": user, "seed": 7}),
+        ("get", "/socialfeed/feed/following/", {"user_account": user, "seed": 7}),
+        ("get", "/socialfeed/feed/combined/", {"user_account": user, "seed": 7}),
+        ("get", "/leaderboard/xp/", {}),
+        ("get", "/leaderboard/streaks/", {}),
+        ("get", "/leaderboard/generations-24h/", {}),
+    ]
+
+
+def _call(client, method, path, params):
+    if method == "post":
+        return client.post(path, json=params)
+    return client.get(path, params=params)
+
+
+@pytest.mark.parametrize("bad", [{"page_size": 0}, {"page_size": -1}, {"page_size": 101}, {"page": 0}])
+def test_page_bounds_are_rejected(client, manifest, bad):
+    for method, path, params in _listings(manifest):
+        response = _call(client, method, path, {**params, **bad})
+        assert response.status_code == 422, (path, response.text)
+
+
+def test_invalid_cursor_is_a_bad_request(client, manifest):
+    for method, path, params in _listings(manifest):
+        response = _call(client, method, path, {**params, "cursor": "not-a-cursor"})
+        assert response.status_code == 400, (path, response.text)
+
+
+@pytest.mark.parametrize("path", ["/socialfeed/feed/followers/", "/socialfeed/feed/following/", "/socialfeed/feed/combined/"])
+def test_shuffled_feed_cursor_needs_its_seed(client, manifest, path):
+    user = manifest["creators"][0]
+    first = client.get(path, params={"user_account": user, "page_size": 5, "include_total": False}).json()
+    assert first["total"] is None and first["next_cursor"]
+
+    response = client.get(path, params={"user_account": user, "page_size": 5, "cursor": first["next_cursor"]})
+    assert response.status_code == 400, response.text
+
+    second = client.get(path, params={
+        "user_account": user, "page_size": 5, "seed": first["seed"], "cursor": first["next_cursor"],
+    }).json()
+    assert not {p["prompt_id"] for p in first["feed"]} & {p["prompt_id"] for p in second["feed"]}
+
+
+def _premium_cursor(client, filter_type):
+    response = client.post("/marketplace/filter-premium-prompts/", json={"filter_type": filter_type, "page_size": 2})
+    assert response.status_code == 200, response.text
+    assert response.json()["next_cursor"] is not None
+    return response.json()["next_cursor"]
+
+
+@pytest.mark.parametrize("issued, replayed", [("popular", "recent"), ("popular", "trending"), ("trending", "popular")])
+def test_cursor_from_another_ordering_is_a_bad_request(client, manifest, issued, replayed):
+    cursor = _premium_cursor(client, issued)
+    response = client.post("/marketplace/filter-premium-prompts/", json={"filter_type": replayed, "cursor": cursor})
+    assert response.status_code == 400, response.text
+
+    # The cursor still pages the ordering it came from
+    response = client.post("/marketplace/filter-premium-prompts/", json={"filter_type": issued, "cursor": cursor})
+    assert response.status_code == 200, response.text
+
+
+def test_newest_first_cursor_is_a_bad_request_for_popular(client, manifest):
+    cursor = client.get("/marketplace/get-premium-prompts/", params={"page_size": 2}).json()["next_cursor"]
+    response = client.post("/marketplace/filter-premium-prompts/", json={"filter_type": "popular", "cursor": cursor})
+    assert response.status_code == 400, response.text
+
+
+@pytest.mark.parametrize("values", [
+    [datetime(2024, 5, 1)],  # Too short
+    [datetime(2024, 5, 1), 5, 6],  # Too long
+    ["2024-05-01", 5],  # A string where the datetime goes
+    [datetime(2024, 5, 1), "5"],
+])
+def test_cursor_that_does_not_fit_the_ordering_is_a_bad_request(client, manifest, values):
+    cursor = encode_keyset_cursor(RECENT_ORDER, *values)
+    response = client.get("/prompts/get-public-prompts/", params={"cursor": cursor})
+    assert response.status_code == 400, response.text
+
+
+def test_leaderboard_cursor_from_another_board_is_a_bad_request(client, manifest):
+    cursor = client.get("/leaderboard/xp/", params={"page_size": 2}).json()["next_cursor"]
+    assert client.get("/leaderboard/xp/", params={"cursor": cursor}).status_code == 200
+    assert client.get("/leaderboard/streaks/", params={"cursor": cursor}).status_code == 400
+
+
+def test_comment_pages_neither_repeat_nor_skip(client, manifest):
+    prompt = client.post("/prompts/add-public-prompts/", json={
+        "ipfs_image_url": "ipfs://comment-pages", "prompt": "comment pages", "account_address": manifest["accounts"][0],
+        "post_name": "comment pages", "public": True, "prompt_tag": "Anime",
+    }).json()
+    # Pairs of comments created at the same time, so pages also split ties
+    at = datetime(2024, 6, 1, 12, 0)
+    with get_session_with_ctx_manager() as db:
+        comments = [
+            PostComment(prompt_id=prompt["id"], prompt_type=PromptTypeEnum.PUBLIC, user_account="pages", comment=f"c{i}", created_at=at + timedelta(minutes=i // 2))
+            for i in range(9)
+        ]
+        db.add_all(comments)
+        db.commit()
+        expected = [comment.id for comment in sorted(comments, key=lambda comment: (comment.created_at, comment.id), reverse=True)]
+
+    params = {"prompt_id": prompt["id"], "prompt_type": "public", "limit": 2}
+    page = client.get("/socialfeed/get-prompt-comments/", params=params).json()
+    seen = [comment["id"] for comment in page["comments"]]
+
+    # A comment posted mid-way is newer than every page still to come
+    added = client.post("/socialfeed/comment-prompt/", json={
+        "prompt_id": prompt["id"], "prompt_type": "public", "user_account": "pages", "comment": "mid-way"
+    })
+    assert added.status_code == 200, added.text
+
+    while page["next_cursor"]:
+        page = client.get("/socialfeed/get-prompt-comments/", params={**params, "cursor": page["next_cursor"]}).json()
+        assert len(page["comments"]) <= 2
+        seen += [comment["id"] for comment in page["comments"]]
+    assert seen == expected
+
+    first = client.get("/socialfeed/get-prompt-comments/", params=params).json()
+    assert first["comments"][0]["comment"] == "mid-way"
+    assert [comment["id"] for comment in first["comments"]][1:] == expected[:1]
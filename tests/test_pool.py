@@ -0,0 +1,53 @@
+"""
+Connection pool: the wait for a connection is timed, and a request that gave
+up waiting is answered 503 with Retry-After instead of the route's own 500.
+"""
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core import metrics
+from app.core.database import async_engine
+
+
+def _value(metric, suffix, engine="async"):
+    return sum(value for sample_suffix, _, key, value in metric.samples() if sample_suffix == suffix and key == (engine,))
+
+
+@pytest.fixture
+def exhausted_pool():
+    """Every checkout from the API's pool fails as if it had waited DB_POOL_TIMEOUT for a connection to free up."""
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        raise PoolTimeoutError("QueuePool limit of size 5 overflow 10 reached, connection timed out, timeout 3.00")
+
+    pool = async_engine.sync_engine.pool
+    event.listen(pool, "checkout", checkout)
+    yield
+    event.remove(pool, "checkout", checkout)
+
+
+def test_connection_checkouts_are_timed(client, manifest):
+    checkouts = _value(metrics.db_pool_checkout_seconds, "_count")
+
+    assert client.get("/prompts/get-public-prompts/", params={"page_size": 3}).status_code == 200
+
+    assert _value(metrics.db_pool_checkout_seconds, "_count") == checkouts + 1
+
+
+@pytest.mark.parametrize("request_args", [
+    # Lets the timeout propagate
+    ("GET", "/prompts/get-public-prompts/", {"params": {"page_size": 3}}),
+    # Wraps it in a 500, the timeout is only the HTTPException's context
+    ("GET", "/marketplace/get-premium-prompts/", {"params": {"page_size": 3}}),
+    ("POST", "/socialfeed/comment-prompt/", {"json": {"prompt_id": 1, "prompt_type": "public", "user_account": "pool-test", "comment": "hi"}}),
+])
+def test_pool_exhaustion_is_a_503_with_retry_after(client, manifest, exhausted_pool, request_args):
+    method, url, kwargs = request_args
+    timeouts = _value(metrics.db_pool_timeouts_total, "")
+
+    response = client.request(method, url, **kwargs)
+
+    assert response.status_code == 503, response.text
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["detail"]["info"] == "Database is busy, please retry"
+    assert _value(metrics.db_pool_timeouts_total, "") == timeouts + 1
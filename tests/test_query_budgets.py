@@ -0,0 +1,69 @@
+"""
+Query budgets of every router's endpoints, so an N+1 query fails the tests.
+
+Each request may run any statement shape only once (`max_repeats=1`): a
+query issued per row of a page breaks the budget whatever the page size.
+`max_queries` is what the endpoint needs today, raise it deliberately.
+"""
+PAGE_SIZE = 20
+
+
+def _ok(response):
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_prompts_router_budget(client, manifest, query_budget):
+    viewer = manifest["accounts"][0]
+    with query_budget(max_queries=3, max_repeats=1):
+        _ok(client.get("/prompts/get-public-prompts/", params={"page_size": PAGE_SIZE, "viewer_account": viewer}))
+    with query_budget(max_queries=2, max_repeats=1):
+        _ok(client.post("/prompts/filter-public-prompts/", json={"prompt_tag": "Anime", "public": True, "page_size": PAGE_SIZE}))
+    with query_budget(max_queries=7, max_repeats=1):
+        _ok(client.get("/prompts/search/", params={"q": "dragon", "page_size": PAGE_SIZE}))
+    with query_budget(max_queries=4, max_repeats=1):
+        _ok(client.post("/prompts/add-public-prompts/", json={
+            "ipfs_image_url": "ipfs://test", "prompt": "budget test", "account_address": viewer,
+            "post_name": "budget", "public": True, "prompt_tag": "Anime",
+        }))
+
+
+def test_marketplace_router_budget(client, manifest, query_budget):
+    with query_budget(max_queries=2, max_repeats=1):
+        _ok(client.get("/marketplace/get-premium-prompts/", params={"page_size": PAGE_SIZE}))
+    for filter_type in ("recent", "popular", "trending"):
+        with query_budget(max_queries=2, max_repeats=1):
+            _ok(client.post("/marketplace/filter-premium-prompts/", json={"filter_type": filter_type, "page_size": PAGE_SIZE}))
+
+
+def test_socialfeed_router_budget(client, manifest, query_budget):
+    user, creator = manifest["accounts"][0], manifest["creators"][0]
+    prompt_id = manifest["public_prompt_ids"][0]
+
+    with query_budget(max_queries=6, max_repeats=1):  # Cold: also rebuilds the timeline
+        _ok(client.get("/socialfeed/feed/", params={"user_account": user, "page_size": PAGE_SIZE}))
+    with query_budget(max_queries=3, max_repeats=1):
+        _ok(client.get("/socialfeed/feed/", params={"user_account": user, "page_size": PAGE_SIZE}))
+    for feed in ("following", "followers", "combined"):
+        with query_budget(max_queries=4, max_repeats=1):
+            _ok(client.get(f"/socialfeed/feed/{feed}/", params={"user_account": user, "page_size": PAGE_SIZE}))
+    with query_budget(max_queries=3, max_repeats=1):
+        _ok(client.get("/socialfeed/creator-followers/", params={"creator_account": creator, "page_size": PAGE_SIZE}))
+    with query_budget(max_queries=3, max_repeats=1):
+        _ok(client.get("/socialfeed/user-following/", params={"follower_account": user, "page_size": PAGE_SIZE}))
+    with query_budget(max_queries=2, max_repeats=1):
+        _ok(client.get("/socialfeed/get-prompt-comments/", params={"prompt_id": prompt_id, "prompt_type": "public", "limit": PAGE_SIZE}))
+    with query_budget(max_queries=1, max_repeats=1):
+        _ok(client.post("/socialfeed/prompt-likes/bulk/", json={
+            "prompt_ids": manifest["public_prompt_ids"][:PAGE_SIZE], "account_address": user,
+        }))
+    with query_budget(max_queries=3, max_repeats=1):
+        _ok(client.post("/socialfeed/like-prompt/", json={"prompt_id": prompt_id, "prompt_type": "public", "user_account": user}))
+
+
+def test_leaderboard_router_budget(client, manifest, query_budget):
+    for board in ("xp", "streaks", "generations-24h"):
+        with query_budget(max_queries=2, max_repeats=1):
+            _ok(client.get(f"/leaderboard/{board}/", params={"page_size": PAGE_SIZE}))
+    with query_budget(max_queries=1, max_repeats=1):
+        _ok(client.get("/leaderboard/xp/rank/", params={"user_account": manifest["creators"][0]}))
@@ -0,0 +1,104 @@
+"""
+Query plans of the listing endpoints: every SELECT they run must reach its
+rows through an index, never a full scan of a table.
+
+The statements are captured from the endpoints themselves while they serve
+a request, and explained on the request's own connection with the request's
+parameters, so the check always covers the queries the routes actually run.
+Sequential scans are disabled for the check on PostgreSQL, so a small test
+database still shows whether a usable index exists. Run it against
+PostgreSQL (`TEST_DATABASE_URL`) after changing indexes or listing queries.
+"""
+import json
+import re
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.core.database import Base, async_engine
+
+PAGE_SIZE = 10
+
+# (method, path, parameters), the manifest's first account/creator/prompt fill in USER/CREATOR/PROMPT
+LISTINGS = [
+    ("get", "/prompts/get-public-prompts/", {"page_size": PAGE_SIZE, "viewer_account": "USER"}),
+    ("post", "/prompts/filter-public-prompts/", {"prompt_tag": "Anime", "public": True, "page_size": PAGE_SIZE}),
+    ("post", "/prompts/filter-public-prompts/", {"prompt_tag": "all", "public": True, "page_size": PAGE_SIZE}),
+    ("get", "/prompts/search/", {"q": "dragon", "page_size": PAGE_SIZE}),
+    ("get", "/marketplace/get-premium-prompts/", {"page_size": PAGE_SIZE}),
+    ("post", "/marketplace/filter-premium-prompts/", {"filter_type": "recent", "page_size": PAGE_SIZE}),
+    ("post", "/marketplace/filter-premium-prompts/", {"filter_type": "popular", "page_size": PAGE_SIZE}),
+    ("post", "/marketplace/filter-premium-prompts/", {"filter_type": "trending", "page_size": PAGE_SIZE}),
+    ("get", "/socialfeed/feed/", {"user_account": "USER", "page_size": PAGE_SIZE}),
+    ("get", "/socialfeed/feed/following/", {"user_account": "USER", "page_size": PAGE_SIZE}),
+    ("get", "/socialfeed/feed/followers/", {"user_account": "CREATOR", "page_size": PAGE_SIZE}),
+    ("get", "/socialfeed/feed/combined/", {"user_account": "USER", "page_size": PAGE_SIZE}),
+    ("get", "/socialfeed/get-prompt-comments/", {"prompt_id": "PROMPT", "prompt_type": "public", "limit": PAGE_SIZE}),
+    ("get", "/socialfeed/creator-followers/", {"creator_account": "CREATOR", "page_size": PAGE_SIZE}),
+    ("get", "/socialfeed/user-following/", {"follower_account": "USER", "page_size": PAGE_SIZE}),
+    ("get", "/socialfeed/prompt-likes/", {"prompt_id": "PROMPT", "account_address": "USER"}),
+]
+
+
+def _postgres_table_scans(cursor, statement, parameters):
+    cursor.execute("SET LOCAL enable_seqscan = off")
+    cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    scans, nodes = [], [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if node["Node Type"] == "Seq Scan":
+            scans.append(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return scans
+
+
+def _sqlite_table_scans(cursor, statement, parameters):
+    # "SCAN prompts" is a full scan, "SCAN prompts USING INDEX ..." walks an index in order.
+    # Scans of subqueries (e.g. a window over rows already found through an index) don't count.
+    cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+    matches = (re.fullmatch(r"SCAN (\w+)", row[3]) for row in cursor.fetchall())
+    return [match.group(1) for match in matches if match and match.group(1) in Base.metadata.tables]
+
+
+@contextmanager
+def table_scans(sync_engine):
+    """Collects `(statement, [scanned tables])` for every SELECT `sync_engine` runs inside the block."""
+    found = []
+    table_scans_of = _postgres_table_scans if sync_engine.dialect.name == "postgresql" else _sqlite_table_scans
+
+    def explain(conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            return
+        # A cursor of its own, so the request's statement and its events are left alone
+        explain_cursor = conn.connection.cursor()
+        try:
+            found.append((statement, table_scans_of(explain_cursor, statement, parameters)))
+        finally:
+            explain_cursor.close()
+
+    event.listen(sync_engine, "before_cursor_execute", explain)
+    try:
+        yield found
+    finally:
+        event.remove(sync_engine, "before_cursor_execute", explain)
+
+
+@pytest.mark.parametrize("method, path, params", LISTINGS, ids=lambda value: value if isinstance(value, str) and value.startswith("/") else "")
+def test_listing_uses_indexes(client, manifest, method, path, params):
+    if path == "/prompts/search/" and async_engine.dialect.name != "postgresql":
+        pytest.skip("SQLite has no full-text or trigram indexes, search scans there")
+
+    values = {"USER": manifest["accounts"][0], "CREATOR": manifest["creators"][0], "PROMPT": manifest["public_prompt_ids"][0]}
+    params = {name: values.get(value, value) if isinstance(value, str) else value for name, value in params.items()}
+    with table_scans(async_engine.sync_engine) as explained:
+        response = client.get(path, params=params) if method == "get" else client.post(path, json=params)
+
+    assert response.status_code == 200, response.text
+    assert explained, "the endpoint ran no SELECT"
+    scans = [f"{', '.join(tables)}: {statement}" for statement, tables in explained if tables]
+    assert not scans, "Full table scans:\n" + "\n".join(scans)
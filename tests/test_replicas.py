@@ -0,0 +1,65 @@
+"""
+Read replicas: a replica that refuses connections is skipped, and one that
+hasn't replayed a write yet must not get its stale page cached, or ETagged,
+under the version the write bumped.
+"""
+import shutil
+
+import pytest
+
+from app.core import database
+from app.core.database import Replica, engine
+
+
+@pytest.fixture
+def lagging_replica(client, monkeypatch, tmp_path):
+    """A replica frozen at the current state of the database, that never replays later writes."""
+    if engine.dialect.name != "sqlite":
+        pytest.skip("The lagging replica is a copy of the SQLite database file")
+    path = tmp_path / "replica.db"
+    shutil.copy(engine.url.database, path)
+    replica = Replica("replica-test", f"sqlite+aiosqlite:///{path}")
+    monkeypatch.setattr(database.replica_router, "replicas", [replica])
+    yield replica
+    # Writes set the read-your-writes cookie on the session-wide client
+    client.cookies.clear()
+
+
+def test_lagging_replica_cannot_poison_the_cache(client, manifest, lagging_replica):
+    listing = {"page_size": 5, "include_total": False}
+    before = client.get("/prompts/get-public-prompts/", params=listing)
+    assert before.status_code == 200
+
+    added = client.post("/prompts/add-public-prompts/", json={
+        "ipfs_image_url": "ipfs://replica", "prompt": "replica lag", "account_address": manifest["accounts"][0],
+        "post_name": "replica", "public": True, "prompt_tag": "Anime",
+    })
+    assert added.status_code == 200, added.text
+    new_id = added.json()["id"]
+    # Another client, without the read_primary cookie
+    client.cookies.clear()
+
+    # Reads routed to the replica don't see the write yet
+    stale = client.post("/prompts/filter-public-prompts/", json={"prompt_tag": "all", "page_size": 5})
+    assert new_id not in [prompt["id"] for prompt in stale.json()["prompts"]]
+
+    after = client.get("/prompts/get-public-prompts/", params=listing)
+    assert after.json()["prompts"][0]["id"] == new_id
+    assert after.headers["ETag"] != before.headers["ETag"]
+
+    # The cached page and its ETag both carry the write
+    cached = client.get("/prompts/get-public-prompts/", params=listing)
+    assert cached.json()["prompts"][0]["id"] == new_id
+    revalidated = client.get("/prompts/get-public-prompts/", params=listing, headers={"If-None-Match": after.headers["ETag"]})
+    assert revalidated.status_code == 304
+
+
+def test_unreachable_replica_falls_back_to_the_primary(client, manifest, monkeypatch, tmp_path):
+    replica = Replica("replica-down", f"sqlite+aiosqlite:///{tmp_path}/missing/replica.db")
+    monkeypatch.setattr(database.replica_router, "replicas", [replica])
+
+    response = client.post("/prompts/filter-public-prompts/", json={"prompt_tag": "all", "page_size": 5})
+
+    assert response.status_code == 200, response.text
+    assert len(response.json()["prompts"]) == 5
+    assert not replica.healthy
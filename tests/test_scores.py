@@ -0,0 +1,87 @@
+"""
+`recompute_prompt_scores` rebuilds the scores in SQL and never overwrites a
+score bumped by a like or comment while its batch was being computed.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, insert, select, update
+
+from app.core.database import get_session_with_ctx_manager
+from app.prompts import models, scoring, services
+from app.socialfeed.models import PostComment, PostLike
+
+
+def _reference_scores(db):
+    """The scores as `events_term` sums them in Python."""
+    events = {
+        prompt_id: [(scoring.CREATION_WEIGHT, created_at)]
+        for prompt_id, created_at in db.execute(select(models.Prompt.id, models.Prompt.created_at))
+    }
+    for event_model, weight in ((PostLike, scoring.LIKE_WEIGHT), (PostComment, scoring.COMMENT_WEIGHT)):
+        for prompt_id, created_at in db.execute(select(event_model.prompt_id, event_model.created_at)):
+            events[prompt_id].append((weight, created_at))
+    return {
+        prompt_id: (
+            scoring.events_term(prompt_events, scoring.POPULARITY_HALF_LIFE_HOURS),
+            scoring.events_term(prompt_events, scoring.TRENDING_HALF_LIFE_HOURS),
+        )
+        for prompt_id, prompt_events in events.items()
+    }
+
+
+def _stored_scores(db):
+    query = select(models.Prompt.id, models.Prompt.popularity_score, models.Prompt.trending_score)
+    return {prompt_id: (popularity, trending) for prompt_id, popularity, trending in db.execute(query)}
+
+
+def test_recompute_matches_python_scores(manifest):
+    with get_session_with_ctx_manager() as db:
+        db.execute(update(models.Prompt).values(popularity_score=0, trending_score=0))
+        db.commit()
+
+        updated = services.recompute_prompt_scores(db, batch_size=64)
+
+        reference, stored = _reference_scores(db), _stored_scores(db)
+        assert updated == len(reference)
+        for prompt_id, (popularity, trending) in reference.items():
+            # SQLite's epoch is whole seconds, a few microunits off the Python sum
+            assert abs(stored[prompt_id][0] - popularity) < 1e-4
+            assert abs(stored[prompt_id][1] - trending) < 1e-4
+        assert services.recompute_prompt_scores(db) == 0
+
+
+def test_recompute_keeps_concurrent_bumps(manifest):
+    with get_session_with_ctx_manager() as db:
+        prompt_ids = sorted(_stored_scores(db))
+        bumped = db.get(models.Prompt, prompt_ids[1])
+        db.execute(update(models.Prompt).values(popularity_score=0, trending_score=0))
+        db.commit()
+
+        bumped_scores = []
+
+        @event.listens_for(db, "do_orm_execute")
+        def like_meanwhile(orm_execute_state):
+            # A like lands between reading the batch and writing its scores
+            if orm_execute_state.is_update and not bumped_scores:
+                connection = orm_execute_state.session.connection()
+                connection.execute(insert(PostLike).values(
+                    prompt_id=bumped.id, prompt_type=bumped.prompt_type, user_account="scores-test", created_at=datetime.utcnow()
+                ))
+                bumped_scores.append(connection.execute(
+                    update(models.Prompt).where(models.Prompt.id == bumped.id)
+                    .values(likes_count=models.Prompt.likes_count + 1, **scoring.score_bump(models.Prompt, scoring.LIKE_WEIGHT))
+                    .returning(models.Prompt.popularity_score, models.Prompt.trending_score)
+                ).one())
+
+        updated = services.recompute_prompt_scores(db, batch_size=len(prompt_ids))
+
+        stored = _stored_scores(db)
+        assert updated == len(prompt_ids) - 1
+        # The like's bump is kept rather than overwritten with scores computed without it
+        assert stored[bumped.id] == tuple(bumped_scores[0])
+
+        # The next run rebuilds the prompt from all its events, the like included
+        services.recompute_prompt_scores(db)
+        reference, stored = _reference_scores(db), _stored_scores(db)
+        assert abs(stored[bumped.id][0] - reference[bumped.id][0]) < 1e-4
+        assert abs(stored[bumped.id][1] - reference[bumped.id][1]) < 1e-4
@@ -0,0 +1,55 @@
+"""
+Creator stats: every premium generation adds XP, and the streak follows the
+day of the previous generation (same day keeps it, the next day extends it,
+a gap restarts it).
+"""
+from datetime import datetime, time, timedelta
+
+import pytest
+
+from app.core.database import get_session_with_ctx_manager
+from app.leaderboard.models import UserStats
+
+
+def _premium(account, i=0):
+    return {
+        "ipfs_image_url": f"ipfs://stats/{i}", "prompt": f"stats prompt {i}", "account_address": account,
+        "post_name": f"stats {i}", "prompt_tag": "Anime", "cid": f"bafystats{i}", "ai_model": "flux-1",
+        "chain": "aptos", "collection_name": "stats", "max_supply": 10, "prompt_nft_price": 1.5,
+    }
+
+
+def _stats(account):
+    with get_session_with_ctx_manager() as db:
+        stats = db.query(UserStats).filter(UserStats.user_account == account).one()
+        return stats.xp, stats.total_generations, stats.streak_days
+
+
+@pytest.mark.parametrize("last_generation, streak_days", [
+    (timedelta(hours=1), 4),  # Earlier today
+    (timedelta(hours=-12), 5),  # Yesterday
+    (timedelta(days=-2), 1),  # A day without generations in between
+])
+def test_streak_follows_the_previous_generation(client, manifest, last_generation, streak_days):
+    account = f"stats-test-{streak_days}"
+    today = datetime.combine(datetime.utcnow().date(), time.min)
+    with get_session_with_ctx_manager() as db:
+        db.add(UserStats(user_account=account, xp=10, total_generations=5, streak_days=4, last_generation=today + last_generation))
+        db.commit()
+
+    response = client.post("/marketplace/add-premium-prompts/", json=_premium(account))
+    assert response.status_code == 200, response.text
+
+    assert _stats(account) == (12, 6, streak_days)
+
+
+def test_bulk_generations_count_once_for_the_streak(client, manifest):
+    account = "stats-test-bulk"
+
+    response = client.post("/marketplace/add-premium-prompts/bulk/", json={"prompts": [_premium(account, i) for i in range(3)]})
+    assert response.status_code == 200, response.text
+    assert _stats(account) == (6, 3, 1)
+
+    response = client.post("/marketplace/add-premium-prompts/bulk/", json={"prompts": [_premium(account, i) for i in range(2)]})
+    assert response.status_code == 200, response.text
+    assert _stats(account) == (10, 5, 1)
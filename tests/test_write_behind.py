@@ -0,0 +1,112 @@
+"""
+Write-behind likes and comments: queued engagement is visible straight away,
+the flusher writes it in batches, and nothing is counted twice while a
+committed batch is still being cleared from the queue.
+"""
+import pytest
+
+from app.core.database import get_session_with_ctx_manager
+from app.socialfeed import routes, services, write_behind
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    """Write-behind on, with an empty in-process queue that only the test flushes."""
+    queue = write_behind.InMemoryEngagementQueue()
+    monkeypatch.setattr(write_behind, "engagement_queue", queue)
+    for module in (write_behind, services, routes):
+        monkeypatch.setattr(module, "ENGAGEMENT_WRITE_BEHIND", True)
+    return queue
+
+
+def _like(client, prompt_id, user):
+    return client.post("/socialfeed/like-prompt/", json={"prompt_id": prompt_id, "prompt_type": "public", "user_account": user})
+
+
+def _comment(client, prompt_id, user, comment):
+    return client.post("/socialfeed/comment-prompt/", json={
+        "prompt_id": prompt_id, "prompt_type": "public", "user_account": user, "comment": comment
+    })
+
+
+def _likes(client, prompt_id, user):
+    return client.get("/socialfeed/prompt-likes/", params={"prompt_id": prompt_id, "account_address": user}).json()
+
+
+def _comments(client, prompt_id):
+    return client.get("/socialfeed/get-prompt-comments/", params={"prompt_id": prompt_id, "prompt_type": "public", "limit": 3}).json()
+
+
+def test_queued_engagement_shows_before_and_after_the_flush(client, manifest, queue):
+    prompt_id, user = manifest["public_prompt_ids"][7], "write-behind-visible"
+    likes, comments = _likes(client, prompt_id, user)["likes_count"], _comments(client, prompt_id)["total_comments"]
+
+    assert _like(client, prompt_id, user).json() == {"message": "Prompt liked successfully", "total_likes": likes + 1}
+    assert _comment(client, prompt_id, user, "queued").json()["total_comments"] == comments + 1
+
+    # Queued: counted, and the comment leads the first page without an id
+    assert _likes(client, prompt_id, user) == {"prompt_id": prompt_id, "likes_count": likes + 1, "user_liked": True}
+    page = _comments(client, prompt_id)
+    assert page["total_comments"] == comments + 1
+    assert page["comments"][0] == {**page["comments"][0], "id": None, "comment": "queued", "pending": True}
+
+    assert write_behind.flush_in_process(queue, get_session_with_ctx_manager) == 2
+
+    # Flushed: the same totals, now from the database
+    assert _likes(client, prompt_id, user) == {"prompt_id": prompt_id, "likes_count": likes + 1, "user_liked": True}
+    page = _comments(client, prompt_id)
+    assert page["total_comments"] == comments + 1
+    assert page["comments"][0]["comment"] == "queued" and page["comments"][0]["id"] is not None
+    assert not any(comment["pending"] for comment in page["comments"])
+
+
+def test_committed_events_are_not_counted_twice_before_they_leave_the_queue(client, manifest, queue):
+    prompt_id, user = manifest["public_prompt_ids"][8], "write-behind-window"
+    likes, comments = _likes(client, prompt_id, user)["likes_count"], _comments(client, prompt_id)["total_comments"]
+    _like(client, prompt_id, user)
+    _comment(client, prompt_id, user, "in the window")
+
+    # The flusher's transaction commits, the events are still pending in the queue
+    events = queue.take(10)
+    with get_session_with_ctx_manager() as db:
+        write_behind.apply_engagement_events(db, events)
+
+    assert _likes(client, prompt_id, user)["likes_count"] == likes + 1
+    page = _comments(client, prompt_id)
+    assert page["total_comments"] == comments + 1
+    assert [comment["comment"] for comment in page["comments"]].count("in the window") == 1
+
+    queue.done(events)
+    assert _likes(client, prompt_id, user)["likes_count"] == likes + 1
+    assert _comments(client, prompt_id)["total_comments"] == comments + 1
+
+
+def test_queue_takes_one_like_per_user_and_keeps_a_failed_batch(client, manifest, queue):
+    prompt_id, user = manifest["public_prompt_ids"][9], "write-behind-queue"
+    likes = _likes(client, prompt_id, user)["likes_count"]
+
+    assert _like(client, prompt_id, user).json()["message"] == "Prompt liked successfully"
+    assert _like(client, prompt_id, user).json() == {"message": "Prompt already liked", "total_likes": likes + 1}
+    # Nothing to delete until the like is flushed
+    unlike = client.delete("/socialfeed/unlike-prompt/", params={"prompt_id": prompt_id, "prompt_type": "public", "user_account": user})
+    assert unlike.status_code == 409
+
+    def broken_session():
+        raise RuntimeError("database down")
+
+    with pytest.raises(RuntimeError):
+        write_behind.flush_in_process(queue, broken_session)
+    assert _likes(client, prompt_id, user)["likes_count"] == likes + 1
+
+    assert write_behind.flush_in_process(queue, get_session_with_ctx_manager) == 1
+    assert write_behind.flush_in_process(queue, get_session_with_ctx_manager) == 0
+    assert _likes(client, prompt_id, user) == {"prompt_id": prompt_id, "likes_count": likes + 1, "user_liked": True}
+
+
+@pytest.mark.parametrize("write_behind_on", [False, True])
+def test_comment_on_a_missing_prompt_is_not_found(client, manifest, monkeypatch, write_behind_on):
+    if write_behind_on:
+        monkeypatch.setattr(write_behind, "engagement_queue", write_behind.InMemoryEngagementQueue())
+        monkeypatch.setattr(routes, "ENGAGEMENT_WRITE_BEHIND", True)
+    response = _comment(client, 10 ** 9, "write-behind-missing", "hello?")
+    assert response.status_code == 404, response.text